@@ -0,0 +1,41 @@
+"""Streaming file exports for the manager pages."""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def streaming_csv_response(filename, header, rows):
+    """
+    Stream ``rows`` (any iterable, ideally a queryset iterator) as CSV, one
+    line at a time, so the export never sits in memory as a whole.
+    """
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def streaming_jsonl_response(filename, header, rows):
+    """Like streaming_csv_response, one JSON object per line keyed by ``header``."""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+    def lines():
+        for row in rows:
+            yield encoder.encode(dict(zip(header, row))) + '\n'
+
+    response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from adminApp import reports
+
+
+class Command(BaseCommand):
+    help = "Build (or with --rebuild, recompute) daily sales rollups for closed days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365,
+                            help="How many days back from yesterday to cover (default 365).")
+        parser.add_argument('--start', help="First day, YYYY-MM-DD (overrides --days).")
+        parser.add_argument('--end', help="Last day, YYYY-MM-DD (default yesterday).")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recompute days that already have rollups.")
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        end = parse_date(options['end']) if options['end'] else yesterday
+        start = parse_date(options['start']) if options['start'] else end - timedelta(days=options['days'] - 1)
+        if start is None or end is None or start > end:
+            raise CommandError("Give a valid --start/--end range.")
+
+        if options['rebuild']:
+            rows = reports.build_rollups(start, end)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {start} to {end}: {rows} rollup rows."))
+        else:
+            reports.ensure_rollups(start, end)
+            self.stdout.write(self.style.SUCCESS(f"Rollups are up to date for {start} to {end}."))
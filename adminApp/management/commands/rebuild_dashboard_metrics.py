@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from adminApp import metrics
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard metrics table from orders, products and users."
+
+    def handle(self, *args, **options):
+        metrics.rebuild()
+        snapshot = metrics.snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Dashboard metrics rebuilt: {snapshot['orders']} orders, "
+            f"revenue {snapshot['revenue']}, {snapshot['products']} products."
+        ))
@@ -0,0 +1,188 @@
+"""
+Dashboard metrics.
+
+The dashboard reads a handful of StoreMetric rows instead of scanning
+orders and products. Every write path that changes a total reports a
+delta here:
+
+- order placed              -> record_order_placed (Order post_save)
+- order status changed      -> record_status_changes (transitions.transition_orders;
+                               the admin's status field is read-only, its actions use it)
+- payment status changed    -> record_payment_change (Order pre_save/post_save)
+- stock reserved at checkout -> record_stock_reserved (checkout.stock_reserved)
+- variant stock edited or sold -> record_stock_changes (inventory.stock_synced)
+- product added/edited/removed -> record_product_saved / record_product_deleted
+- user added/removed         -> record_user_delta
+
+``rebuild()`` recomputes everything from the source tables.
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from usersApp.models import Order, Product
+
+from .models import StoreMetric
+
+LOW_STOCK_THRESHOLD = 5
+
+REVENUE = 'revenue'
+ORDERS = 'orders'
+PRODUCTS = 'products'
+LOW_STOCK = 'products.low_stock'
+USERS = 'users'
+
+
+def status_key(status):
+    return f'orders.status.{status}'
+
+
+def payment_key(payment_status):
+    return f'payments.{payment_status}.amount'
+
+
+# --- 1. WRITES ---
+
+def _apply(deltas):
+    """Add each delta to its metric row, creating rows on first use."""
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        if StoreMetric.objects.filter(key=key).update(value=F('value') + delta, updated_at=timezone.now()):
+            continue
+        try:
+            with transaction.atomic():
+                StoreMetric.objects.create(key=key, value=delta)
+        except IntegrityError:
+            # Another request created it first
+            StoreMetric.objects.filter(key=key).update(value=F('value') + delta, updated_at=timezone.now())
+
+
+def _counts_as_revenue(status):
+    return status != Order.STATUS_CANCELLED
+
+
+def record_order_placed(order):
+    deltas = {
+        ORDERS: 1,
+        status_key(order.status): 1,
+        payment_key(order.payment_status): order.total_amount,
+    }
+    if _counts_as_revenue(order.status):
+        deltas[REVENUE] = order.total_amount
+    _apply(deltas)
+
+
+def status_change_deltas(total_amount, from_status, to_status):
+    deltas = {status_key(from_status): -1, status_key(to_status): 1}
+    was_revenue, is_revenue = _counts_as_revenue(from_status), _counts_as_revenue(to_status)
+    if was_revenue != is_revenue:
+        deltas[REVENUE] = total_amount if is_revenue else -total_amount
+    return deltas
+
+
+def record_status_change(order, from_status, to_status):
+    _apply(status_change_deltas(order.total_amount, from_status, to_status))
+
+
+def record_status_changes(changes):
+    """Several (total_amount, from_status, to_status) changes, one UPDATE per metric."""
+    deltas = {}
+    for total_amount, from_status, to_status in changes:
+        for key, delta in status_change_deltas(total_amount, from_status, to_status).items():
+            deltas[key] = deltas.get(key, 0) + delta
+    _apply(deltas)
+
+
+def record_payment_change(order, from_payment_status, to_payment_status):
+    _apply({
+        payment_key(from_payment_status): -order.total_amount,
+        payment_key(to_payment_status): order.total_amount,
+    })
+
+
+def _is_low(stock):
+    return stock <= LOW_STOCK_THRESHOLD
+
+
+def low_stock_delta(changes):
+    """Net products crossing the low-stock line over (old stock, new stock) pairs."""
+    return sum(_is_low(new) - _is_low(old) for old, new in changes)
+
+
+def record_stock_reserved(reserved):
+    """Count products that a checkout pushed to or below the low-stock line."""
+    stocks = Product.objects.filter(pk__in=reserved).values_list('pk', 'stock')
+    _apply({LOW_STOCK: low_stock_delta((stock + reserved[pk], stock) for pk, stock in stocks)})
+
+
+def record_stock_changes(changes):
+    """``{product_id: (old stock, new stock)}`` written with ``update()``."""
+    _apply({LOW_STOCK: low_stock_delta(changes.values())})
+
+
+def record_product_saved(old_stock, new_stock):
+    """A product created (``old_stock`` None) or saved with ``new_stock``."""
+    if old_stock is None:
+        _apply({PRODUCTS: 1, LOW_STOCK: int(_is_low(new_stock))})
+    else:
+        _apply({LOW_STOCK: low_stock_delta([(old_stock, new_stock)])})
+
+
+def record_product_deleted(stock):
+    _apply({PRODUCTS: -1, LOW_STOCK: -int(_is_low(stock))})
+
+
+def record_user_delta(delta):
+    _apply({USERS: delta})
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute every metric from orders, products and users."""
+    StoreMetric.objects.all().delete()
+    values = {
+        ORDERS: Order.objects.count(),
+        REVENUE: Order.objects.exclude(status=Order.STATUS_CANCELLED)
+                             .aggregate(total=Sum('total_amount'))['total'] or 0,
+        USERS: User.objects.count(),
+    }
+    for row in Order.objects.values('status').annotate(n=Count('id')):
+        values[status_key(row['status'])] = row['n']
+    for row in Order.objects.values('payment_status').annotate(total=Sum('total_amount')):
+        values[payment_key(row['payment_status'])] = row['total']
+    values.update(Product.objects.aggregate(**{
+        PRODUCTS: Count('id'),
+        LOW_STOCK: Count('id', filter=Q(stock__lte=LOW_STOCK_THRESHOLD)),
+    }))
+    StoreMetric.objects.bulk_create(
+        StoreMetric(key=key, value=value) for key, value in values.items()
+    )
+
+
+# --- 2. READS ---
+
+def snapshot():
+    """All dashboard numbers from one query on the metrics table."""
+    values = dict(StoreMetric.objects.values_list('key', 'value'))
+    if not values:
+        # First visit after migrating: materialize the totals once
+        rebuild()
+        values = dict(StoreMetric.objects.values_list('key', 'value'))
+    get = lambda key: values.get(key, Decimal(0))
+    by_status = {status: int(get(status_key(status))) for status, _ in Order.STATUS_CHOICES}
+    return {
+        'revenue': get(REVENUE),
+        'orders': int(get(ORDERS)),
+        'orders_by_status': by_status,
+        'active_orders': sum(by_status[s] for s in (
+            Order.STATUS_PENDING, Order.STATUS_CONFIRMED, Order.STATUS_SHIPPED)),
+        'payments': {status: get(payment_key(status)) for status, _ in Order.PAYMENT_STATUS_CHOICES},
+        'products': int(get(PRODUCTS)),
+        'low_stock': int(get(LOW_STOCK)),
+        'low_stock_threshold': LOW_STOCK_THRESHOLD,
+        'users': int(get(USERS)),
+    }
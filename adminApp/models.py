@@ -1,3 +1,54 @@
 from django.db import models
 
-# Create your models here.
+
+class StoreMetric(models.Model):
+    """
+    One running total shown on the manager dashboard (revenue, order counts
+    by status, payment totals, catalogue counts). Maintained incrementally
+    by adminApp.metrics; rebuild with `manage.py rebuild_dashboard_metrics`.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class SalesRollup(models.Model):
+    """
+    Sales totals for one day and one dimension value, built from Order and
+    OrderItem by adminApp.reports so reports never rescan raw order lines.
+    """
+    DIMENSION_TOTAL = 'total'
+    DIMENSION_CHOICES = [
+        (DIMENSION_TOTAL, 'Total'),
+        ('section', 'Section'),
+        ('category', 'Category'),
+        ('product', 'Product'),
+        ('size', 'Size'),
+        ('color', 'Color'),
+    ]
+
+    day = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    # Section code, category/product id or size/color name; '' for totals
+    key = models.CharField(max_length=100, blank=True)
+    label = models.CharField(max_length=200, blank=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'day', 'key'], name='unique_sales_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}:{self.key} = {self.revenue}"
+
+
+class SalesRollupDay(models.Model):
+    """Marks a closed day whose SalesRollup rows are complete."""
+    day = models.DateField(unique=True)
+    built_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,269 @@
+"""
+Sales reporting.
+
+Revenue, units, order counts and average order value by day/week/month,
+with breakdowns by section, category, product, size and color.
+
+Closed days (before today) are aggregated once into SalesRollup rows and
+marked with SalesRollupDay by the ``build_sales_rollups`` command (run it
+on a schedule); reports then group those rows in the database with
+TruncWeek/TruncMonth. Reports never write: today, and any closed day not
+built yet, are aggregated live from the orders. Cancelled orders are
+excluded, and cancelling an order on a closed day drops that day's
+rollups until the next build.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from usersApp.models import Category, Order, OrderItem
+
+from .models import SalesRollup, SalesRollupDay
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# dimension -> (OrderItem field used as key, field used as label)
+DIMENSIONS = {
+    'section': ('product__category__section', 'product__category__section'),
+    'category': ('product__category_id', 'product__category__name'),
+    'product': ('product_id', 'product__name'),
+    'size': ('size', 'size'),
+    'color': ('color', 'color'),
+}
+
+LINE_REVENUE = ExpressionWrapper(
+    F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2)
+)
+
+
+def _sold_orders(start, end):
+    return Order.objects.exclude(status=Order.STATUS_CANCELLED).filter(
+        ordered_at__date__gte=start, ordered_at__date__lte=end
+    )
+
+
+def _sold_lines(start, end):
+    return OrderItem.objects.exclude(order__status=Order.STATUS_CANCELLED).filter(
+        order__ordered_at__date__gte=start, order__ordered_at__date__lte=end
+    )
+
+
+# --- 1. ROLLUP BUILDING ---
+
+def aggregate_days(start, end, dimensions=None):
+    """
+    Unsaved SalesRollup rows for ``dimensions`` (default: all of them plus
+    the totals), aggregated in the database.
+    """
+    if dimensions is None:
+        dimensions = [SalesRollup.DIMENSION_TOTAL, *DIMENSIONS]
+    rows = []
+    if SalesRollup.DIMENSION_TOTAL in dimensions:
+        rows.extend(_aggregate_totals(start, end))
+    for dimension in dimensions:
+        if dimension in DIMENSIONS:
+            rows.extend(_aggregate_dimension(start, end, dimension))
+    return rows
+
+
+def _aggregate_totals(start, end):
+    units_by_day = dict(
+        _sold_lines(start, end)
+        .annotate(day=TruncDate('order__ordered_at'))
+        .values('day')
+        .annotate(units=Sum('quantity'))
+        .values_list('day', 'units')
+    )
+    totals = (
+        _sold_orders(start, end)
+        .annotate(day=TruncDate('ordered_at'))
+        .values('day')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+    )
+    return [
+        SalesRollup(
+            day=row['day'], dimension=SalesRollup.DIMENSION_TOTAL, key='', label='',
+            orders=row['orders'], units=units_by_day.get(row['day']) or 0, revenue=row['revenue'],
+        )
+        for row in totals
+    ]
+
+
+def _aggregate_dimension(start, end, dimension):
+    key_field, label_field = DIMENSIONS[dimension]
+    grouped = (
+        _sold_lines(start, end)
+        .annotate(day=TruncDate('order__ordered_at'))
+        .values('day', key_field, label_field)
+        .annotate(
+            orders=Count('order', distinct=True),
+            units=Sum('quantity'),
+            revenue=Sum(LINE_REVENUE),
+        )
+    )
+    return [
+        SalesRollup(
+            day=row['day'], dimension=dimension,
+            key=str(row[key_field] or ''), label=str(row[label_field] or ''),
+            orders=row['orders'], units=row['units'] or 0, revenue=row['revenue'] or 0,
+        )
+        for row in grouped
+    ]
+
+
+def _spans(days):
+    """Group sorted dates into contiguous (start, end) spans."""
+    spans = []
+    for day in days:
+        if spans and spans[-1][1] + timedelta(days=1) == day:
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return spans
+
+
+@transaction.atomic
+def build_rollups(start, end):
+    """(Re)build rollups for the closed days in [start, end]."""
+    end = min(end, timezone.localdate() - timedelta(days=1))
+    if start > end:
+        return 0
+    SalesRollup.objects.filter(day__gte=start, day__lte=end).delete()
+    rows = aggregate_days(start, end)
+    SalesRollup.objects.bulk_create(rows, batch_size=500)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    SalesRollupDay.objects.filter(day__in=days).delete()
+    SalesRollupDay.objects.bulk_create([SalesRollupDay(day=day) for day in days], batch_size=500)
+    return len(rows)
+
+
+def _build_times(start, end):
+    """({closed day: built_at} for the built days, [closed days not built]) in [start, end]."""
+    end = min(end, timezone.localdate() - timedelta(days=1))
+    if start > end:
+        return {}, []
+    built = dict(SalesRollupDay.objects.filter(day__gte=start, day__lte=end)
+                 .values_list('day', 'built_at'))
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return built, [day for day in days if day not in built]
+
+
+def ensure_rollups(start, end):
+    """Build rollups for any closed day in [start, end] that has none yet."""
+    for span_start, span_end in _spans(_build_times(start, end)[1]):
+        build_rollups(span_start, span_end)
+
+
+def build_status(start, end):
+    """When the rollups in [start, end] were last built, and how many closed days have none."""
+    built, unbuilt = _build_times(start, end)
+    return {'built_at': max(built.values(), default=None), 'unbuilt_days': len(unbuilt)}
+
+
+def invalidate_day(day):
+    """Drop a closed day's rollups after one of its orders changed."""
+    if isinstance(day, datetime):
+        day = timezone.localdate(day)
+    if day >= timezone.localdate():
+        return  # today is always aggregated live
+    SalesRollupDay.objects.filter(day=day).delete()
+    SalesRollup.objects.filter(day=day).delete()
+
+
+# --- 2. REPORTS ---
+
+def _live_rows(start, end, dimension):
+    """Rows for ``dimension`` aggregated from the orders: today, and closed days not built yet."""
+    days = _build_times(start, end)[1]
+    today = timezone.localdate()
+    if start <= today <= end:
+        days.append(today)
+    rows = []
+    for span_start, span_end in _spans(days):
+        rows.extend(aggregate_days(span_start, span_end, [dimension]))
+    return rows
+
+
+def _with_aov(row):
+    row['aov'] = (row['revenue'] / row['orders']).quantize(Decimal('0.01')) if row['orders'] else Decimal(0)
+    return row
+
+
+def timeseries(start, end, bucket='day'):
+    """Revenue, orders, units and AOV per day/week/month bucket."""
+    trunc = BUCKETS[bucket]
+    periods = {}
+    grouped = (
+        SalesRollup.objects
+        .filter(dimension=SalesRollup.DIMENSION_TOTAL, day__gte=start, day__lte=end)
+        .annotate(period=trunc('day'))
+        .values('period')
+        .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('period')
+    )
+    for row in grouped:
+        periods[row['period']] = {k: row[k] for k in ('period', 'orders', 'units', 'revenue')}
+
+    for live in _live_rows(start, end, SalesRollup.DIMENSION_TOTAL):
+        period = _truncate(live.day, bucket)
+        row = periods.setdefault(period, {'period': period, 'orders': 0, 'units': 0, 'revenue': Decimal(0)})
+        row['orders'] += live.orders
+        row['units'] += live.units
+        row['revenue'] += live.revenue
+
+    return [_with_aov(periods[p]) for p in sorted(periods)]
+
+
+def _truncate(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def breakdown(start, end, dimension):
+    """Totals per section/category/product/size/color, best sellers first."""
+    rows = {}
+    grouped = (
+        SalesRollup.objects
+        .filter(dimension=dimension, day__gte=start, day__lte=end)
+        .values('key')
+        .annotate(name=Max('label'), orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+    )
+    for row in grouped:
+        rows[row['key']] = dict(row)
+    for live in _live_rows(start, end, dimension):
+        row = rows.setdefault(live.key, {'key': live.key, 'name': live.label,
+                                         'orders': 0, 'units': 0, 'revenue': Decimal(0)})
+        row['orders'] += live.orders
+        row['units'] += live.units
+        row['revenue'] += live.revenue
+
+    section_labels = dict(Category.SECTION_CHOICES)
+    total_revenue = sum((row['revenue'] for row in rows.values()), Decimal(0))
+    result = []
+    for row in sorted(rows.values(), key=lambda r: r['revenue'], reverse=True):
+        row['label'] = row.pop('name') or row['key'] or '—'
+        if dimension == 'section':
+            row['label'] = section_labels.get(row['key'], row['label'])
+        row['share'] = round(row['revenue'] * 100 / total_revenue, 1) if total_revenue else 0
+        result.append(_with_aov(row))
+    return result
+
+
+def summary(series):
+    totals = {
+        'orders': sum(row['orders'] for row in series),
+        'units': sum(row['units'] for row in series),
+        'revenue': sum((row['revenue'] for row in series), Decimal(0)),
+    }
+    return _with_aov(totals)
@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from usersApp.checkout import stock_reserved
+from usersApp.inventory import stock_synced
+from usersApp.models import Order, Product
+
+from . import metrics
+
+
+# --- DASHBOARD METRICS ---
+
+@receiver(pre_save, sender=Order)
+def remember_payment_status(sender, instance, raw=False, **kwargs):
+    # Payment status is edited with save() (Django admin): count the move
+    if instance.pk and not raw:
+        instance._previous_payment_status = (
+            Order.objects.filter(pk=instance.pk).values_list('payment_status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def count_new_order(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        metrics.record_order_placed(instance)
+        return
+    previous = getattr(instance, '_previous_payment_status', None)
+    if previous is not None and previous != instance.payment_status:
+        metrics.record_payment_change(instance, previous, instance.payment_status)
+    instance._previous_payment_status = instance.payment_status
+
+
+@receiver(stock_reserved)
+def count_low_stock_after_checkout(sender, reserved, **kwargs):
+    metrics.record_stock_reserved(reserved)
+
+
+@receiver(stock_synced)
+def count_low_stock_after_variant_edits(sender, changes, **kwargs):
+    metrics.record_stock_changes(changes)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_stock(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_stock = Product.objects.filter(pk=instance.pk).values_list('stock', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_stock', instance.stock)
+    metrics.record_product_saved(previous, instance.stock)
+    instance._previous_stock = instance.stock
+
+
+@receiver(post_delete, sender=Product)
+def count_removed_product(sender, instance, **kwargs):
+    metrics.record_product_deleted(instance.stock)
+
+
+@receiver(post_save, sender=User)
+def count_new_user(sender, created=False, raw=False, **kwargs):
+    if created and not raw:
+        metrics.record_user_delta(1)
+
+
+@receiver(post_delete, sender=User)
+def count_removed_user(sender, **kwargs):
+    metrics.record_user_delta(-1)
@@ -1,3 +1,553 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop_project import database, db_routing, instrumentation
+from usersApp import checkout, facets
+from usersApp.models import (
+    Cart, CartItem, Category, EmailOutbox, Order, OrderItem, OrderStatusHistory, Product, ProductVariant, Size,
+)
+
+from . import metrics, orders, reports, transitions
+from .models import SalesRollup
+
+
+def make_order(user, total='100.00', **kwargs):
+    kwargs.setdefault('phone', '9999999999')
+    return Order.objects.create(
+        user=user, full_name=user.username, address='1 MG Road', city='Pune',
+        subtotal=Decimal(total), total_amount=Decimal(total), **kwargs
+    )
+
+
+class DashboardMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', 'manager@example.com', 'pw', is_staff=True)
+        cls.customer = User.objects.create_user('neha', 'neha@example.com', 'pw')
+        category = Category.objects.create(section='men', name='Jeans', slug='men-jeans')
+        Product.objects.create(category=category, name='Slim Jeans', price=Decimal('1500'),
+                               description='Stretch denim', stock=2)
+        Product.objects.create(category=category, name='Loose Jeans', price=Decimal('1700'),
+                               description='Relaxed fit', stock=40)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_incremental_totals_match_rebuild(self):
+        first = make_order(self.customer, '100.00')
+        make_order(self.customer, '250.00', payment_status=Order.PAYMENT_PAID)
+        self.client.post(reverse('admin_order_update_status', args=[first.pk]),
+                         {'new_status': Order.STATUS_CANCELLED})
+
+        stats = metrics.snapshot()
+        self.assertEqual(stats['revenue'], Decimal('250.00'))
+        self.assertEqual(stats['orders'], 2)
+        self.assertEqual(stats['orders_by_status'][Order.STATUS_CANCELLED], 1)
+        self.assertEqual(stats['orders_by_status'][Order.STATUS_PENDING], 1)
+        self.assertEqual(stats['payments'][Order.PAYMENT_PAID], Decimal('250.00'))
+        self.assertEqual(stats['payments'][Order.PAYMENT_PENDING], Decimal('100.00'))
+        self.assertEqual((stats['products'], stats['low_stock'], stats['users']), (2, 1, 2))
+
+        metrics.rebuild()
+        self.assertEqual(metrics.snapshot(), stats)
+
+    def test_product_and_payment_edits_apply_deltas(self):
+        stats = metrics.snapshot()
+        slim = Product.objects.get(name='Slim Jeans')
+        slim.stock = 20
+        with CaptureQueriesContext(connection) as queries:
+            slim.save()
+        # A delta on the metric row, not a recount of the product table
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql']])
+        extra = Product.objects.create(category=slim.category, name='Bootcut', price=Decimal('900'),
+                                       description='-', stock=1)
+        Product.objects.get(name='Loose Jeans').delete()
+        order = make_order(self.customer, '300.00')
+        order.payment_status = Order.PAYMENT_PAID  # what the Django admin's change form does
+        order.save()
+
+        stats = metrics.snapshot()
+        self.assertEqual((stats['products'], stats['low_stock']), (2, 1))
+        self.assertEqual(stats['payments'][Order.PAYMENT_PAID], Decimal('300.00'))
+        self.assertEqual(stats['payments'][Order.PAYMENT_PENDING], Decimal('0'))
+        extra.delete()
+        self.assertEqual(metrics.snapshot()['low_stock'], 0)
+
+        metrics.rebuild()
+        self.assertEqual(metrics.snapshot(), {**stats, 'products': 1, 'low_stock': 0})
+
+    def test_admin_moves_status_only_through_transitions(self):
+        order_admin = admin.site._registry[Order]
+        request = RequestFactory().get('/')
+        request.user = self.staff
+        self.assertIn('status', order_admin.get_readonly_fields(request))
+        self.assertIn('mark_cancelled', order_admin.get_actions(request))
+
+    def test_variant_stock_edits_move_low_stock(self):
+        loose = Product.objects.get(name='Loose Jeans')
+        size = Size.objects.create(name='32')
+        self.assertEqual(metrics.snapshot()['low_stock'], 1)
+        # Product.stock follows the variants through update(): no Product post_save
+        variant = ProductVariant.objects.create(product=loose, size=size, stock=3)
+        self.assertEqual(metrics.snapshot()['low_stock'], 2)
+        variant.stock = 30
+        variant.save()
+        self.assertEqual(metrics.snapshot()['low_stock'], 1)
+        variant.stock = 1
+        variant.save()
+        stats = metrics.snapshot()
+        self.assertEqual(stats['low_stock'], 2)
+
+        # A checkout reports a variant product once, when its total is re-derived
+        variant.stock = 7
+        variant.save()
+        cart = Cart.objects.create(user=self.customer)
+        CartItem.objects.create(cart=cart, product=loose, size=size, quantity=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout.place_order(self.customer, cart, full_name='Neha', phone='1', address='-', city='Pune')
+        stats = metrics.snapshot()
+        self.assertEqual((loose.variants.get().stock, stats['low_stock']), (4, 2))
+
+        metrics.rebuild()
+        self.assertEqual(metrics.snapshot(), stats)
+
+    def test_dashboard_query_count_is_constant(self):
+        url = reverse('manager_dashboard')
+        self.client.get(url)
+        for _ in range(5):
+            make_order(self.customer)
+        # user, metrics, recent orders (the session is read from the cache)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.context['stats']['orders'], 5)
+
+
+class SalesReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', 'manager@example.com', 'pw', is_staff=True)
+        customer = User.objects.create_user('neha', 'neha@example.com', 'pw')
+        men = Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        women = Category.objects.create(section='women', name='Sarees', slug='women-sarees')
+        shirt = Product.objects.create(category=men, name='Oxford', price=Decimal('100'), description='-')
+        saree = Product.objects.create(category=women, name='Silk', price=Decimal('300'), description='-')
+
+        cls.today = timezone.localdate()
+        cls.days_ago = {}
+        for days_ago, lines, status in [
+            (3, [(shirt, 2, 'M'), (saree, 1, '')], Order.STATUS_DELIVERED),
+            (3, [(shirt, 1, 'L')], Order.STATUS_CANCELLED),
+            (1, [(saree, 2, '')], Order.STATUS_CONFIRMED),
+            (0, [(shirt, 1, 'M')], Order.STATUS_PENDING),
+        ]:
+            total = sum(p.price * q for p, q, _ in lines)
+            order = Order.objects.create(user=customer, full_name='Neha', address='-', city='-',
+                                         phone='1', subtotal=total, total_amount=total, status=status)
+            Order.objects.filter(pk=order.pk).update(ordered_at=timezone.now() - timedelta(days=days_ago))
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=p, quantity=q, price=p.price, size=size) for p, q, size in lines
+            )
+            cls.days_ago.setdefault(days_ago, order)
+
+    def test_timeseries_uses_rollups_for_closed_days(self):
+        start = self.today - timedelta(days=6)
+        series = reports.timeseries(start, self.today)
+        self.assertEqual([(r['orders'], r['units'], r['revenue']) for r in series],
+                         [(1, 3, Decimal('500')), (1, 2, Decimal('600')), (1, 1, Decimal('100'))])
+        # Reports never write; the command materializes closed days
+        self.assertFalse(SalesRollup.objects.exists())
+        call_command('build_sales_rollups', days=7, stdout=io.StringIO())
+        self.assertTrue(SalesRollup.objects.filter(day=self.today - timedelta(days=3)).exists())
+        self.assertFalse(SalesRollup.objects.filter(day=self.today).exists())
+        with self.assertNumQueries(4):  # marker days, rollups, today's orders and units
+            self.assertEqual(reports.timeseries(start, self.today), series)
+
+        totals = reports.summary(series)
+        self.assertEqual((totals['orders'], totals['revenue'], totals['aov']), (3, Decimal('1200'), Decimal('400.00')))
+
+    def test_breakdowns(self):
+        start = self.today - timedelta(days=6)
+        by_section = {r['label']: r['revenue'] for r in reports.breakdown(start, self.today, 'section')}
+        self.assertEqual(by_section, {'Women': Decimal('900'), 'Men': Decimal('300')})
+        by_size = {r['key']: r['units'] for r in reports.breakdown(start, self.today, 'size')}
+        self.assertEqual(by_size, {'M': 3, '': 3})
+
+    def test_cancelling_an_order_drops_its_day(self):
+        start = self.today - timedelta(days=6)
+        reports.build_rollups(start, self.today)
+        self.client.force_login(self.staff)
+        self.client.post(reverse('admin_order_update_status', args=[self.days_ago[1].pk]),
+                         {'new_status': Order.STATUS_CANCELLED})
+        series = reports.timeseries(start, self.today)
+        self.assertEqual([r['revenue'] for r in series], [Decimal('500'), Decimal('100')])
+        self.assertEqual(reports.build_status(start, self.today)['unbuilt_days'], 1)
+
+    def test_views_and_streaming_export(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('sales_report'), {'bucket': 'week', 'dimension': 'product'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['totals']['orders'], 3)
+        self.assertEqual(response.context['rollups'], {'built_at': None, 'unbuilt_days': 29})
+        self.assertContains(response, '29 closed days without them are read straight from the orders')
+        self.assertFalse(SalesRollup.objects.exists())
+
+        export = self.client.get(reverse('sales_report_export'), {'report': 'breakdown', 'dimension': 'category'})
+        self.assertTrue(export.streaming)
+        lines = b''.join(export.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'category,orders,units,revenue,avg_order_value,revenue_share_pct')
+        self.assertEqual(lines[1].split(',')[:4], ['Sarees', '2', '3', '900'])
+
+
+class OrderListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', 'manager@example.com', 'pw', is_staff=True)
+        cls.neha = User.objects.create_user('neha', 'neha@example.com', 'pw')
+        cls.ravi = User.objects.create_user('ravi', 'ravi@example.com', 'pw')
+        category = Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        shirt = Product.objects.create(category=category, name='Oxford', price=Decimal('100'), description='-')
+        now = timezone.now()
+        cls.orders = []
+        for i in range(7):
+            order = make_order(cls.neha if i % 2 else cls.ravi, phone=f'98765{i:05d}',
+                               payment_status=Order.PAYMENT_PAID if i < 3 else Order.PAYMENT_PENDING)
+            Order.objects.filter(pk=order.pk).update(ordered_at=now - timedelta(days=i))
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=shirt, quantity=2, price=shirt.price) for _ in range(i % 3)
+            )
+            cls.orders.append(order)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def ids(self, **params):
+        return [o.pk for o in self.client.get(reverse('view_orders'), params).context['orders']]
+
+    def test_keyset_pages_with_item_counts(self):
+        url = reverse('view_orders')
+        with mock.patch.object(orders, 'PER_PAGE', 3):
+            first = self.client.get(url, {'payment': Order.PAYMENT_PENDING})
+            page = first.context['page']
+            self.assertEqual([o.pk for o in page], [o.pk for o in self.orders[3:6]])
+            self.assertEqual([(o.item_count, o.unit_count) for o in page], [(0, 0), (1, 2), (2, 4)])
+            second = self.client.get(url, {'payment': Order.PAYMENT_PENDING, 'cursor': page.next_cursor})
+        self.assertEqual([o.pk for o in second.context['orders']], [self.orders[6].pk])
+        self.assertFalse(second.context['page'].has_next)
+        self.assertEqual(self.client.get(url, {'cursor': 'nonsense'}).status_code, 200)
+
+    def test_filters_and_search(self):
+        today = timezone.localdate()
+        self.assertEqual(self.ids(start=today - timedelta(days=2), end=today - timedelta(days=1)),
+                         [self.orders[1].pk, self.orders[2].pk])
+        self.assertEqual(self.ids(q=f'#{self.orders[4].pk}'), [self.orders[4].pk])
+        self.assertEqual(self.ids(q='9876500005'), [self.orders[5].pk])
+        self.assertEqual(self.ids(q=' Neha@Example.com '), [o.pk for o in self.orders[1::2]])
+        self.assertEqual(self.ids(q='no such order'), [])
+        self.assertEqual(len(self.ids(status='Bogus')), 7)
+
+    def test_streaming_exports_follow_the_filters(self):
+        url = reverse('view_orders_export')
+        export = self.client.get(url, {'payment': Order.PAYMENT_PAID})
+        self.assertTrue(export.streaming)
+        lines = b''.join(export.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), [name for name, _ in orders.EXPORT_FIELDS])
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [str(o.pk) for o in self.orders[:3]])
+
+        export = self.client.get(url, {'q': 'ravi@example.com', 'format': 'jsonl'})
+        self.assertEqual(export['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(export.streaming_content).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [o.pk for o in self.orders[::2]])
+        self.assertEqual((rows[1]['items'], rows[1]['units'], rows[1]['total']), (2, 4, '100.00'))
+
+
+class BulkStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', 'manager@example.com', 'pw', is_staff=True)
+        cls.customer = User.objects.create_user('neha', 'neha@example.com', 'pw')
+        cls.pending = [make_order(cls.customer, '100.00') for _ in range(3)]
+        cls.confirmed = make_order(cls.customer, '250.00', status=Order.STATUS_CONFIRMED)
+        cls.delivered = make_order(cls.customer, '75.00', status=Order.STATUS_DELIVERED)
+
+    def test_applies_valid_changes_with_batched_writes(self):
+        ids = [o.pk for o in self.pending] + [self.confirmed.pk, self.delivered.pk, 999]
+        # select, one UPDATE per source status, history, one write per metric key, outbox:
+        # independent of how many orders move
+        with self.assertNumQueries(14):
+            results = transitions.transition_orders(ids, Order.STATUS_CANCELLED, changed_by=self.staff)
+
+        self.assertEqual([r['order_id'] for r in results], ids)
+        self.assertEqual([r['ok'] for r in results], [True] * 4 + [False, False])
+        self.assertIn('cannot change from Delivered', results[4]['error'])
+        self.assertEqual(results[5]['error'], 'Order not found.')
+        self.assertEqual(Order.objects.filter(status=Order.STATUS_CANCELLED).count(), 4)
+        history = OrderStatusHistory.objects.filter(to_status=Order.STATUS_CANCELLED)
+        self.assertEqual(sorted(history.values_list('from_status', flat=True)), ['Confirmed'] + ['Pending'] * 3)
+        self.assertEqual(EmailOutbox.objects.filter(subject__endswith='Cancelled').count(), 4)
+        stats = metrics.snapshot()
+        self.assertEqual(stats['orders_by_status'][Order.STATUS_CANCELLED], 4)
+        self.assertEqual(stats['revenue'], Decimal('75.00'))
+
+    def test_bulk_view_reports_each_order(self):
+        self.client.force_login(self.staff)
+        url = reverse('admin_orders_bulk_status')
+        data = {'order_ids': [self.pending[0].pk, self.delivered.pk], 'new_status': Order.STATUS_CONFIRMED}
+        response = self.client.post(url, data, HTTP_ACCEPT='application/json')
+        self.assertEqual([r['ok'] for r in response.json()['results']], [True, False])
+
+        data['order_ids'] = [self.pending[1].pk]
+        response = self.client.post(url, data, follow=True)
+        self.assertRedirects(response, reverse('view_orders'))
+        self.assertContains(response, '1 order moved to Confirmed.')
+
+        # The single-order form goes through the same path
+        self.client.post(reverse('admin_order_update_status', args=[self.confirmed.pk]),
+                         {'new_status': Order.STATUS_SHIPPED})
+        self.assertEqual(OrderStatusHistory.objects.get(order=self.confirmed).changed_by, self.staff)
+        self.assertEqual(EmailOutbox.objects.filter(subject=f'Order #{self.confirmed.pk}: Shipped').count(), 1)
+
+
+class PerformanceInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('ops', 'ops@example.com', 'pw', is_staff=True)
+        category = Category.objects.create(section='kids', name='Tees', slug='kids-tees')
+        Product.objects.create(category=category, name='Dino Tee', price=Decimal('399'), description='Cotton')
+
+    def setUp(self):
+        cache.clear()  # anonymous listing pages are served from the page cache
+        instrumentation.REGISTRY.reset()
+
+    def test_records_per_view_samples(self):
+        response = self.client.get(reverse('products'))
+        self.assertNotIn('Server-Timing', response)
+        stats = instrumentation.REGISTRY.snapshot()['products']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreater(stats['sum']['queries'], 0)
+        self.assertGreater(stats['sum']['template_ms'], 0)
+        self.assertEqual(stats['sum']['bytes'], len(response.content))
+
+    def test_server_timing_only_for_staff_or_debug(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('home')))
+        with override_settings(DEBUG=True):
+            self.assertIn('db;dur=', self.client.get(reverse('home'))['Server-Timing'])
+        self.client.force_login(self.staff)
+        self.assertIn('db;dur=', self.client.get(reverse('products'))['Server-Timing'])
+
+    async def test_server_timing_under_asgi(self):
+        response = await self.async_client.get(reverse('products'))
+        self.assertNotIn('Server-Timing', response)
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('products'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_counts_duplicate_queries(self):
+        def n_plus_one(request):
+            for _ in range(3):
+                list(Product.objects.filter(pk=1))
+            return HttpResponse('ok')
+
+        instrumentation.PerformanceMiddleware(n_plus_one)(RequestFactory().get('/'))
+        stats = instrumentation.REGISTRY.snapshot()['<unresolved>']
+        self.assertEqual((stats['sum']['queries'], stats['sum']['duplicates']), (3, 2))
+
+    def test_prometheus_endpoint_needs_staff_or_token(self):
+        self.client.get(reverse('products'))
+        url = reverse('prometheus_metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('stylehaven_request_duration_seconds_count{view="products"} 1', body)
+        self.assertIn('stylehaven_email_outbox_pending 0', body)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertContains(self.client.get(reverse('performance')), 'products')
+
+    def test_sampled_slow_requests_keep_a_profile(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            PERF_PROFILE_SAMPLE_RATE=1, PERF_SLOW_REQUEST_MS=0, PERF_PROFILE_DIR=directory,
+        ):
+            self.client.get(reverse('products'))
+            profile = instrumentation.REGISTRY.slow_profiles[0]
+            self.assertEqual(profile['view'], 'products')
+            self.assertIn('cumulative', profile['summary'])
+            self.assertTrue(os.path.exists(profile['file']))
+
+
+@override_settings(DATABASE_PRIMARY='primary', DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Two SQLite files stand in for the primary and its replica; ``replicate`` is the replication."""
+
+    aliases = ('primary', 'replica')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        databases = {
+            alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.directory.name, f'{alias}.sqlite3')}
+            for alias in cls.aliases
+        }
+        configured = connections.configure_settings({**connections.settings, **databases})
+        connections.settings.update({alias: configured[alias] for alias in cls.aliases})
+        cls.databases = cls.databases | set(cls.aliases)
+        with connection.cursor() as cursor:  # the migrated (empty) test schema
+            cursor.execute('VACUUM INTO %s', [databases['primary']['NAME']])
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.aliases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.replicate()
+
+    def replicate(self):
+        replica = connections['replica']
+        replica.close()
+        if os.path.exists(replica.settings_dict['NAME']):
+            os.remove(replica.settings_dict['NAME'])
+        with connections['primary'].cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [replica.settings_dict['NAME']])
+
+    def request(self, view, method='get', **cookies):
+        factory = RequestFactory()
+        for name, value in cookies.items():
+            factory.cookies[name] = value
+        return db_routing.RoutingMiddleware(view)(getattr(factory, method)('/'))
+
+    def catalogue_view(self, seen):
+        def view(request):
+            seen.append((sorted(Category.objects.values_list('name', flat=True)), Order.objects.count()))
+            return HttpResponse('ok')
+        return view
+
+    def test_catalogue_reads_go_to_the_replica(self):
+        customer = User.objects.create_user('neha', 'neha@example.com', 'pw')
+        Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        self.replicate()
+        Category.objects.create(section='men', name='Kurtas', slug='men-kurtas')  # not replicated yet
+        make_order(customer)
+        self.assertEqual(Category.objects.using('primary').count(), 2)
+        self.assertFalse(Category.objects.using('default').exists())
+
+        seen = []
+        response = self.request(self.catalogue_view(seen))
+        # Catalogue from the lagging replica, orders from the primary
+        self.assertEqual(seen, [(['Shirts'], 1)])
+        self.assertNotIn(db_routing.PIN_COOKIE, response.cookies)
+        # Outside a request everything reads the primary
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_writes_pin_reads_to_the_primary(self):
+        Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        seen = []
+        view = self.catalogue_view(seen)
+
+        response = self.request(view, method='post')
+        self.assertEqual(seen.pop(), (['Shirts'], 0))
+        self.assertEqual(response.cookies[db_routing.PIN_COOKIE]['max-age'], 5)
+        self.request(view, **{db_routing.PIN_COOKIE: '1'})
+        self.assertEqual(seen.pop(), (['Shirts'], 0))
+
+        def write_then_read(request):
+            list(Category.objects.all())  # replica: empty
+            Category.objects.create(section='kids', name='Tees', slug='kids-tees')
+            return view(request)
+        response = self.request(write_then_read)
+        self.assertEqual(seen.pop(), (['Shirts', 'Tees'], 0))
+        self.assertIn(db_routing.PIN_COOKIE, response.cookies)
+
+        def in_transaction(request):
+            with transaction.atomic(using='primary'):
+                return view(request)
+        self.request(in_transaction)
+        self.assertEqual(seen.pop(), (['Shirts', 'Tees'], 0))
+
+    def test_facet_index_reads_the_primary(self):
+        category = Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        product = Product.objects.create(category=category, name='Oxford', price=Decimal('999'), description='x')
+        self.replicate()
+        index, seen = facets.FacetIndex(), []
+
+        def view(request):
+            seen.append(facets.to_ids(index.sync().get('size', size.pk)))
+            return HttpResponse('ok')
+
+        size = Size.objects.create(name='M')
+        self.request(view)  # full reload
+        product.sizes.add(size)  # the replica hasn't caught up
+        self.request(view)  # replays the change
+        self.assertEqual(seen, [[], [product.pk]])
+
+    def test_reports_and_exports_read_the_replica(self):
+        staff = User.objects.create_user('manager', 'manager@example.com', 'pw', is_staff=True)
+        exported = make_order(staff)
+        self.replicate()
+        make_order(staff)
+        with db_routing.replica_reads():
+            self.assertEqual(Order.objects.count(), 1)
+
+        self.client.force_login(staff)
+        self.client.cookies.pop(db_routing.PIN_COOKIE, None)  # the login wrote the session
+        export = self.client.get(reverse('view_orders_export'), {'format': 'jsonl'})
+        rows = [json.loads(line) for line in b''.join(export.streaming_content).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [exported.pk])
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite_profile(self):
+        databases, replicas = database.databases('/srv/shop', {'DJANGO_DB_REPLICAS': '/srv/r1.sqlite3, /srv/r2.sqlite3'})
+        default = databases['default']
+        self.assertEqual((default['NAME'], default['CONN_MAX_AGE'], default['CONN_HEALTH_CHECKS']),
+                         ('/srv/shop/db.sqlite3', 60, True))
+        self.assertIn('PRAGMA journal_mode=WAL', default['OPTIONS']['init_command'].split(';'))
+        self.assertEqual((default['OPTIONS']['transaction_mode'], default['OPTIONS']['timeout']), ('IMMEDIATE', 20.0))
+        self.assertEqual(replicas, ['replica_1', 'replica_2'])
+        self.assertEqual(databases['replica_2']['NAME'], '/srv/r2.sqlite3')
+        self.assertEqual(databases['replica_2']['TEST'], {'MIRROR': 'default'})
+
+        databases, _ = database.databases('/srv/shop', {'DJANGO_SQLITE_TUNING': '0', 'DJANGO_DB_CONN_MAX_AGE': '0'})
+        self.assertEqual((databases['default']['OPTIONS'], databases['default']['CONN_MAX_AGE']), ({}, 0))
+
+    def test_postgresql_profile(self):
+        environ = {'DJANGO_DB_ENGINE': 'postgresql', 'DJANGO_DB_HOST': 'db', 'DJANGO_DB_POOL_MAX': '20',
+                   'DJANGO_DB_REPLICAS': 'db-replica'}
+        databases, _ = database.databases('/srv/shop', environ)
+        default = databases['default']
+        self.assertEqual((default['ENGINE'], default['HOST'], default['CONN_MAX_AGE']),
+                         ('django.db.backends.postgresql', 'db', 0))
+        self.assertEqual(default['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+        self.assertEqual((databases['replica_1']['HOST'], databases['replica_1']['NAME']), ('db-replica', 'stylehaven'))
+
+        databases, _ = database.databases('/srv/shop', {**environ, 'DJANGO_DB_POOL': '0'})
+        self.assertEqual((databases['default']['OPTIONS'], databases['default']['CONN_MAX_AGE']), ({}, 60))
+        self.assertTrue(databases['default']['CONN_HEALTH_CHECKS'])
+
+        with self.assertRaises(ImproperlyConfigured):
+            database.databases('/srv/shop', {'DJANGO_DB_ENGINE': 'oracle'})
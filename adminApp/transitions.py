@@ -0,0 +1,97 @@
+"""
+Order status transitions, one order or hundreds at a time.
+
+``transition_orders`` checks every requested order against
+``Order.ALLOWED_TRANSITIONS`` and, in one transaction, applies the valid
+ones with a single ``UPDATE ... WHERE status = <from>`` per source
+status. It writes their history rows with one ``bulk_create``, folds the
+dashboard deltas into one metrics update, and queues the customer emails
+with one outbox INSERT. It returns a result per requested id, in the
+order given, so the caller can show what happened to each one.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from usersApp import mailer
+from usersApp.models import Order, OrderStatusHistory
+
+from . import metrics, reports
+
+STATUS_MESSAGES = {
+    Order.STATUS_CONFIRMED: "Your order #{id} has been confirmed and is being packed.",
+    Order.STATUS_SHIPPED: "Good news: your order #{id} is on its way!",
+    Order.STATUS_DELIVERED: "Your order #{id} has been delivered. We hope you love it.",
+    Order.STATUS_CANCELLED: "Your order #{id} has been cancelled. Any payment will be refunded.",
+}
+
+
+def status_email(order, new_status):
+    """(subject, body) telling the customer about ``new_status``."""
+    line = STATUS_MESSAGES.get(new_status, "Your order #{id} is now " + new_status + ".").format(id=order.id)
+    body = f"Hi {order.full_name},\n\n{line}\n\nOrder total: Rs. {order.total_amount}\n\nThanks,\nStyleHaven Team"
+    return f"Order #{order.id}: {new_status}", body
+
+
+def _result(order_id, from_status=None, error=None):
+    return {'order_id': order_id, 'from_status': from_status, 'ok': error is None, 'error': error}
+
+
+def transition_orders(order_ids, new_status, changed_by=None, notify=True):
+    """
+    Move ``order_ids`` to ``new_status``. Returns one dict per distinct id:
+    ``{'order_id', 'from_status', 'ok', 'error'}``.
+    """
+    order_ids = list(dict.fromkeys(int(pk) for pk in order_ids))
+    if new_status not in dict(Order.STATUS_CHOICES):
+        return [_result(pk, error=f'Unknown status {new_status!r}.') for pk in order_ids]
+
+    results = {}
+    with transaction.atomic():
+        orders = {
+            order.pk: order
+            for order in Order.objects.select_for_update().select_related('user').filter(pk__in=order_ids)
+        }
+        by_source = {}
+        for pk in order_ids:
+            order = orders.get(pk)
+            if order is None:
+                results[pk] = _result(pk, error='Order not found.')
+            elif not order.can_transition_to(new_status):
+                results[pk] = _result(pk, order.status,
+                                      f'Invalid transition: cannot change from {order.status} to {new_status}.')
+            else:
+                by_source.setdefault(order.status, []).append(order)
+
+        now = timezone.now()
+        moved = []
+        for from_status, group in by_source.items():
+            ids = [order.pk for order in group]
+            # The status guard keeps this correct even without row locks (SQLite)
+            updated = Order.objects.filter(pk__in=ids, status=from_status).update(status=new_status, updated_at=now)
+            if updated != len(ids):
+                # Someone else moved some of them first: keep only the rows this UPDATE changed
+                still = set(Order.objects.filter(pk__in=ids, status=new_status, updated_at=now).values_list('pk', flat=True))
+                group = [order for order in group if order.pk in still]
+                for pk in set(ids) - still:
+                    results[pk] = _result(pk, from_status, 'Changed by someone else meanwhile; try again.')
+            for order in group:
+                results[order.pk] = _result(order.pk, from_status)
+                moved.append((order, from_status))
+
+        if moved:
+            OrderStatusHistory.objects.bulk_create([
+                OrderStatusHistory(order=order, from_status=from_status, to_status=new_status, changed_by=changed_by)
+                for order, from_status in moved
+            ])
+            metrics.record_status_changes(
+                (order.total_amount, from_status, new_status) for order, from_status in moved
+            )
+            for day in {timezone.localdate(order.ordered_at) for order, _ in moved}:
+                reports.invalidate_day(day)
+            if notify:
+                # Outbox rows commit (or roll back) with the status change
+                mailer.enqueue_many([
+                    (*status_email(order, new_status), [order.user.email])
+                    for order, _ in moved if order.user.email
+                ])
+    return [results[pk] for pk in order_ids]
@@ -8,8 +8,13 @@ urlpatterns = [
     path('add-product/', views.add_product, name='add_product'),
     path('delete-product/<int:pk>/', views.delete_product, name='delete_product'),
     path('orders/', views.view_orders, name='view_orders'),
+    path('orders/bulk-status/', views.orders_bulk_status, name='admin_orders_bulk_status'),
+    path('orders/export/', views.view_orders_export, name='view_orders_export'),
     path('orders/<int:order_id>/', views.order_detail, name='admin_order_detail'),
     path('orders/<int:order_id>/update-status/', views.order_update_status, name='admin_order_update_status'),
     path('users/', views.view_users, name='view_users'),
     path('reports/', views.sales_report, name='sales_report'),
+    path('reports/export/', views.sales_report_export, name='sales_report_export'),
+    path('performance/', views.performance, name='performance'),
+    path('metrics/', views.prometheus_metrics, name='prometheus_metrics'),
 ]
\ No newline at end of file
@@ -1,27 +1,40 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
 from django.views.decorators.http import require_http_methods
-from usersApp.models import Product, Order, OrderItem, OrderStatusHistory
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.template.defaultfilters import pluralize
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.conf import settings
+import hmac
+from shop_project import db_routing, instrumentation
+from usersApp import mailer
+from usersApp.models import Product, Order, OrderItem
+from usersApp.pagination import InvalidCursor, KeysetPaginator
+from . import metrics, orders, reports, transitions
+from .exports import streaming_csv_response, streaming_jsonl_response
 from .forms import ProductForm
 
 # --- MAIN DASHBOARD ---
 @staff_member_required(login_url='login')
 def dashboard(request):
-    # 1. Calculate Stats for the "Cards" at the top
-    # (You can eventually replace the static revenue with: sum(order.total_amount for order in Order.objects.all()))
-    total_revenue = 840000 
-    active_orders = Order.objects.count()
-    total_products = Product.objects.count()
+    # 1. Stats for the "Cards" at the top come from the materialized metrics
+    # table (see adminApp.metrics), so this is constant-time in the number of orders
+    stats = metrics.snapshot()
 
-    # 2. Get the Product List for the "Table" at the bottom
-    products = Product.objects.all().order_by('-id') 
+    # 2. Latest orders for the "Recent Orders" table at the bottom
+    recent_orders = Order.objects.select_related('user').order_by('-ordered_at')[:5]
 
     context = {
-        'revenue': total_revenue,
-        'orders_count': active_orders,
-        'products_count': total_products,
-        'products': products  # We pass this so we can list them in the dashboard table
+        'stats': stats,
+        'revenue': stats['revenue'],
+        'orders_count': stats['orders'],
+        'products_count': stats['products'],
+        'recent_orders': recent_orders,
     }
     return render(request, 'adminApp/dashboard.html', context)
 
@@ -54,8 +67,38 @@ def delete_product(request, pk):
 # --- ORDERS & USERS ---
 @staff_member_required(login_url='login')
 def view_orders(request):
-    orders = Order.objects.all().select_related('user').order_by('-ordered_at')
-    return render(request, 'adminApp/view_orders.html', {'orders': orders})
+    filters = orders.OrderFilters(request.GET)
+    paginator = KeysetPaginator(filters.queryset(), orders.ORDERING, per_page=orders.PER_PAGE)
+    cursor = request.GET.get('cursor')
+    try:
+        page = paginator.page(cursor)
+    except InvalidCursor:
+        cursor = None
+        page = paginator.page()
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    context = {
+        'orders': page.object_list,
+        'page': page,
+        'filters': filters,
+        'is_first_page': not cursor,
+        'status_choices': Order.STATUS_CHOICES,
+        'payment_choices': Order.PAYMENT_STATUS_CHOICES,
+        'query_no_cursor': params.urlencode(),
+    }
+    return render(request, 'adminApp/view_orders.html', context)
+
+
+@staff_member_required(login_url='login')
+def view_orders_export(request):
+    """Stream every order matching the list's filters as CSV or (?format=jsonl) JSON lines."""
+    filters = orders.OrderFilters(request.GET)
+    # Rows are read while the response streams, after routing state is gone
+    header, rows = orders.export_rows(filters, using=db_routing.reporting_alias())
+    stamp = timezone.localdate()
+    if request.GET.get('format') == 'jsonl':
+        return streaming_jsonl_response(f'orders-{stamp}.jsonl', header, rows)
+    return streaming_csv_response(f'orders-{stamp}.csv', header, rows)
 
 
 @staff_member_required(login_url='login')
@@ -84,30 +127,152 @@ def order_update_status(request, order_id):
     if not new_status:
         messages.error(request, 'No status selected.')
         return redirect('admin_order_detail', order_id=order_id)
-    if not order.can_transition_to(new_status):
-        messages.error(
-            request,
-            f'Invalid transition: cannot change from {order.status} to {new_status}.'
-        )
+    result, = transitions.transition_orders([order.pk], new_status, changed_by=request.user)
+    if not result['ok']:
+        messages.error(request, result['error'])
         return redirect('admin_order_detail', order_id=order_id)
-    from_status = order.status
-    order.status = new_status
-    order.save(update_fields=['status', 'updated_at'])
-    OrderStatusHistory.objects.create(
-        order=order,
-        from_status=from_status,
-        to_status=new_status,
-        changed_by=request.user,
-    )
     messages.success(request, f'Order status updated to {new_status}.')
     return redirect('admin_order_detail', order_id=order_id)
 
+
+@staff_member_required(login_url='login')
+@require_http_methods(["POST"])
+def orders_bulk_status(request):
+    """
+    Move every selected order (``order_ids``) to ``new_status``. Answers
+    JSON with a result per order when asked for it, else redirects back
+    to the order list with a summary.
+    """
+    new_status = request.POST.get('new_status', '').strip()
+    order_ids = [pk for pk in request.POST.getlist('order_ids') if pk.isdigit()]
+    results = transitions.transition_orders(order_ids, new_status, changed_by=request.user) if order_ids else []
+    if request.accepts('application/json') and not request.accepts('text/html'):
+        return JsonResponse({'results': results})
+
+    moved = [r for r in results if r['ok']]
+    if not results:
+        messages.error(request, 'No orders selected.')
+    if moved:
+        messages.success(request, f'{len(moved)} order{pluralize(len(moved))} moved to {new_status}.')
+    for result in results:
+        if not result['ok']:
+            messages.error(request, f"#{result['order_id']}: {result['error']}")
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('view_orders')
+    return redirect(next_url)
+
 @staff_member_required(login_url='login')
 def view_users(request):
     # Placeholder for user management
     return render(request, 'adminApp/view_users.html')
 
+def _report_params(request):
+    """Date range, bucket and breakdown dimension from the query string."""
+    def date_param(name):
+        try:
+            return parse_date(request.GET.get(name) or '')
+        except ValueError:  # well-formed but impossible, e.g. 2025-02-30
+            return None
+
+    end = date_param('end') or timezone.localdate()
+    start = date_param('start') or end - timedelta(days=29)
+    if start > end:
+        start, end = end, start
+    bucket = request.GET.get('bucket')
+    if bucket not in reports.BUCKETS:
+        bucket = 'day'
+    dimension = request.GET.get('dimension')
+    if dimension not in reports.DIMENSIONS:
+        dimension = 'category'
+    return start, end, bucket, dimension
+
 @staff_member_required(login_url='login')
+@db_routing.replica_reads()
 def sales_report(request):
-    # Placeholder for sales reports
-    return render(request, 'adminApp/sales_report.html')
\ No newline at end of file
+    start, end, bucket, dimension = _report_params(request)
+    series = reports.timeseries(start, end, bucket)
+    context = {
+        'start': start,
+        'end': end,
+        'bucket': bucket,
+        'dimension': dimension,
+        'buckets': list(reports.BUCKETS),
+        'dimensions': list(reports.DIMENSIONS),
+        'series': series,
+        'totals': reports.summary(series),
+        'breakdown': reports.breakdown(start, end, dimension),
+        'rollups': reports.build_status(start, end),
+        'query': request.GET.urlencode(),
+    }
+    return render(request, 'adminApp/sales_report.html', context)
+
+@staff_member_required(login_url='login')
+@db_routing.replica_reads()
+def sales_report_export(request):
+    """Stream the time series (or ?report=breakdown) as CSV."""
+    start, end, bucket, dimension = _report_params(request)
+    report = 'breakdown' if request.GET.get('report') == 'breakdown' else 'timeseries'
+    if report == 'breakdown':
+        rows = (
+            (row['label'], row['orders'], row['units'], row['revenue'], row['aov'], row['share'])
+            for row in reports.breakdown(start, end, dimension)
+        )
+        header = [dimension, 'orders', 'units', 'revenue', 'avg_order_value', 'revenue_share_pct']
+    else:
+        rows = (
+            (row['period'], row['orders'], row['units'], row['revenue'], row['aov'])
+            for row in reports.timeseries(start, end, bucket)
+        )
+        header = [bucket, 'orders', 'units', 'revenue', 'avg_order_value']
+    filename = f'sales-{report}-{start}-{end}.csv'
+    return streaming_csv_response(filename, header, rows)
+
+# --- PERFORMANCE ---
+@staff_member_required(login_url='login')
+def performance(request):
+    """Per-view timings collected by shop_project.instrumentation in this process."""
+    if request.method == 'POST' and request.POST.get('action') == 'reset':
+        instrumentation.REGISTRY.reset()
+        return redirect('performance')
+    views = instrumentation.REGISTRY.snapshot()
+    for row in views.values():
+        row['total_s'] = row['sum']['wall_ms'] / 1000
+        row['mean_kb'] = row['mean']['bytes'] / 1024
+    sort = request.GET.get('sort', 'total')
+    keys = {
+        'total': lambda item: item[1]['sum']['wall_ms'],
+        'p95': lambda item: item[1]['p95_ms'],
+        'queries': lambda item: item[1]['mean']['queries'],
+        'duplicates': lambda item: item[1]['mean']['duplicates'],
+        'count': lambda item: item[1]['count'],
+    }
+    if sort not in keys:
+        sort = 'total'
+    context = {
+        'views': sorted(views.items(), key=keys[sort], reverse=True),
+        'sort': sort,
+        'since': instrumentation.REGISTRY.started,
+        'profiles': list(instrumentation.REGISTRY.slow_profiles),
+        'sample_rate': getattr(settings, 'PERF_PROFILE_SAMPLE_RATE', 0),
+        'slow_ms': getattr(settings, 'PERF_SLOW_REQUEST_MS', 500),
+    }
+    return render(request, 'adminApp/performance.html', context)
+
+def prometheus_metrics(request):
+    """Prometheus text format; staff session or `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    allowed = (request.user.is_active and request.user.is_staff) or (
+        token and hmac.compare_digest(supplied.encode(), token.encode()))
+    if not allowed:
+        return HttpResponseForbidden('Staff login or metrics token required.')
+    outbox = mailer.queue_stats()
+    gauges = [
+        ('stylehaven_email_outbox_pending', 'Emails waiting to be sent.', outbox['pending']),
+        ('stylehaven_email_outbox_failed', 'Emails that ran out of attempts.', outbox['failed']),
+        ('stylehaven_email_outbox_oldest_pending_seconds', 'Age of the oldest pending email.',
+         outbox['oldest_pending_seconds']),
+    ]
+    return HttpResponse(instrumentation.prometheus_text(gauges=gauges),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shop_project.settings')
+# Serve the async storefront views (usersApp.async_views) under ASGI
+os.environ.setdefault('DJANGO_ASYNC_STOREFRONT', '1')
 
 application = get_asgi_application()
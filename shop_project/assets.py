@@ -0,0 +1,254 @@
+"""
+Static and media delivery.
+
+``CompressedManifestStaticFilesStorage`` is the staticfiles storage in
+production: ``collectstatic`` writes content-hashed copies of every file
+(``app.3f2a9c1b7d4e.css``) plus a manifest that ``{% static %}`` reads,
+and pre-compresses the text assets to ``.gz`` (and ``.br`` when the
+optional ``brotli`` package is installed) so nothing is compressed per
+request.
+
+``AssetMiddleware`` serves ``STATIC_URL`` from ``STATIC_ROOT`` and
+``MEDIA_URL`` from ``MEDIA_ROOT`` in-process, the way WhiteNoise does, so
+a single app server needs no separate web server for assets:
+
+- hashed static names and image variants (whose folder carries a content
+  hash) are sent with ``Cache-Control: immutable`` and a one-year max-age;
+  everything else gets a short max-age and is revalidated,
+- ETag and Last-Modified on every file, answered with 304 when they match,
+- the pre-compressed variant the client accepts (``Vary: Accept-Encoding``),
+- single byte ranges (206/416), for video and resumable downloads.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico', '.ttf', '.eot'}
+# Written next to the original; tried in this order against Accept-Encoding
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+ONE_YEAR = 365 * 24 * 60 * 60
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK = 64 * 1024
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# --- 1. BUILD ---
+
+def compressed_versions(data):
+    """{suffix: bytes} for the encodings that actually save space."""
+    versions = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}  # mtime=0: reproducible
+    if brotli is not None:
+        versions['.br'] = brotli.compress(data)
+    return {suffix: body for suffix, body in versions.items() if len(body) < len(data) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if Path(name).suffix.lower() not in COMPRESSIBLE or not self.exists(name):
+                continue
+            with self.open(name) as source:
+                data = source.read()
+            for suffix, body in compressed_versions(data).items():
+                Path(self.path(name + suffix)).write_bytes(body)
+                yield name + suffix, name + suffix, True
+
+
+# --- 2. SERVE ---
+
+def _mounts():
+    mounts = [(urlparse(settings.STATIC_URL).path, 'static')]
+    if settings.MEDIA_URL:
+        mounts.append((urlparse(settings.MEDIA_URL).path, 'media'))
+    return mounts
+
+
+def _locate(kind, relative):
+    """Absolute path of the requested file, or None."""
+    root = settings.STATIC_ROOT if kind == 'static' else settings.MEDIA_ROOT
+    candidates = []
+    if root:
+        try:
+            candidates.append(safe_join(root, relative))
+        except SuspiciousFileOperation:
+            return None
+    if kind == 'static' and settings.DEBUG and '..' not in Path(relative).parts:
+        candidates.append(finders.find(relative))  # not collected yet in development
+    for path in candidates:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+def _cache_control(kind, relative):
+    if (kind == 'static' and HASHED_NAME.search(relative)) or (kind == 'media' and relative.startswith('variants/')):
+        return f'public, max-age={ONE_YEAR}, immutable'
+    age = _setting('STATIC_MAX_AGE' if kind == 'static' else 'MEDIA_MAX_AGE', 60 if kind == 'static' else 3600)
+    return f'public, max-age={age}'
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        # Weak comparison, as for GET/HEAD
+        tags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+        return '*' in tags or etag in tags
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _byte_range(request, size, etag, mtime):
+    """(start, end) inclusive, 'unsatisfiable', or None to send the whole file."""
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(mtime):
+        return None  # the client's copy is stale: send everything
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None  # multiple or malformed ranges: ignored, as RFC 9110 allows
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1  # suffix range: the last N bytes
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve(request, path, cache_control):
+    stat = os.stat(path)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    headers = {
+        'Cache-Control': cache_control,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+
+    served, size, encoding = path, stat.st_size, None
+    if Path(path).suffix.lower() in COMPRESSIBLE:
+        headers['Vary'] = 'Accept-Encoding'
+        if 'Range' not in request.headers:
+            accepted = {token.split(';')[0].strip() for token in request.headers.get('Accept-Encoding', '').split(',')}
+            for name, suffix in ENCODINGS:
+                if name in accepted and os.path.isfile(path + suffix):
+                    served, encoding = path + suffix, name
+                    size = os.stat(served).st_size
+                    etag = f'{etag[:-1]}-{name}"'
+                    break
+    headers['ETag'] = etag
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    byte_range = None if encoding else _byte_range(request, size, etag, stat.st_mtime)
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        body = _read_range(path, start, length) if request.method == 'GET' else []
+        response = StreamingHttpResponse(body, status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    elif request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        # Explicit content_type: FileResponse would label foo.css.gz as application/gzip
+        response = FileResponse(open(served, 'rb'), content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def _serve_asset(request):
+    """The asset response for ``request``, or None if it isn't for an asset."""
+    if request.method in ('GET', 'HEAD'):
+        for prefix, kind in _mounts():
+            if prefix and request.path_info.startswith(prefix):
+                relative = unquote(request.path_info[len(prefix):])
+                path = _locate(kind, relative)
+                if path is not None:
+                    return serve(request, path, _cache_control(kind, relative))
+    return None
+
+
+def _is_asset_path(request):
+    return any(prefix and request.path_info.startswith(prefix) for prefix, _ in _mounts())
+
+
+class AssetMiddleware:
+    """
+    Put near the top of MIDDLEWARE so asset requests skip sessions, auth and
+    CSRF. Sync and async capable: a sync-only middleware would make ASGI
+    run every request on one thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = _serve_asset(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        if _is_asset_path(request):
+            # File lookups block: off the event loop, not on the shared sync thread
+            response = await sync_to_async(_serve_asset, thread_sensitive=False)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
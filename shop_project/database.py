@@ -0,0 +1,112 @@
+"""
+Database settings from the environment.
+
+``settings.py`` builds ``DATABASES`` with ``databases()``, so one settings
+file serves a laptop (SQLite, nothing to set) and production (tuned
+SQLite, or PostgreSQL with a connection pool):
+
+- ``DJANGO_DB_ENGINE``: ``sqlite`` (default) or ``postgresql``;
+- ``DJANGO_DB_NAME``: the SQLite file (default ``db.sqlite3``) or the
+  PostgreSQL database; ``DJANGO_DB_USER``, ``DJANGO_DB_PASSWORD``,
+  ``DJANGO_DB_HOST`` and ``DJANGO_DB_PORT`` for PostgreSQL;
+- ``DJANGO_DB_CONN_MAX_AGE``: seconds a connection is reused across
+  requests (default 60), checked before reuse unless
+  ``DJANGO_DB_HEALTH_CHECKS=0``;
+- ``DJANGO_DB_POOL``: PostgreSQL uses psycopg's pool (``DJANGO_DB_POOL_MIN``
+  / ``_MAX`` connections per process) unless set to ``0``; a pool replaces
+  persistent connections;
+- ``DJANGO_SQLITE_TUNING=0`` leaves SQLite at its defaults; otherwise every
+  connection runs ``SQLITE_PRAGMAS`` (WAL, ``synchronous=NORMAL``, mmap and
+  page cache) and writers wait up to ``DJANGO_SQLITE_BUSY_TIMEOUT`` seconds
+  for the lock (``sqlite3``'s timeout is SQLite's busy timeout). Write
+  transactions start with ``BEGIN IMMEDIATE``, so a transaction that reads
+  before it writes waits for the lock instead of failing with "database is
+  locked" when it tries to upgrade;
+- ``DJANGO_DB_REPLICAS``: read replicas for ``shop_project.db_routing``,
+  comma-separated SQLite files or PostgreSQL hosts.
+
+``manage.py benchmark_db_writes`` compares tuned and default SQLite under
+concurrent writers.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',        # readers don't block the writer, nor it them
+    'PRAGMA synchronous=NORMAL',      # fsync at checkpoints, not every commit; safe with WAL
+    'PRAGMA mmap_size=134217728',     # 128 MiB of the file read through the page cache
+    'PRAGMA cache_size=-20000',       # ~20 MB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+)
+
+
+def _env(environ, name, default):
+    value = environ.get(name)
+    return default if value in (None, '') else value
+
+
+def _flag(environ, name, default=True):
+    return _env(environ, name, '1' if default else '0') != '0'
+
+
+def sqlite_options(environ=os.environ):
+    if not _flag(environ, 'DJANGO_SQLITE_TUNING'):
+        return {}
+    return {
+        'init_command': ';'.join(SQLITE_PRAGMAS),
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': float(_env(environ, 'DJANGO_SQLITE_BUSY_TIMEOUT', 20)),
+    }
+
+
+def _postgresql(environ, conn_max_age, health_checks):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': _env(environ, 'DJANGO_DB_NAME', 'stylehaven'),
+        'USER': _env(environ, 'DJANGO_DB_USER', ''),
+        'PASSWORD': _env(environ, 'DJANGO_DB_PASSWORD', ''),
+        'HOST': _env(environ, 'DJANGO_DB_HOST', ''),
+        'PORT': _env(environ, 'DJANGO_DB_PORT', ''),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': health_checks,
+        'OPTIONS': {},
+    }
+    if _flag(environ, 'DJANGO_DB_POOL'):
+        # The pool hands out live connections; Django refuses CONN_MAX_AGE with it
+        database.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        database['OPTIONS']['pool'] = {
+            'min_size': int(_env(environ, 'DJANGO_DB_POOL_MIN', 2)),
+            'max_size': int(_env(environ, 'DJANGO_DB_POOL_MAX', 10)),
+            'timeout': 10,
+        }
+    return database
+
+
+def databases(base_dir, environ=os.environ):
+    """(DATABASES, replica aliases) for ``environ``."""
+    conn_max_age = int(_env(environ, 'DJANGO_DB_CONN_MAX_AGE', 60))
+    health_checks = _flag(environ, 'DJANGO_DB_HEALTH_CHECKS')
+    engine = _env(environ, 'DJANGO_DB_ENGINE', 'sqlite')
+    if engine in ('postgres', 'postgresql'):
+        default = _postgresql(environ, conn_max_age, health_checks)
+        replica_field = 'HOST'
+    elif engine == 'sqlite':
+        default = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': _env(environ, 'DJANGO_DB_NAME', os.path.join(base_dir, 'db.sqlite3')),
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': health_checks,
+            'OPTIONS': sqlite_options(environ),
+        }
+        replica_field = 'NAME'
+    else:
+        raise ImproperlyConfigured(f"DJANGO_DB_ENGINE must be 'sqlite' or 'postgresql', not {engine!r}")
+
+    result = {'default': default}
+    replicas = []
+    for number, value in enumerate(filter(None, _env(environ, 'DJANGO_DB_REPLICAS', '').split(',')), start=1):
+        alias = f'replica_{number}'
+        result[alias] = {**default, replica_field: value.strip(), 'TEST': {'MIRROR': 'default'}}
+        replicas.append(alias)
+    return result, replicas
@@ -0,0 +1,186 @@
+"""
+Primary / read-replica database routing.
+
+``PrimaryReplicaRouter`` sends every write to the primary (``default``,
+or ``DATABASE_PRIMARY``) and, when it is safe, reads to one of the
+``DATABASE_REPLICAS`` aliases:
+
+- catalogue models (``CATALOGUE_MODELS``) are read from a replica during
+  GET/HEAD requests;
+- code inside ``replica_reads`` (sales reports, exports) reads every model
+  from a replica;
+- everything else (carts, orders, sessions, users) stays on the primary.
+
+Reads go back to the primary for the rest of the request once the
+request is pinned, which happens when:
+
+- the method is unsafe (POST, ...): cart, checkout and status changes read
+  what they are about to write;
+- anything in the request has written (``db_for_write`` was asked);
+- the visitor wrote within the last ``DATABASE_PIN_SECONDS``: the pin
+  cookie set by ``RoutingMiddleware`` makes the redirect after a POST, and
+  the pages after it, read their own writes;
+- and, for single queries, a transaction is open on the primary.
+
+Outside a request (management commands, shell, workers) everything uses
+the primary unless the code opts in with ``replica_reads``.
+
+Replicas are extra ``DATABASES`` entries that something else keeps in
+sync (streaming replication; Litestream/LiteFS for SQLite). Their lag
+shows up only for visitors that haven't written recently. A catalogue
+page re-rendered right after a change may also come from a replica that
+hasn't caught up, and stay cached until the next change or
+``CATALOGUE_CACHE_TIMEOUT``.
+"""
+import contextvars
+import random
+from contextlib import ContextDecorator
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Read-mostly models that may lag a little behind the primary
+CATALOGUE_MODELS = {
+    'usersApp.category', 'usersApp.product', 'usersApp.productlisting', 'usersApp.productvariant',
+    'usersApp.size', 'usersApp.color', 'usersApp.product_sizes', 'usersApp.product_colors',
+}
+
+# Per-request routing state: {'pinned': bool, 'wrote': bool, 'replica': alias or None}
+_request = contextvars.ContextVar('db_routing_request', default=None)
+_replica_reads = contextvars.ContextVar('db_routing_replica_reads', default=False)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def primary():
+    return _setting('DATABASE_PRIMARY', DEFAULT_DB_ALIAS)
+
+
+def replicas():
+    return list(_setting('DATABASE_REPLICAS', []))
+
+
+def _pick_replica():
+    """A replica alias, the same one for the whole request."""
+    state = _request.get()
+    if state is None:
+        return random.choice(replicas())
+    if state['replica'] is None:
+        state['replica'] = random.choice(replicas())
+    return state['replica']
+
+
+def _can_use_replica():
+    if not replicas():
+        return False
+    state = _request.get()
+    if state is not None and state['pinned']:
+        return False
+    # A transaction reads what it has written
+    return not connections[primary()].in_atomic_block
+
+
+def reporting_alias():
+    """
+    Alias for report and export queries that run after the view has
+    returned (a streaming response's iterator): a replica unless this
+    request is pinned to the primary.
+    """
+    return _pick_replica() if _can_use_replica() else primary()
+
+
+class replica_reads(ContextDecorator):
+    """Read every model from a replica inside this block (or decorated view)."""
+
+    def __enter__(self):
+        self._token = _replica_reads.set(True)
+        return self
+
+    def __exit__(self, *exc_info):
+        _replica_reads.reset(self._token)
+
+    def _recreate_cm(self):
+        # A decorated view may run in several threads at once: one token each
+        return type(self)()
+
+
+# --- 1. ROUTER ---
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _can_use_replica():
+            state = _request.get()
+            if _replica_reads.get() or (state is not None and model._meta.label_lower in CATALOGUE_MODELS):
+                return _pick_replica()
+        return primary()
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None:
+            state['wrote'] = state['pinned'] = True
+        return primary()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {primary(), *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# --- 2. MIDDLEWARE ---
+
+class RoutingMiddleware:
+    """
+    Opens the per-request routing state and sets the pin cookie after a
+    write. Put it above SessionMiddleware so session saves count as writes.
+    Sync and async capable.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state, token = _start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        return _finish(request, response, state)
+
+    async def __acall__(self, request):
+        state, token = _start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        return _finish(request, response, state)
+
+
+def _start(request):
+    pinned = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+    state = {'pinned': pinned, 'wrote': False, 'replica': None}
+    return state, _request.set(state)
+
+
+def _finish(request, response, state):
+    wrote = state['wrote'] or request.method not in SAFE_METHODS
+    # Never on a response shared caches may store: it would pin everyone
+    if wrote and replicas() and 'public' not in response.get('Cache-Control', ''):
+        response.set_cookie(PIN_COOKIE, '1', max_age=_setting('DATABASE_PIN_SECONDS', 5),
+                            httponly=True, samesite='Lax')
+    return response
@@ -0,0 +1,341 @@
+"""
+Request performance instrumentation.
+
+``PerformanceMiddleware`` records, for every request and keyed by the
+resolved URL name:
+
+- wall time, DB time and query count (an execute wrapper on every connection),
+- duplicate queries (same SQL and parameters run more than once: an N+1),
+- template render time (top-level ``render()``/``render_to_string`` calls),
+- response size.
+
+Samples are folded into in-process histograms (``REGISTRY``), shown on the
+staff metrics page and exported in Prometheus text format. Every process
+keeps its own numbers, so scrape each worker separately.
+
+A ``Server-Timing`` header carries the same breakdown to the browser, for
+staff (and everyone when DEBUG is on) only.
+
+Sampling profiler: when ``PERF_PROFILE_SAMPLE_RATE`` > 0 that fraction of
+requests runs under cProfile; sampled requests slower than
+``PERF_SLOW_REQUEST_MS`` keep a top-functions summary (shown on the
+metrics page) and, if ``PERF_PROFILE_DIR`` is set, a ``.prof`` dump for
+``python -m pstats`` / snakeviz.
+"""
+import contextvars
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+from django.utils import timezone
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_current = contextvars.ContextVar('request_sample', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# --- 1. AGGREGATION ---
+
+class ViewStats:
+    """Running totals and a latency histogram for one URL name."""
+
+    FIELDS = ('wall_ms', 'db_ms', 'queries', 'duplicates', 'template_ms', 'bytes')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.sums = dict.fromkeys(self.FIELDS, 0.0)
+        self.maxima = dict.fromkeys(self.FIELDS, 0.0)
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, sample, status):
+        self.count += 1
+        if status >= 500:
+            self.errors += 1
+        for field in self.FIELDS:
+            value = sample[field]
+            self.sums[field] += value
+            self.maxima[field] = max(self.maxima[field], value)
+        for i, bound in enumerate(BUCKETS_MS):
+            if sample['wall_ms'] <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q):
+        """Approximate quantile of the wall time: upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0
+        target, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return bound if bound != float('inf') else self.maxima['wall_ms']
+        return self.maxima['wall_ms']
+
+    def as_dict(self):
+        mean = {f: (self.sums[f] / self.count if self.count else 0) for f in self.FIELDS}
+        return {
+            'count': self.count, 'errors': self.errors, 'sum': dict(self.sums), 'mean': mean,
+            'max': dict(self.maxima),
+            'p50_ms': self.quantile(0.5), 'p95_ms': self.quantile(0.95), 'p99_ms': self.quantile(0.99),
+            'buckets': list(zip(BUCKETS_MS, self.buckets)),
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.views = {}
+        self.slow_profiles = deque(maxlen=20)
+        self.started = timezone.now()
+
+    def record(self, view, sample, status):
+        with self._lock:
+            self.views.setdefault(view, ViewStats()).add(sample, status)
+
+    def add_profile(self, entry):
+        with self._lock:
+            self.slow_profiles.appendleft(entry)
+
+    def snapshot(self):
+        with self._lock:
+            return {view: stats.as_dict() for view, stats in sorted(self.views.items())}
+
+    def reset(self):
+        with self._lock:
+            self.views.clear()
+            self.slow_profiles.clear()
+            self.started = timezone.now()
+
+
+REGISTRY = Registry()
+
+
+# --- 2. COLLECTION ---
+
+def _record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper installed on every connection: times queries and spots
+    repeats for the request in the current context. The sample lives in a
+    ContextVar, which asgiref copies into sync_to_async threads, so async
+    views' ORM calls are attributed to the right request.
+    """
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample['db_ms'] += (time.perf_counter() - started) * 1000
+        sample['queries'] += 1
+        try:
+            key = (sql, tuple(params) if not many and params is not None else None)
+            hash(key)
+        except TypeError:
+            key = (sql, repr(params))
+        if key in sample['_seen']:
+            sample['duplicates'] += 1
+        else:
+            sample['_seen'].add(key)
+
+
+def _install_query_wrapper(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_wrapper)
+
+
+_original_render = DjangoTemplate.render
+
+
+def _timed_render(self, context=None, request=None):
+    sample = _current.get()
+    if sample is None or sample['_in_template']:
+        return _original_render(self, context, request)
+    sample['_in_template'] = True
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        sample['template_ms'] += (time.perf_counter() - started) * 1000
+        sample['_in_template'] = False
+
+
+DjangoTemplate.render = _timed_render
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class PerformanceMiddleware:
+    """Put first in MIDDLEWARE so the timings cover the whole stack. Sync and async capable."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        for alias in connections:  # connections opened before this module loaded
+            _install_query_wrapper(connections[alias])
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not _setting('PERF_INSTRUMENTATION', True):
+            return self.get_response(request)
+
+        sample, token = _start()
+        profiler = cProfile.Profile() if random.random() < _setting('PERF_PROFILE_SAMPLE_RATE', 0.0) else None
+        started = time.perf_counter()
+        try:
+            if profiler:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, sample, started, profiler)
+        return response
+
+    async def __acall__(self, request):
+        if not _setting('PERF_INSTRUMENTATION', True):
+            return await self.get_response(request)
+        # No cProfile here: a coroutine's profile would mix in every other
+        # task the event loop runs meanwhile.
+        sample, token = _start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, sample, started, None)
+        return response
+
+
+def _start():
+    sample = dict.fromkeys(ViewStats.FIELDS, 0.0)
+    sample['_in_template'] = False
+    sample['_seen'] = set()
+    return sample, _current.set(sample)
+
+
+def _loaded_user(request):
+    # Only a user the request already loaded (AuthenticationMiddleware
+    # caches it): fetching it here would add a query to responses that never
+    # needed one, e.g. cached pages and the cart summary
+    return getattr(request, '_cached_user', None) or getattr(request, '_acached_user', None)
+
+
+def _finish(request, response, sample, started, profiler):
+    sample['wall_ms'] = (time.perf_counter() - started) * 1000
+    if not response.streaming:
+        sample['bytes'] = len(response.content)
+    view = _view_name(request)
+    REGISTRY.record(view, sample, response.status_code)
+    if settings.DEBUG or getattr(_loaded_user(request), 'is_staff', False):
+        # Query counts and timings tell anyone how expensive a page is to build
+        response['Server-Timing'] = (
+            f"db;dur={sample['db_ms']:.1f};desc=\"{int(sample['queries'])} queries\", "
+            f"tpl;dur={sample['template_ms']:.1f}, total;dur={sample['wall_ms']:.1f}"
+        )
+    if profiler and sample['wall_ms'] >= _setting('PERF_SLOW_REQUEST_MS', 500):
+        _keep_profile(profiler, request, view, sample)
+
+
+# --- 3. PROFILES ---
+
+def _keep_profile(profiler, request, view, sample):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(15)
+    entry = {
+        'at': timezone.now(),
+        'view': view,
+        'path': request.get_full_path()[:200],
+        'wall_ms': round(sample['wall_ms'], 1),
+        'queries': int(sample['queries']),
+        'summary': out.getvalue(),
+        'file': None,
+    }
+    directory = _setting('PERF_PROFILE_DIR', None)
+    if directory:
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        target = path / f"{entry['at']:%Y%m%d-%H%M%S-%f}-{view.replace(':', '_')}.prof"
+        stats.dump_stats(target)
+        entry['file'] = str(target)
+    REGISTRY.add_profile(entry)
+
+
+# --- 4. EXPORT ---
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(snapshot=None, gauges=()):
+    """
+    The registry in Prometheus text exposition format, plus any extra
+    ``gauges`` given as (name, help, value) tuples.
+    """
+    snapshot = REGISTRY.snapshot() if snapshot is None else snapshot
+    lines = [
+        '# HELP stylehaven_request_duration_seconds Wall time per request.',
+        '# TYPE stylehaven_request_duration_seconds histogram',
+    ]
+    for view, stats in snapshot.items():
+        cumulative = 0
+        for bound, n in stats['buckets']:
+            cumulative += n
+            le = '+Inf' if bound == float('inf') else f'{bound / 1000:g}'
+            lines.append(f'stylehaven_request_duration_seconds_bucket{{view="{_label(view)}",le="{le}"}} {cumulative}')
+        total_wall = stats['sum']['wall_ms'] / 1000
+        lines.append(f'stylehaven_request_duration_seconds_sum{{view="{_label(view)}"}} {total_wall:.6f}')
+        lines.append(f'stylehaven_request_duration_seconds_count{{view="{_label(view)}"}} {stats["count"]}')
+
+    counters = [
+        ('stylehaven_request_errors_total', 'Responses with a 5xx status.', lambda s: s['errors']),
+        ('stylehaven_db_seconds_total', 'Time spent in database queries.',
+         lambda s: round(s['sum']['db_ms'] / 1000, 6)),
+        ('stylehaven_db_queries_total', 'Database queries run.', lambda s: int(s['sum']['queries'])),
+        ('stylehaven_db_duplicate_queries_total', 'Queries repeated within one request.',
+         lambda s: int(s['sum']['duplicates'])),
+        ('stylehaven_template_seconds_total', 'Time spent rendering templates.',
+         lambda s: round(s['sum']['template_ms'] / 1000, 6)),
+        ('stylehaven_response_bytes_total', 'Response body bytes.', lambda s: int(s['sum']['bytes'])),
+    ]
+    for name, help_text, value in counters:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for view, stats in snapshot.items():
+            lines.append(f'{name}{{view="{_label(view)}"}} {value(stats)}')
+    for name, help_text, value in gauges:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
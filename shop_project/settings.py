@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from . import database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,7 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop_project.instrumentation.PerformanceMiddleware',
+    'shop_project.db_routing.RoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'shop_project.assets.AssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,6 +59,16 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'shop_project.urls'
 
+# Request instrumentation (shop_project.instrumentation): per-view timings on
+# /manager/performance/ and /manager/metrics/ (Prometheus). A fraction of
+# requests can run under cProfile; slow ones keep their profile.
+PERF_INSTRUMENTATION = os.environ.get('PERF_INSTRUMENTATION', '1') != '0'
+PERF_PROFILE_SAMPLE_RATE = float(os.environ.get('PERF_PROFILE_SAMPLE_RATE', '0'))
+PERF_SLOW_REQUEST_MS = float(os.environ.get('PERF_SLOW_REQUEST_MS', '500'))
+PERF_PROFILE_DIR = os.environ.get('PERF_PROFILE_DIR') or None
+# Bearer token that lets a Prometheus scraper read /manager/metrics/ without a staff login
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -71,23 +86,111 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'shop_project.wsgi.application'
+ASGI_APPLICATION = 'shop_project.asgi.application'
+
+# Route the read-heavy storefront views and the OTP flow to their async
+# versions (usersApp.async_views). asgi.py turns this on.
+ASYNC_STOREFRONT = os.environ.get('DJANGO_ASYNC_STOREFRONT') == '1'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Built from DJANGO_DB_* environment variables (shop_project.database):
+# SQLite with WAL and a busy timeout by default, or PostgreSQL with a
+# connection pool (DJANGO_DB_ENGINE=postgresql); persistent, health-checked
+# connections either way.
+DATABASES, DATABASE_REPLICAS = database.databases(BASE_DIR)
+
+# Read replicas (shop_project.db_routing): DJANGO_DB_REPLICAS lists them,
+# kept in sync outside Django. Catalogue reads, sales reports and exports go
+# to them; writes, carts, checkout and order updates stay on 'default', and
+# so does every read for DATABASE_PIN_SECONDS after a visitor writes.
+DATABASE_ROUTERS = ['shop_project.db_routing.PrimaryReplicaRouter']
+DATABASE_PIN_SECONDS = 5
+
+
+# Cache
+# DJANGO_CACHE picks the backend: 'locmem' (default, per process), 'file'
+# (shared on one host) or 'redis' (shared across hosts, set REDIS_URL).
+CACHE_KIND = os.environ.get('DJANGO_CACHE', 'locmem')
+
+if CACHE_KIND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
     }
+elif CACHE_KIND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_DIR', str(BASE_DIR / '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'stylehaven',
+        }
+    }
+
+# Seconds catalogue pages, cards and category lists stay cached; signals in
+# usersApp.signals invalidate them as soon as the catalogue changes.
+CATALOGUE_CACHE_TIMEOUT = 600
+# max-age for anonymous catalogue pages in shared caches (CDN, proxy); every
+# catalogue page also carries an ETag, so revalidation is a cheap 304
+CATALOGUE_HTTP_MAX_AGE = 60
+
+
+# Sessions
+# DJANGO_SESSIONS picks the engine: 'cached_db' (default: reads from the
+# cache, writes through to the database), 'db', 'cache' (no database at all;
+# sessions die with the cache) or 'signed_cookies' (no server-side state).
+# Anonymous visitors only get a session once they add to the cart, so
+# crawlers never write one. `manage.py cleanup_sessions` purges expired
+# sessions and abandoned guest carts in small batches.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
 }
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('DJANGO_SESSIONS', 'cached_db')]
+SESSION_COOKIE_HTTPONLY = True
+
+
+# Image variants (usersApp.images): resized AVIF/WebP/JPEG copies of product
+# and category images, built by a background thread pool after each upload.
+# `manage.py build_image_variants` backfills images uploaded before.
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1024)
+IMAGE_VARIANT_FORMATS = ('avif', 'webp')  # JPEG is always written as the fallback
+IMAGE_WORKERS = 2
+IMAGE_VARIANTS_ASYNC = True
+
+
+# OTP login (usersApp.otp): codes live in the cache above, so use a shared
+# backend (file or redis) when running more than one process.
+OTP_TTL = 300  # seconds a code stays valid
+OTP_MAX_ATTEMPTS = 5  # wrong guesses before the code is discarded
+# Token buckets as (capacity, refill per second)
+OTP_EMAIL_RATE = (3, 1 / 60)  # codes sent to one address
+OTP_IP_RATE = (20, 1 / 6)  # codes requested / checked from one IP
+
+
+# Product search
+# Dotted path to a usersApp.search backend; leave unset to pick one from the
+# database vendor (SQLite FTS5, PostgreSQL full-text, or icontains fallback).
+PRODUCT_SEARCH_BACKEND = os.environ.get('PRODUCT_SEARCH_BACKEND') or None
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('DJANGO_EMAIL_FILE_PATH', BASE_DIR / '.cache' / 'emails')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -95,6 +198,13 @@ EMAIL_HOST_USER = 'ramanagadu570@gmail.com'
 EMAIL_HOST_PASSWORD = 'dznh jscr yxhm jjdt'  # Replace with your 16-digit App Password
 DEFAULT_FROM_EMAIL = 'StyleHaven Team <ramanagadu570@gmail.com>'
 
+# Outbox worker (`manage.py send_queued_mail`): messages per batch, attempts
+# before a message is parked as failed, and the first retry delay in seconds
+# (doubled after every further failure).
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 30
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -127,29 +237,30 @@ USE_I18N = True
 USE_TZ = True
 
 
-# Static files (CSS, JavaScript, Images)
+# Static files (CSS, JavaScript, Images) and uploads
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
+# shop_project.assets.AssetMiddleware serves both in-process with ETags,
+# 304s and range support. In production `collectstatic` writes hashed,
+# pre-compressed files to STATIC_ROOT, which are cached for a year.
 
 STATIC_URL = 'static/'
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', str(BASE_DIR / 'staticfiles'))
+STATICFILES_DIRS = [path for path in [BASE_DIR / 'static'] if path.is_dir()]
+STATIC_MAX_AGE = 60  # seconds, for unhashed names
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.environ.get('DJANGO_MEDIA_ROOT', str(BASE_DIR / 'media'))
+MEDIA_MAX_AGE = 3600  # seconds; image variants are immutable regardless
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'shop_project.assets.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-import os
-
-STATIC_URL = 'static/'
-STATICFILES_DIRS = [BASE_DIR / 'static']
-
-# Settings for uploading Product Images
-MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
-
-# Base URL to serve media files
-MEDIA_URL = '/media/'
-
-# Path where media is stored
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, Category, Size, Color, Order, OrderItem, OrderStatusHistory, Cart
+from .models import Product, ProductVariant, Category, Size, Color, Order, OrderItem, OrderStatusHistory, Cart
 
 # 1. Register Attribute Models
 admin.site.register(Category)
@@ -7,12 +7,18 @@ admin.site.register(Size)
 admin.site.register(Color)
 
 # 2. Product Admin
+class ProductVariantInline(admin.TabularInline):
+    model = ProductVariant
+    extra = 0
+    fields = ('size', 'color', 'sku', 'stock')
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'stock', 'created_at')
-    list_filter = ('category', 'created_at')
+    list_display = ('name', 'category', 'price', 'stock', 'in_stock', 'created_at')
+    list_filter = ('category', 'in_stock', 'created_at')
     search_fields = ('name', 'description')
     filter_horizontal = ('sizes', 'colors') # Makes selecting many sizes/colors easier
+    inlines = [ProductVariantInline]
 
 # 3. Order Admin (Advanced)
 class OrderItemInline(admin.TabularInline):
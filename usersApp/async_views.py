@@ -0,0 +1,131 @@
+"""
+Async versions of the read-heavy storefront views and the OTP login flow.
+
+usersApp.urls routes to these instead of usersApp.views when
+ASYNC_STOREFRONT is on (asgi.py turns it on), so under uvicorn a worker
+keeps serving other clients while one waits on the database or cache.
+
+Each view resolves ``request.user`` with ``auser()`` up front: templates
+read ``user`` through the auth context processor, and the lazy sync
+lookup is not allowed on the event loop. Session access goes through the
+async session API for the same reason.
+
+The product listing (search, facets, keyset page and card fragments) is
+one sync pipeline; it runs in a single thread hop on a page-cache miss,
+while cache hits are served without leaving the event loop.
+"""
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate, alogin
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from . import caching, carts, http_caching, inventory, mailer, otp, views
+from .caching import cache_anonymous_response
+from .http_caching import conditional_page
+from .models import Order, OrderItem
+
+
+async def _resolve_user(request):
+    request.user = await request.auser()
+    return request.user
+
+
+# --- CATALOGUE ---
+
+@conditional_page(http_caching.listing_validators, shared=True)
+@cache_anonymous_response
+async def products(request):
+    await _resolve_user(request)
+    # The page-cache miss; the async decorators above answer 304s and hits
+    return await sync_to_async(views.render_products)(request)
+
+
+@conditional_page(http_caching.product_validators)
+async def product_detail(request, pk):
+    await _resolve_user(request)
+    product = await caching.aproduct_detail(pk)
+    if product is None:
+        raise Http404('No product matches the given query.')
+    return render(request, 'userApp/product_detail.html', {'product': product})
+
+
+# --- CART & ACCOUNT ---
+
+async def view_cart(request):
+    await _resolve_user(request)
+    cart = await carts.aget_cart(request)
+    if cart is None:
+        return render(request, 'userApp/cart.html', {'items': [], 'total': Decimal('0.00')})
+    items = await carts.acart_items(cart)
+    await inventory.aavailability(items)
+    total = (await carts.asummary(cart.pk))['total']
+    return render(request, 'userApp/cart.html', {'items': items, 'total': total})
+
+
+@login_required(login_url='login')
+async def profile(request):
+    user = await _resolve_user(request)
+    orders = [
+        order async for order in Order.objects.filter(user=user)
+        .order_by('-ordered_at')
+        .prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('product')))
+    ]
+    return render(request, 'userApp/profile.html', {'orders': orders})
+
+
+# --- AUTHENTICATION & OTP ---
+
+async def unified_login(request):
+    """Handles both Admin (Password) and User (OTP) Login"""
+    await _resolve_user(request)
+    if request.method == 'POST':
+        login_type = request.POST.get('login_type')
+
+        if login_type == 'admin':
+            user = await aauthenticate(request, username=request.POST.get('username'),
+                                       password=request.POST.get('password'))
+            if user is not None and user.is_staff:
+                await alogin(request, user)
+                return redirect('/manager/dashboard/')
+            return render(request, 'userApp/login.html', {'error': 'Invalid Admin Credentials'})
+
+        elif login_type == 'user':
+            email = otp.normalize_email(request.POST.get('email'))
+            try:
+                # Several cache round trips: one thread hop for all of them
+                code = await sync_to_async(otp.issue)(email, otp.client_ip(request))
+            except otp.RateLimited as exc:
+                return render(request, 'userApp/login.html', {'error': str(exc)})
+            user = await User.objects.filter(email=email).only('username').afirst()
+            if user is None:
+                return render(request, 'userApp/login.html', {'error': 'User not found. Please Register.'})
+
+            subject = "Your StyleHaven Login OTP"
+            message = f"Hello {user.username},\n\nYour login code is: {code}\n\nDo not share this with anyone.\n\n- StyleHaven Team"
+            await mailer.aenqueue_email(subject, message, [email])
+            return render(request, 'userApp/verify_otp.html', {'email': email})
+
+    return render(request, 'userApp/login.html')
+
+
+async def verify_otp(request):
+    """Checks the entered OTP against the cached one for the email on the form"""
+    await _resolve_user(request)
+    if request.method == 'POST':
+        email = otp.normalize_email(request.POST.get('email'))
+        entered_otp = ''.join(request.POST.get(f'otp{i}', '') for i in range(1, otp.CODE_LENGTH + 1))
+        try:
+            await sync_to_async(otp.verify)(email, entered_otp, otp.client_ip(request))
+        except otp.OTPError as exc:
+            return render(request, 'userApp/verify_otp.html', {'error': str(exc), 'email': email})
+        user = await User.objects.filter(email=email).order_by('pk').afirst()
+        if user is None:
+            return render(request, 'userApp/login.html', {'error': 'User not found. Please Register.'})
+        await alogin(request, user)
+        return redirect('home')
+    return render(request, 'userApp/verify_otp.html')
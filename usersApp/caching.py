@@ -0,0 +1,243 @@
+"""
+Catalogue caching.
+
+Three layers, all on the default cache so they work with the local-memory,
+file-based and Redis backends alike:
+
+- product-card fragments (``{% cache %}`` in ``userApp/product_card.html``),
+- per-section category lists and product-detail objects,
+- whole anonymous listing responses, keyed by path + normalized query
+  string + a catalogue version that every catalogue change bumps.
+
+Invalidation is driven by the signals in ``usersApp.signals``.
+"""
+import hashlib
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpResponse
+
+from .models import Category, Product
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+SECTION_KEYS = [value for value, _ in Category.SECTION_CHOICES] + ['all']
+
+
+def catalogue_timeout():
+    return getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 600)
+
+
+# --- 1. VERSIONING ---
+
+def catalogue_version():
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1 so an evicted counter can never
+        # line up with entries cached under an older run of the counter.
+        cache.add(CATALOGUE_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+async def acatalogue_version():
+    version = await cache.aget(CATALOGUE_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOGUE_VERSION_KEY, int(time.time() * 1000), None)
+        version = await cache.aget(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        catalogue_version()
+
+
+def _category_version_key(category_id):
+    return f'catalogue:category:{category_id}:version'
+
+
+def category_versions(category_ids):
+    """
+    {category id: version}; each counter moves when a product in that
+    category (or the category itself) changes, so filtered listings keep
+    their validators while other categories change.
+    """
+    keys = {_category_version_key(pk): pk for pk in category_ids}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, int(time.time() * 1000), None)  # clock start, as above
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump_category_versions(category_ids):
+    for pk in set(category_ids):
+        if pk is None:
+            continue
+        try:
+            cache.incr(_category_version_key(pk))
+        except ValueError:
+            category_versions([pk])
+
+
+def normalized_query(request, exclude=()):
+    """Sorted, empty-free query string so equivalent URLs share a key."""
+    params = sorted(
+        (key, value.strip()) for key, values in request.GET.lists()
+        if key not in exclude for value in values if value.strip()
+    )
+    return urlencode(params)
+
+
+def _hashed(prefix, *parts):
+    digest = hashlib.md5('|'.join(str(p) for p in parts).encode()).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+# --- 2. OBJECT CACHES ---
+
+def _categories_key(section):
+    return f'catalogue:categories:{section or "all"}'
+
+
+def section_categories(section=None):
+    """Categories of ``section`` (all sections if empty), cached as a list."""
+    queryset = Category.objects.order_by('name')
+    if section:
+        queryset = queryset.filter(section=section)
+    if (section or 'all') not in SECTION_KEYS:
+        return list(queryset)  # unknown section: nothing would invalidate it
+    key = _categories_key(section)
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(queryset)
+        cache.set(key, categories, catalogue_timeout())
+    return categories
+
+
+def _product_key(pk):
+    return f'catalogue:product:{pk}'
+
+
+def product_detail(pk):
+    """Product with category, sizes and colors loaded, or None."""
+    key = _product_key(pk)
+    product = cache.get(key)
+    if product is None:
+        product = (
+            Product.objects.select_related('category')
+            .prefetch_related('sizes', 'colors')
+            .filter(pk=pk)
+            .first()
+        )
+        if product is None:
+            return None
+        cache.set(key, product, catalogue_timeout())
+    return product
+
+
+async def aproduct_detail(pk):
+    """product_detail() for async views: async cache, one thread hop on a miss."""
+    key = _product_key(pk)
+    product = await cache.aget(key)
+    if product is None:
+        product = await (
+            Product.objects.select_related('category')
+            .prefetch_related('sizes', 'colors')
+            .filter(pk=pk)
+            .afirst()
+        )
+        if product is None:
+            return None
+        await cache.aset(key, product, catalogue_timeout())
+    return product
+
+
+def cached_count(request, queryset):
+    """Total for the current filters, reset by catalogue changes."""
+    key = _hashed('catalogue:count', catalogue_version(),
+                  normalized_query(request, exclude=('sort', 'cursor')))
+    return cache.get_or_set(key, queryset.count, catalogue_timeout())
+
+
+# --- 3. RESPONSE CACHE ---
+
+def _page_key(version, request):
+    return _hashed('catalogue:response', version, request.path, normalized_query(request))
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming
+
+
+def _stored(response):
+    # Status and headers too, so a hit answers like the render did; cookies
+    # (response.cookies) are per visitor and never stored
+    return response.status_code, list(response.items()), response.content
+
+
+def _replay(cached):
+    status, headers, content = cached
+    return HttpResponse(content, status=status, headers=dict(headers))
+
+
+def cache_anonymous_response(view):
+    """
+    Cache the full response of a catalogue page for anonymous visitors.
+    Pages cached this way must not embed per-visitor data such as CSRF tokens.
+    Works on sync and async views; async views use the async cache API.
+    """
+    if iscoroutinefunction(view):
+        return _cache_anonymous_response_async(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key = _page_key(catalogue_version(), request)
+        cached = cache.get(key)
+        if cached is not None:
+            return _replay(cached)
+        response = view(request, *args, **kwargs)
+        if _cacheable(response):
+            cache.set(key, _stored(response), catalogue_timeout())
+        return response
+    return wrapper
+
+
+def _cache_anonymous_response_async(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or (await request.auser()).is_authenticated:
+            return await view(request, *args, **kwargs)
+        key = _page_key(await acatalogue_version(), request)
+        cached = await cache.aget(key)
+        if cached is not None:
+            return _replay(cached)
+        response = await view(request, *args, **kwargs)
+        if _cacheable(response):
+            await cache.aset(key, _stored(response), catalogue_timeout())
+        return response
+    return wrapper
+
+
+# --- 4. INVALIDATION ---
+
+def invalidate_products(product_ids):
+    keys = []
+    for pk in product_ids:
+        keys.append(_product_key(pk))
+        keys.append(make_template_fragment_key('product_card', [pk]))
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_categories():
+    cache.delete_many([_categories_key(section) for section in SECTION_KEYS])
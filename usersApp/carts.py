@@ -0,0 +1,228 @@
+"""
+Shopping cart.
+
+- Line and cart totals are computed by the database (``line_total``
+  annotation, one aggregate for the summary) instead of summing
+  ``CartItem.total_price`` in Python, which fetched every product.
+- Carts are created lazily: browsing, viewing an empty cart or the header
+  badge never writes a Cart row (or, for guests, a session). A guest cart
+  is keyed by its own random id, and ``updated_at`` tells the
+  ``cleanup_sessions`` command which ones were abandoned.
+- The cart id lives in the session, so it survives the session-key change
+  at login; ``merge_into_user_cart`` then folds the guest cart into the
+  user's cart in one transaction (wired to ``user_logged_in``).
+- The item count and total are cached per cart and dropped on every
+  mutation; the key also carries the catalogue version so price changes
+  show up.
+- Unique constraints on Cart (one per user / per session) and CartItem
+  (one row per product, size and color) make concurrent adds safe: the
+  loser of an insert race falls back to incrementing the existing row.
+"""
+import secrets
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import caching
+from .models import Cart, CartItem
+
+SESSION_KEY = 'cart_id'
+TOUCH_INTERVAL = timedelta(hours=1)
+
+UNIT_PRICE = Coalesce('product__discount_price', 'product__price')
+LINE_TOTAL = ExpressionWrapper(
+    F('quantity') * UNIT_PRICE, output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+
+# --- 1. LOOKUP ---
+
+def _remember(request, cart):
+    if request.session.get(SESSION_KEY) != cart.pk:
+        request.session[SESSION_KEY] = cart.pk
+    return cart
+
+
+def _guest_id():
+    # Identifies the guest cart on its own; the session only holds the
+    # cart id, so no session row has to exist before the first add.
+    return f'guest-{secrets.token_urlsafe(24)}'
+
+
+def get_cart(request, create=False):
+    """The visitor's cart; None if there is none yet and ``create`` is false."""
+    if request.user.is_authenticated:
+        if create:
+            cart, _ = Cart.objects.get_or_create(user=request.user)
+        else:
+            cart = Cart.objects.filter(user=request.user).first()
+            if cart is None:
+                return None
+        return _remember(request, cart)
+
+    cart_id = request.session.get(SESSION_KEY)
+    if cart_id:
+        cart = Cart.objects.filter(pk=cart_id, user__isnull=True).first()
+        if cart is not None:
+            return cart
+    if not create:
+        return None
+    return _remember(request, Cart.objects.create(session_id=_guest_id()))
+
+
+async def aget_cart(request, create=False):
+    """get_cart() for async views, using the async session and ORM APIs."""
+    user = await request.auser()
+    if user.is_authenticated:
+        if create:
+            cart, _ = await Cart.objects.aget_or_create(user=user)
+        else:
+            cart = await Cart.objects.filter(user=user).afirst()
+            if cart is None:
+                return None
+    else:
+        cart_id = await request.session.aget(SESSION_KEY)
+        if cart_id:
+            cart = await Cart.objects.filter(pk=cart_id, user__isnull=True).afirst()
+            if cart is not None:
+                return cart
+        if not create:
+            return None
+        cart = await Cart.objects.acreate(session_id=_guest_id())
+    if await request.session.aget(SESSION_KEY) != cart.pk:
+        await request.session.aset(SESSION_KEY, cart.pk)
+    return cart
+
+
+def cart_items(cart):
+    """Items with product/size/color loaded and a ``line_total`` annotation."""
+    return list(
+        cart.items.select_related('product', 'size', 'color')
+        .annotate(line_total=LINE_TOTAL)
+        .order_by('id')
+    )
+
+
+# --- 2. SUMMARY ---
+
+def _summary_key(cart_id):
+    return f'cart:summary:{cart_id}:{caching.catalogue_version()}'
+
+
+def summary(cart_id):
+    """{'count': units in the cart, 'total': Decimal} from one aggregate, cached."""
+    key = _summary_key(cart_id)
+    cached = cache.get(key)
+    if cached is None:
+        totals = CartItem.objects.filter(cart_id=cart_id).aggregate(
+            count=Sum('quantity'), total=Sum(LINE_TOTAL)
+        )
+        total = (totals['total'] or Decimal(0)).quantize(Decimal('0.01'))
+        cached = {'count': totals['count'] or 0, 'total': total}
+        cache.set(key, cached, caching.catalogue_timeout())
+    return cached
+
+
+async def acart_items(cart):
+    return [
+        item async for item in cart.items.select_related('product', 'size', 'color')
+        .annotate(line_total=LINE_TOTAL).order_by('id')
+    ]
+
+
+async def asummary(cart_id):
+    key = f'cart:summary:{cart_id}:{await caching.acatalogue_version()}'
+    cached = await cache.aget(key)
+    if cached is None:
+        totals = await CartItem.objects.filter(cart_id=cart_id).aaggregate(
+            count=Sum('quantity'), total=Sum(LINE_TOTAL)
+        )
+        total = (totals['total'] or Decimal(0)).quantize(Decimal('0.01'))
+        cached = {'count': totals['count'] or 0, 'total': total}
+        await cache.aset(key, cached, caching.catalogue_timeout())
+    return cached
+
+
+def invalidate_summary(cart_id):
+    cache.delete(_summary_key(cart_id))
+
+
+def _touch(cart):
+    # Keeps cleanup_sessions off carts in use; at most one write per interval
+    now = timezone.now()
+    if cart.updated_at is None or now - cart.updated_at > TOUCH_INTERVAL:
+        Cart.objects.filter(pk=cart.pk).update(updated_at=now)
+        cart.updated_at = now
+
+
+# --- 3. MUTATIONS ---
+
+def add_item(cart, product, size=None, color=None, quantity=1):
+    """Add ``quantity`` of a product/size/color, incrementing an existing line."""
+    line = CartItem.objects.filter(cart=cart, product=product, size=size, color=color)
+    if not line.update(quantity=F('quantity') + quantity):
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(cart=cart, product=product, size=size, color=color, quantity=quantity)
+        except IntegrityError:
+            # A concurrent request inserted the same line first
+            line.update(quantity=F('quantity') + quantity)
+    _touch(cart)
+    invalidate_summary(cart.pk)
+
+
+def change_quantity(cart, item_id, action):
+    """Apply increase/decrease/remove to an item of ``cart``; False if it isn't there."""
+    items = CartItem.objects.filter(cart=cart, pk=item_id)
+    if action == 'increase':
+        changed = items.update(quantity=F('quantity') + 1)
+    elif action == 'decrease':
+        changed = items.filter(quantity__gt=1).update(quantity=F('quantity') - 1)
+        if not changed:
+            changed = items.delete()[0]
+    elif action == 'remove':
+        changed = items.delete()[0]
+    else:
+        changed = 0
+    if changed:
+        _touch(cart)
+    invalidate_summary(cart.pk)
+    return bool(changed)
+
+
+@transaction.atomic
+def merge_carts(source, target):
+    """Move every line of ``source`` into ``target`` and delete ``source``."""
+    existing = {
+        (item.product_id, item.size_id, item.color_id): item.pk
+        for item in target.items.all()
+    }
+    move = []
+    for item in source.items.all():
+        key = (item.product_id, item.size_id, item.color_id)
+        if key in existing:
+            CartItem.objects.filter(pk=existing[key]).update(quantity=F('quantity') + item.quantity)
+        else:
+            move.append(item.pk)
+    if move:
+        CartItem.objects.filter(pk__in=move).update(cart=target)
+    source.delete()
+    invalidate_summary(source.pk)
+    invalidate_summary(target.pk)
+
+
+def merge_into_user_cart(request, user):
+    """At login: fold the session's guest cart, if any, into ``user``'s cart."""
+    cart_id = request.session.get(SESSION_KEY)
+    guest = Cart.objects.filter(pk=cart_id, user__isnull=True).first() if cart_id else None
+    if guest is None:
+        return None
+    target, _ = Cart.objects.get_or_create(user=user)
+    merge_carts(guest, target)
+    request.session[SESSION_KEY] = target.pk
+    return target
@@ -0,0 +1,101 @@
+"""
+Checkout.
+
+``place_order`` turns a cart into an order in one transaction: it prices
+every line in one pass, reserves each line's size/color variant (or the
+product, when it has no variants) with conditional
+``UPDATE ... SET stock = stock - n WHERE stock >= n`` statements (see
+``usersApp.inventory``; two concurrent checkouts can never both take the
+last unit), writes the order lines with a single ``bulk_create``, empties
+the cart and queues the confirmation email in the outbox. If any line is
+short, nothing is written.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from . import inventory, mailer
+from .carts import invalidate_summary
+from .inventory import OutOfStock  # noqa: F401 -- raised by place_order
+from .models import Order, OrderItem
+
+# Sent after a successful checkout with reserved={product_id: quantity} for
+# products without variants; the others report through inventory.stock_synced
+stock_reserved = Signal()
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCart(CheckoutError):
+    pass
+
+
+def cart_lines(cart):
+    """Cart items with everything needed to price and display them."""
+    return list(cart.items.select_related('product', 'size', 'color'))
+
+
+def price_lines(items):
+    """(total, {product_id: quantity}) in a single pass over the items."""
+    total = 0
+    quantities = defaultdict(int)
+    for item in items:
+        total += item.total_price
+        quantities[item.product_id] += item.quantity
+    return total, quantities
+
+
+def place_order(user, cart, full_name, phone, address, city):
+    """Create an order from ``cart``; returns (order, items)."""
+    with transaction.atomic():
+        items = cart_lines(cart)
+        if not items:
+            raise EmptyCart('The cart is empty.')
+        total, _ = price_lines(items)
+        reserved = inventory.reserve({inventory.line_key(item): item.quantity for item in items})
+
+        order = Order.objects.create(
+            user=user,
+            full_name=full_name,
+            phone=phone,
+            address=address,
+            city=city,
+            subtotal=total,
+            discount=0,
+            total_amount=total,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=item.product,
+                quantity=item.quantity,
+                price=item.product.discount_price or item.product.price,
+                size=getattr(item.size, 'name', '') or '',
+                color=getattr(item.color, 'name', '') or '',
+            )
+            for item in items
+        ])
+        cart.items.all().delete()
+        if user.email:
+            # Outbox row commits (or rolls back) with the order itself
+            subject, body = confirmation_email(user, order, items)
+            mailer.enqueue_email(subject, body, [user.email])
+        # robust: the order is already committed, so a failing receiver must
+        # not surface as a checkout error
+        transaction.on_commit(
+            lambda: stock_reserved.send(sender=Order, reserved=reserved), robust=True
+        )
+    invalidate_summary(cart.pk)
+    return order, items
+
+
+def confirmation_email(user, order, items):
+    """(subject, body) for the order confirmation email."""
+    body = f"Hi {user.username},\n\nYour order #{order.id} has been confirmed!\n\nHere is what you ordered:\n"
+    for item in items:
+        body += f"- {item.product.name} (Qty: {item.quantity}) - Rs. {item.total_price}\n"
+    body += f"\nTotal Amount: Rs. {order.total_amount}\n\nWe will notify you when it ships!\n\nThanks,\nStyleHaven Team"
+    return f"Order Confirmed: #{order.id}", body
@@ -0,0 +1,347 @@
+"""
+Listing facets.
+
+Sizes and colors live in M2M tables, so filtering on several of them the
+usual way means one join per attribute plus a DISTINCT. Instead, every
+process keeps a ``FacetIndex``: one bitset (a Python int, bit *n* is
+product *n*) per size, color, category, section and price bucket, plus
+"on sale" and "in stock". A multi-facet filter is then an AND of ORs over
+those ints, and the count next to each option is a popcount.
+
+The index is built from ``ProductListing`` and kept current
+incrementally: ``usersApp.listings`` publishes the ids of the rows it
+writes, after commit, to a change log in the default cache, and a process
+replays the entries it hasn't seen before it answers, re-reading only
+those rows. A process that has fallen too far behind, or finds an entry
+evicted, reloads the whole table. Both read the primary: a row read from
+a lagging replica would be marked seen and never read again.
+
+``ListingFilters`` parses the listing's query string, applies it to a
+``ProductListing`` queryset and returns the counts for every option.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from shop_project.db_routing import primary
+
+from .models import Product, ProductListing
+from .search import PRICE_BUCKETS
+
+SEQ_KEY = 'facets:seq'
+EVERYTHING = '*'
+# More unseen changes than this: reloading is cheaper than replaying
+MAX_PENDING = 200
+CHANGE_TIMEOUT = 24 * 60 * 60
+ALL_BITS = -1  # every bit set: the identity for &
+MAX_ID = 2 ** 63 - 1  # largest value a (big)integer column holds
+# Most primary keys sent as query parameters at once: SQLite caps a statement
+# at 999 variables on older builds, and a huge IN () list is slow everywhere
+MAX_PARAMS = 500
+
+
+def to_bits(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for pk in ids:
+        buffer[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def to_ids(bits):
+    digits = bin(bits)[:1:-1]  # least significant bit first
+    return [pk for pk, digit in enumerate(digits) if digit == '1']
+
+
+def _price_bucket(price):
+    for i, (low, high) in enumerate(PRICE_BUCKETS):
+        if price >= low and (high is None or price < high):
+            return i
+    return None
+
+
+def _split(value):
+    return [int(pk) for pk in value.split(',')] if value else []
+
+
+# --- 1. CHANGE LOG ---
+
+def _next_seq():
+    try:
+        return cache.incr(SEQ_KEY)
+    except ValueError:
+        current_seq()
+        return cache.incr(SEQ_KEY)
+
+
+def current_seq():
+    seq = cache.get(SEQ_KEY)
+    if seq is None:
+        # Clock start, as for the catalogue version: an evicted counter must
+        # not come back at a number some process has already seen
+        cache.add(SEQ_KEY, int(time.time() * 1000), None)
+        seq = cache.get(SEQ_KEY)
+    return seq
+
+
+def _publish(product_ids):
+    cache.set(f'facets:change:{_next_seq()}', product_ids, CHANGE_TIMEOUT)
+
+
+def changed(product_ids):
+    """Queue ``product_ids`` (or EVERYTHING) for the indexes once the transaction commits."""
+    if product_ids != EVERYTHING:
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return
+    transaction.on_commit(lambda: _publish(product_ids), robust=True)
+
+
+# --- 2. INDEX ---
+
+class _State:
+    """One consistent snapshot; replaced, never mutated, once published."""
+
+    def __init__(self):
+        self.all = 0
+        self.bits = defaultdict(dict)     # group -> {value: bits}
+        self.names = defaultdict(dict)    # 'size'/'color' -> {id: name}
+        self.members = {}                 # pk -> [(group, value), ...]
+        self.by_price = []                # sorted [(effective price, pk)]
+
+    def copy(self):
+        state = _State()
+        state.all = self.all
+        for group, values in self.bits.items():
+            state.bits[group] = dict(values)
+        for group, values in self.names.items():
+            state.names[group] = dict(values)
+        state.members = dict(self.members)
+        state.by_price = list(self.by_price)
+        return state
+
+    def get(self, group, value):
+        return self.bits.get(group, {}).get(value, 0)
+
+    def any_of(self, group, values):
+        bits = 0
+        for value in values:
+            bits |= self.get(group, value)
+        return bits
+
+    def price_range(self, low=None, high=None):
+        start = 0 if low is None else bisect_left(self.by_price, (low,))
+        end = len(self.by_price) if high is None else bisect_right(self.by_price, (high, float('inf')))
+        return to_bits(pk for _, pk in self.by_price[start:end])
+
+
+def _memberships(row):
+    _, section, category_id, size_ids, size_names, color_ids, color_names, price, discount, in_stock = row
+    members = [('section', section), ('category', category_id), ('price', _price_bucket(price))]
+    members += [('size', size_id) for size_id in _split(size_ids)]
+    members += [('color', color_id) for color_id in _split(color_ids)]
+    if discount:
+        members.append(('sale', True))
+    if in_stock:
+        members.append(('in_stock', True))
+    names = list(zip(_split(size_ids), size_names.split(','))) if size_ids else []
+    colors = list(zip(_split(color_ids), color_names.split(','))) if color_ids else []
+    return members, {'size': names, 'color': colors}
+
+
+class FacetIndex:
+    """Per-process facet bitsets over ProductListing, see the module docstring."""
+
+    columns = ('pk', 'section', 'category_id', 'size_ids', 'size_names', 'color_ids', 'color_names',
+               'effective_price', 'discount_percent', 'in_stock')
+
+    def __init__(self):
+        self.seq = None
+        self.state = _State()
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Catch up with the change log; returns the current snapshot."""
+        seq = current_seq()
+        if seq != self.seq:
+            with self._lock:
+                if seq != self.seq:
+                    self._catch_up(seq)
+        return self.state
+
+    def _catch_up(self, seq):
+        pending = None
+        if self.seq is not None and 0 < seq - self.seq <= MAX_PENDING:
+            keys = [f'facets:change:{n}' for n in range(self.seq + 1, seq + 1)]
+            found = cache.get_many(keys)
+            if len(found) == len(keys) and EVERYTHING not in found.values():
+                pending = set().union(*found.values())
+        if pending is None:
+            self.state = self._load(self._rows(), _State())
+        elif pending:
+            state = self.state.copy()
+            for pk in pending:
+                self._remove(state, pk)
+            state.by_price = [entry for entry in state.by_price if entry[1] not in pending]
+            pending = sorted(pending)
+            for start in range(0, len(pending), MAX_PARAMS):
+                state = self._load(self._rows().filter(pk__in=pending[start:start + MAX_PARAMS]), state)
+            self.state = state
+        self.seq = seq
+
+    @staticmethod
+    def _rows():
+        return ProductListing.objects.using(primary())
+
+    @staticmethod
+    def _remove(state, pk):
+        bit = 1 << pk
+        for group, value in state.members.pop(pk, ()):
+            state.bits[group][value] &= ~bit
+        state.all &= ~bit
+
+    def _load(self, queryset, state):
+        added = defaultdict(list)
+        prices = []
+        for row in queryset.values_list(*self.columns).iterator(chunk_size=2000):
+            members, names = _memberships(row)
+            state.members[row[0]] = members
+            for key in members:
+                added[key].append(row[0])
+            for group, pairs in names.items():
+                state.names[group].update(pairs)
+            prices.append((row[7], row[0]))
+        for (group, value), ids in added.items():
+            state.bits[group][value] = state.get(group, value) | to_bits(ids)
+        state.all |= to_bits(pk for _, pk in prices)
+        state.by_price = sorted(state.by_price + prices)
+        return state
+
+
+index = FacetIndex()
+
+
+# --- 3. FILTERS ---
+
+def _id(value):
+    # isdigit() alone lets through ids no column can hold (OverflowError)
+    return int(value) if value.isdigit() and int(value) <= MAX_ID else None
+
+
+def _ids(values):
+    return sorted({pk for pk in map(_id, values) if pk is not None})
+
+
+def _price(value):
+    try:
+        price = Decimal(value or '')
+    except (ArithmeticError, InvalidOperation):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+class ListingFilters:
+    """The listing's filters, parsed from a QueryDict; unknown values are ignored."""
+
+    def __init__(self, params):
+        self.section = params.get('section') or ''
+        self.category_id = _id(params.get('category', ''))
+        self.sizes = _ids(params.getlist('size'))
+        self.colors = _ids(params.getlist('color'))
+        self.min_price = _price(params.get('min_price'))
+        self.max_price = _price(params.get('max_price'))
+        self.on_sale = params.get('on_sale') == '1'
+        self.in_stock = params.get('in_stock') == '1'
+
+    def apply(self, queryset, state):
+        """
+        Column filters in SQL; sizes/colors as a primary-key set from
+        ``state``, or as subqueries on the M2M tables when that set is too
+        big to send as parameters.
+        """
+        if self.section:
+            queryset = queryset.filter(section=self.section)
+        if self.category_id:
+            queryset = queryset.filter(category_id=self.category_id)
+        if self.min_price is not None:
+            queryset = queryset.filter(effective_price__gte=self.min_price)
+        if self.max_price is not None:
+            queryset = queryset.filter(effective_price__lte=self.max_price)
+        if self.on_sale:
+            queryset = queryset.filter(discount_percent__gt=0)
+        if self.in_stock:
+            queryset = queryset.filter(in_stock=True)
+        if self.sizes or self.colors:
+            bits = state.all
+            for mask in self._masks(state).values():
+                bits &= mask
+            if bits.bit_count() <= MAX_PARAMS:
+                return queryset.filter(pk__in=to_ids(bits))
+            if self.sizes:
+                queryset = queryset.filter(Exists(Product.sizes.through.objects.filter(
+                    product_id=OuterRef('pk'), size_id__in=self.sizes)))
+            if self.colors:
+                queryset = queryset.filter(Exists(Product.colors.through.objects.filter(
+                    product_id=OuterRef('pk'), color_id__in=self.colors)))
+        return queryset
+
+    def _masks(self, state):
+        def price_range():
+            if self.min_price is None and self.max_price is None:
+                return ALL_BITS
+            return state.price_range(self.min_price, self.max_price)
+
+        return {
+            'section': state.get('section', self.section) if self.section else ALL_BITS,
+            'category': state.get('category', self.category_id) if self.category_id else ALL_BITS,
+            'price': price_range(),
+            'size': state.any_of('size', self.sizes) if self.sizes else ALL_BITS,
+            'color': state.any_of('color', self.colors) if self.colors else ALL_BITS,
+            'sale': state.get('sale', True) if self.on_sale else ALL_BITS,
+            'in_stock': state.get('in_stock', True) if self.in_stock else ALL_BITS,
+        }
+
+    def counts(self, state, matched=None):
+        """
+        Products per size, color, price bucket and "on sale". Each group is
+        counted under every filter except its own, so picking a second size
+        shows what it adds rather than zero. ``matched`` (bits) restricts
+        everything to a search's results.
+        """
+        masks = self._masks(state)
+        universe = state.all if matched is None else state.all & matched
+
+        def base(excluded):
+            bits = universe
+            for group, mask in masks.items():
+                if group != excluded:
+                    bits &= mask
+            return bits
+
+        def options(group, order):
+            within = base(group)
+            selected = set(getattr(self, group + 's'))
+            return sorted((
+                {'id': pk, 'name': name, 'count': (state.get(group, pk) & within).bit_count(),
+                 'selected': pk in selected}
+                for pk, name in state.names.get(group, {}).items()
+            ), key=order)
+
+        within_prices = base('price')
+        return {
+            'sizes': options('size', lambda option: option['id']),
+            'colors': options('color', lambda option: option['name']),
+            'price': [
+                {'min': low, 'max': high, 'count': (state.get('price', i) & within_prices).bit_count()}
+                for i, (low, high) in enumerate(PRICE_BUCKETS)
+            ],
+            'on_sale': (state.get('sale', True) & base('sale')).bit_count(),
+        }
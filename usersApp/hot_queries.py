@@ -0,0 +1,83 @@
+"""
+The storefront's hot query paths, for the index audit and benchmark.
+
+Each entry is built from real filter values found in the database (first
+section, category, user, cart) so EXPLAIN sees the same shape as the
+views. ``plan_problems`` reads an EXPLAIN result and reports full table
+scans and sorts that an index should have avoided.
+"""
+import re
+
+from django.db import connection
+
+from .models import Cart, CartItem, Category, Order, ProductListing
+
+LISTING_SIZE = 25
+
+
+def _sample():
+    category = Category.objects.order_by('pk').first()
+    cart = Cart.objects.exclude(session_id=None).order_by('pk').first()
+    return {
+        'section': category.section if category else 'men',
+        'category_id': category.pk if category else 0,
+        'user_id': Order.objects.order_by('pk').values_list('user_id', flat=True).first() or 0,
+        'session_id': cart.session_id if cart else '',
+        'cart_id': Cart.objects.order_by('pk').values_list('pk', flat=True).first() or 0,
+    }
+
+
+def hot_queries():
+    """[(name, queryset)] for every hot path."""
+    s = _sample()
+    listing = ProductListing.objects.all()
+    return [
+        ('products: newest', listing.order_by('-created_at', '-pk')[:LISTING_SIZE]),
+        ('products: section, newest',
+         listing.filter(section=s['section']).order_by('-created_at', '-pk')[:LISTING_SIZE]),
+        ('products: category, newest',
+         listing.filter(category_id=s['category_id']).order_by('-created_at', '-pk')[:LISTING_SIZE]),
+        ('products: price low-high', listing.order_by('effective_price', 'pk')[:LISTING_SIZE]),
+        ('products: section, price low-high',
+         listing.filter(section=s['section']).order_by('effective_price', 'pk')[:LISTING_SIZE]),
+        ('products: category, price range',
+         listing.filter(category_id=s['category_id'], effective_price__gte=500, effective_price__lte=2000)
+         .order_by('effective_price', 'pk')[:LISTING_SIZE]),
+        ('products: in stock, newest',
+         listing.filter(in_stock=True).order_by('-created_at', '-pk')[:LISTING_SIZE]),
+        ('categories: section', Category.objects.filter(section=s['section']).order_by('name')),
+        ('cart: by session', Cart.objects.filter(session_id=s['session_id'])),
+        ('cart: by user', Cart.objects.filter(user_id=s['user_id'])),
+        ('cart: items', CartItem.objects.filter(cart_id=s['cart_id'])),
+        ('orders: customer history', Order.objects.filter(user_id=s['user_id']).order_by('-ordered_at')),
+        ('orders: recent', Order.objects.order_by('-ordered_at', '-id')[:5]),
+        ('orders: by status',
+         Order.objects.filter(status=Order.STATUS_PENDING).order_by('-ordered_at')[:50]),
+        ('orders: by payment and status',
+         Order.objects.filter(payment_status=Order.PAYMENT_PAID, status=Order.STATUS_CONFIRMED).values('pk')),
+    ]
+
+
+# SQLite: "SCAN usersApp_product" (no index) vs "SCAN ... USING INDEX"/"SEARCH ...".
+# PostgreSQL: "Seq Scan on ...".
+_FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (\S+)(?!.*\bUSING\b)'),
+    'postgresql': re.compile(r'Seq Scan on (\S+)'),
+}
+_SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY)'),
+    'postgresql': re.compile(r'\bSort\b'),
+}
+
+
+def plan_problems(plan, vendor=None):
+    """Full scans and unindexed sorts found in an EXPLAIN ``plan``."""
+    vendor = vendor or connection.vendor
+    problems = []
+    scan, sort = _FULL_SCAN.get(vendor), _SORT.get(vendor)
+    for line in plan.splitlines():
+        if scan and (match := scan.search(line)):
+            problems.append(f'full scan of {match.group(1)}')
+        if sort and sort.search(line):
+            problems.append('sort without an index')
+    return problems
@@ -0,0 +1,129 @@
+"""
+HTTP validators and cache policy for catalogue pages.
+
+``conditional_page`` computes an ETag (and, for product pages, a
+Last-Modified) *before* the view runs and answers a matching
+``If-None-Match`` / ``If-Modified-Since`` with 304, so a revalidation
+costs a few cache lookups and no template render. The validators come
+from state that already tracks catalogue changes:
+
+- listings: the version counter of every category the listing can show
+  (one category, a section's categories, or the global catalogue version
+  for unfiltered and search pages) plus the normalized query string;
+- product pages: ``Product.updated_at`` and its category's version.
+
+Every ETag also carries who it was rendered for, because the header
+differs between visitors. Anonymous listings are marked ``public`` so a
+CDN or proxy can store them. Anything that embeds a CSRF token or
+account data is ``private``. Everything sends ``Vary: Cookie``.
+"""
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from . import caching
+from .models import Category
+
+
+def shared_max_age():
+    return getattr(settings, 'CATALOGUE_HTTP_MAX_AGE', 60)
+
+
+def _etag(*parts):
+    return '"%s"' % hashlib.md5('|'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+def _audience(user):
+    """Who the page was rendered for: ETags must differ whenever the page does."""
+    return f'u{user.pk}' if user.is_authenticated else 'anon'
+
+
+# --- 1. VALIDATORS ---
+
+def listing_validators(request):
+    """(etag, None) for products / products_more with the current filters."""
+    category_id = request.GET.get('category', '')
+    section = request.GET.get('section')
+    if category_id.isdigit():
+        scope = sorted(caching.category_versions([int(category_id)]).items())
+    elif section in dict(Category.SECTION_CHOICES):
+        ids = [category.pk for category in caching.section_categories(section)]
+        scope = ['section', section, *sorted(caching.category_versions(ids).items())]
+    else:
+        scope = ['all', caching.catalogue_version()]
+    return _etag(request.path, caching.normalized_query(request), *scope), None
+
+
+def product_validators(request, pk):
+    """(etag, last modified) for product_detail, or (None, None) if there is no such product."""
+    product = caching.product_detail(pk)
+    if product is None:
+        return None, None
+    version = caching.category_versions([product.category_id])[product.category_id]
+    # The page embeds a CSRF token: a new cookie needs a fresh render
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return _etag(product.pk, product.updated_at.timestamp(), version, csrf), product.updated_at
+
+
+# --- 2. DECORATOR ---
+
+def _respond(request, user, validators, args, kwargs):
+    """(304 response or None, etag, last_modified)."""
+    etag, last_modified = validators(request, *args, **kwargs)
+    if etag is None:
+        return None, None, None
+    etag = etag[:-1] + '-' + _audience(user) + '"'
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp), etag, timestamp
+
+
+def _finish(request, user, response, etag, last_modified, shared):
+    if response.status_code in (200, 304) and etag:
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+    if shared and not user.is_authenticated:
+        patch_cache_control(response, public=True, max_age=shared_max_age())
+    else:
+        # Stored by the browser only, and revalidated (cheaply, see above) every time
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def conditional_page(validators, shared=False):
+    """
+    Answer conditional GETs from ``validators(request, *args, **kwargs)``
+    and set the cache policy. ``shared``: anonymous responses may be stored
+    by shared caches (the page embeds nothing visitor-specific). Put it
+    outside ``cache_anonymous_response``. Works on sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                user = await request.auser()
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                response, etag, last_modified = await sync_to_async(_respond)(request, user, validators, args, kwargs)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(request, user, response, etag, last_modified, shared)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            user = request.user
+            response, etag, last_modified = _respond(request, user, validators, args, kwargs)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _finish(request, user, response, etag, last_modified, shared)
+        return wrapper
+    return decorator
@@ -0,0 +1,187 @@
+"""
+Responsive image variants.
+
+When a Product or Category is saved with a new image (admin, ProductForm
+or anywhere else), ``schedule`` queues ``generate_variants`` on a small
+thread pool after the transaction commits. The worker resizes the upload
+to each of ``IMAGE_VARIANT_WIDTHS`` (never upscaling) in every format of
+``IMAGE_VARIANT_FORMATS`` that Pillow can write. It stores the files
+under a name derived from the source's content hash, so a re-run does
+no work and a replaced image never reuses a stale URL. It then records what
+it wrote in the object's ``image_variants`` field.
+
+``{% responsive_image %}`` (usersApp.templatetags.image_tags) turns that
+record into a ``<picture>`` with per-format ``srcset``s and a lazy
+``<img>``; until the variants exist it falls back to the original file.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection as db_connection, transaction
+from PIL import Image, ImageOps, features
+
+from . import caching, listings
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name, MIME type, file extension and encoder options
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', 'avif', {'quality': 55, 'speed': 6}),
+    'webp': ('WEBP', 'image/webp', 'webp', {'quality': 78, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def widths():
+    return sorted(_setting('IMAGE_VARIANT_WIDTHS', (160, 320, 640, 1024)))
+
+
+def formats():
+    """Configured formats this Pillow build can encode; JPEG always last as the fallback."""
+    wanted = [f for f in _setting('IMAGE_VARIANT_FORMATS', ('avif', 'webp')) if f != 'jpeg']
+    return [f for f in wanted if features.check(f)] + ['jpeg']
+
+
+def is_current(obj):
+    """True if ``obj.image_variants`` describes the image it has now."""
+    variants = obj.image_variants or {}
+    return bool(obj.image) and variants.get('source') == obj.image.name
+
+
+# --- 1. GENERATION ---
+
+def _resized(image, width, fmt):
+    height = round(image.height * width / image.width)
+    resized = image.resize((width, height), Image.Resampling.LANCZOS) if width != image.width else image
+    if fmt == 'jpeg' and resized.mode != 'RGB':
+        flat = Image.new('RGB', resized.size, 'white')
+        flat.paste(resized, mask=resized.getchannel('A') if 'A' in resized.getbands() else None)
+        resized = flat
+    pillow_format, _, _, options = FORMATS[fmt]
+    out = io.BytesIO()
+    resized.save(out, pillow_format, **options)
+    return out.getvalue()
+
+
+def build_variants(field_file):
+    """
+    Write every variant of ``field_file`` to its storage and return the
+    record for ``image_variants``.
+    """
+    storage = field_file.storage
+    with field_file.open('rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem = posixpath.splitext(field_file.name)[0]
+    folder = f'variants/{stem}-{digest}'
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+    sizes = [w for w in widths() if w < image.width] + [min(image.width, widths()[-1])]
+    sizes = sorted(set(sizes))
+
+    record = {'source': field_file.name, 'width': image.width, 'height': image.height, 'sources': {}}
+    for fmt in formats():
+        ext = FORMATS[fmt][2]
+        entries = []
+        for width in sizes:
+            name = f'{folder}/{width}.{ext}'
+            if not storage.exists(name):  # same content, same name: nothing to redo
+                storage.save(name, ContentFile(_resized(image, width, fmt)))
+            entries.append([width, name])
+        record['sources'][fmt] = entries
+    return record
+
+
+def generate_variants(model_label, pk):
+    """Build and record variants for one object; skipped if its image changed meanwhile."""
+    model = apps.get_model(model_label)
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None or not obj.image or is_current(obj):
+        return None
+    record = build_variants(obj.image)
+    # Conditional on the image still being the one we processed
+    updated = model.objects.filter(pk=pk, image=obj.image.name).update(image_variants=record)
+    if updated:
+        _invalidate(model, pk)
+    return record
+
+
+def _invalidate(model, pk):
+    # .update() skips the post_save receivers that usually do this
+    if model._meta.model_name == 'product':
+        caching.invalidate_products([pk])
+        listings.refresh([pk])
+    else:
+        caching.invalidate_categories()
+    caching.bump_catalogue_version()
+
+
+def _generate_in_thread(model_label, pk):
+    try:
+        return generate_variants(model_label, pk)
+    except Exception:
+        logger.exception('Image variants failed for %s %s', model_label, pk)
+    finally:
+        db_connection.close()  # each pool thread opened its own connection
+
+
+# --- 2. SCHEDULING ---
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=_setting('IMAGE_WORKERS', 2),
+                                       thread_name_prefix='image-variants')
+        return _pool
+
+
+def schedule(obj):
+    """
+    Queue variant generation for ``obj`` once the current transaction
+    commits. With IMAGE_VARIANTS_ASYNC off (tests, scripts) it runs inline.
+    """
+    label, pk = obj._meta.label, obj.pk
+
+    def submit():
+        if _setting('IMAGE_VARIANTS_ASYNC', True):
+            _executor().submit(_generate_in_thread, label, pk)
+        else:
+            generate_variants(label, pk)
+
+    transaction.on_commit(submit, robust=True)
+
+
+# --- 3. TEMPLATES ---
+
+def srcset(obj, fmt):
+    """``srcset`` value for one format, or '' when there are no variants."""
+    if not is_current(obj):
+        return ''
+    storage = obj.image.storage
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in obj.image_variants['sources'].get(fmt, []))
+
+
+def fallback(obj, width):
+    """(url, width) of the smallest JPEG variant at least ``width`` wide, else the largest one."""
+    entries = obj.image_variants['sources']['jpeg']
+    for entry_width, name in entries:
+        if entry_width >= width:
+            return obj.image.storage.url(name), entry_width
+    return obj.image.storage.url(entries[-1][1]), entries[-1][0]
@@ -0,0 +1,179 @@
+"""
+Inventory.
+
+Stock is kept per ``ProductVariant`` (product + size + color) for products
+that have variants, and on ``Product.stock`` for the ones that don't.
+``Product.stock`` of a product with variants is the sum of its variants'
+stock, re-derived from them here (after a checkout, once it commits), and
+``Product.in_stock`` is a stored generated column (``stock > 0``) copied
+to the listing read model.
+
+- ``availability`` answers "how many of each cart line can be bought?"
+  for a whole cart with one query;
+- ``reserve`` takes the units at checkout with conditional
+  ``UPDATE ... SET stock = stock - n WHERE stock >= n`` statements, one
+  per variant row, so nobody can take the last unit of a size twice.
+  Nothing is read first and nothing is locked with SELECT ... FOR UPDATE;
+  the only locks are the ones those UPDATEs hold until commit. The parent
+  product row is not one of them, so checkouts of different variants of
+  the same product don't queue behind each other.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from . import caching, listings
+from .models import Product, ProductVariant
+
+# Sent by sync_product_stock with changes={product_id: (old stock, new stock)}
+stock_synced = Signal()
+
+
+class OutOfStock(Exception):
+    def __init__(self, products):
+        self.products = products
+        names = ', '.join(p.name for p in products)
+        super().__init__(f'Not enough stock for: {names}')
+
+
+def line_key(item):
+    """(product_id, size_id, color_id) of a cart item or order line."""
+    return item.product_id, item.size_id, item.color_id
+
+
+def _variant_rows(product_ids):
+    return ProductVariant.objects.filter(product_id__in=product_ids).values_list(
+        'product_id', 'size_id', 'color_id', 'pk', 'stock'
+    )
+
+
+def _by_product(rows):
+    """{product_id: {(size_id, color_id): (variant_id, stock)}} for products that have variants."""
+    variants = defaultdict(dict)
+    for product_id, size_id, color_id, pk, stock in rows:
+        variants[product_id][size_id, color_id] = (pk, stock)
+    return variants
+
+
+def _variant_stock(product_ids):
+    return _by_product(_variant_rows(product_ids))
+
+
+def _mark(items, variants):
+    available = {}
+    for item in items:
+        product_id, size_id, color_id = key = line_key(item)
+        if product_id in variants:
+            available[key] = variants[product_id].get((size_id, color_id), (None, 0))[1]
+        else:
+            available[key] = item.product.stock
+        item.available = available[key]
+    return available
+
+
+def availability(items):
+    """
+    {line key: units available} for cart ``items`` (with ``product``
+    loaded), in one query; also set as ``item.available``. A size/color
+    that a product with variants doesn't offer has 0 available.
+    """
+    return _mark(items, _variant_stock({item.product_id for item in items}))
+
+
+async def aavailability(items):
+    """availability() for async views."""
+    rows = [row async for row in _variant_rows({item.product_id for item in items})]
+    return _mark(items, _by_product(rows))
+
+
+def reserve(quantities):
+    """
+    Take ``{line key: quantity}`` out of stock or raise OutOfStock. Run it
+    inside the caller's transaction so a shortage rolls back what was
+    already taken. Returns ``{product_id: quantity}`` taken from
+    ``Product.stock`` itself, i.e. for products without variants; the
+    totals of the others are re-derived once the transaction commits.
+    """
+    variants = _variant_stock({product_id for product_id, _, _ in quantities})
+    short = set()
+    per_product = defaultdict(int)
+    # Fixed order so concurrent checkouts take row locks in the same sequence
+    for key in sorted(quantities, key=lambda k: tuple(-1 if v is None else v for v in k)):
+        product_id, size_id, color_id = key
+        per_product[product_id] += quantities[key]
+        if product_id not in variants:
+            continue
+        variant_id, _ = variants[product_id].get((size_id, color_id), (None, 0))
+        taken = variant_id and ProductVariant.objects.filter(pk=variant_id, stock__gte=quantities[key]).update(
+            stock=F('stock') - quantities[key]
+        )
+        if not taken:
+            short.add(product_id)
+
+    taken = {product_id: quantity for product_id, quantity in per_product.items() if product_id not in variants}
+    for product_id in sorted(taken):
+        if not Product.objects.filter(pk=product_id, stock__gte=taken[product_id]).update(
+            stock=F('stock') - taken[product_id]
+        ):
+            short.add(product_id)
+    if short:
+        raise OutOfStock(list(Product.objects.filter(pk__in=short)))
+    sold_out = _mark_sold_out(taken)
+    if sold_out:
+        transaction.on_commit(lambda: _sold_out(sold_out), robust=True)
+    derived = sorted(set(per_product) - set(taken))
+    if derived:
+        transaction.on_commit(lambda: _settle(derived), robust=True)
+    return taken
+
+
+def _mark_sold_out(product_ids):
+    """{product_id: category_id} of ``product_ids`` now out of stock, flagged on their listing rows."""
+    sold_out = dict(Product.objects.filter(pk__in=product_ids, in_stock=False).values_list('pk', 'category_id'))
+    if sold_out:
+        listings.set_in_stock(list(sold_out))
+    return sold_out
+
+
+def _settle(product_ids):
+    # After commit: each statement is its own short transaction, so no
+    # checkout ever holds the product row
+    sync_product_stock(product_ids)
+    sold_out = _mark_sold_out(product_ids)
+    if sold_out:
+        _sold_out(sold_out)
+
+
+def _sold_out(categories):
+    # "In stock only" listings and the product pages change; nothing else does
+    caching.invalidate_products(list(categories))
+    caching.bump_category_versions(set(categories.values()))
+    caching.bump_catalogue_version()
+
+
+def sync_product_stock(product_ids):
+    """
+    Reset ``Product.stock`` to the sum of its variants, for products that
+    have any. ``update()`` sends no signals, so ``stock_synced`` reports
+    the stocks that moved (the dashboard's low-stock count follows it).
+    """
+    total = (
+        ProductVariant.objects.filter(product=OuterRef('pk'))
+        .order_by().values('product').annotate(total=Sum('stock')).values('total')
+    )
+    products = Product.objects.filter(pk__in=product_ids).filter(
+        Exists(ProductVariant.objects.filter(product=OuterRef('pk')))
+    )
+    before = dict(products.values_list('pk', 'stock'))
+    updated = products.update(stock=Coalesce(Subquery(total), 0))
+    changes = {
+        pk: (before[pk], stock)
+        for pk, stock in Product.objects.filter(pk__in=before).values_list('pk', 'stock')
+        if stock != before[pk]
+    }
+    if changes:
+        stock_synced.send(sender=Product, changes=changes)
+    return updated
@@ -0,0 +1,119 @@
+"""
+Product listing read model.
+
+``ProductListing`` holds one denormalized row per product: its section and
+category name, effective price and discount, sizes and colors as compact
+columns, the in-stock flag and the image variant record. The listing
+filters and sorts on that one table, so a section filter needs no join and
+"price" means the price the customer pays.
+
+Rows are written here only:
+
+- ``refresh(product_ids)`` rebuilds the rows of some products with one
+  upsert (called from the signals in ``usersApp.signals`` whenever a
+  product, its sizes/colors, its variants or its images change);
+- ``refresh_category(category)`` rewrites the copied category columns with
+  one UPDATE;
+- ``rebuild()`` recomputes the whole table in chunks
+  (``manage.py rebuild_product_listing``).
+
+Every write also tells ``usersApp.facets`` which rows changed, so the
+per-process facet bitsets can catch up without reloading the table.
+
+Writers that bypass signals with ``QuerySet.update()`` (checkout stock,
+image variants) call ``refresh`` or ``set_in_stock`` themselves.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Prefetch
+
+from . import facets
+from .models import Color, Product, ProductListing, Size
+
+COPIED_FIELDS = [
+    'category', 'section', 'category_name', 'name', 'price', 'discount_price', 'effective_price',
+    'discount_percent', 'size_ids', 'size_names', 'color_ids', 'color_names', 'in_stock', 'image',
+    'image_variants', 'created_at',
+]
+
+
+def discount_percent(price, discount_price):
+    if not discount_price or not price or discount_price >= price:
+        return 0
+    return int(((price - discount_price) * 100 / price).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def listing_row(product):
+    """Unsaved ProductListing for ``product`` (category, sizes and colors loaded)."""
+    sizes = list(product.sizes.all())
+    colors = list(product.colors.all())
+    return ProductListing(
+        product_id=product.pk,
+        category_id=product.category_id,
+        section=product.category.section,
+        category_name=product.category.name,
+        name=product.name,
+        price=product.price,
+        discount_price=product.discount_price,
+        effective_price=product.discount_price or product.price,
+        discount_percent=discount_percent(product.price, product.discount_price),
+        size_ids=','.join(str(size.pk) for size in sizes),
+        size_names=','.join(size.name for size in sizes),
+        color_ids=','.join(str(color.pk) for color in colors),
+        color_names=','.join(color.name for color in colors),
+        in_stock=product.stock > 0,
+        image=product.image.name or '',
+        image_variants=product.image_variants,
+        created_at=product.created_at,
+    )
+
+
+def _products():
+    return Product.objects.select_related('category').prefetch_related(
+        Prefetch('sizes', queryset=Size.objects.order_by('pk')),
+        Prefetch('colors', queryset=Color.objects.order_by('pk')),
+    )
+
+
+def _upsert(rows):
+    ProductListing.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['product'], update_fields=COPIED_FIELDS,
+    )
+
+
+def refresh(product_ids):
+    """Rebuild the listing rows of ``product_ids`` (deleted products just have none)."""
+    product_ids = {pk for pk in product_ids if pk is not None}
+    if product_ids:
+        _upsert([listing_row(product) for product in _products().filter(pk__in=product_ids)])
+        facets.changed(product_ids)
+
+
+def refresh_category(category):
+    """Copy a renamed or moved category onto its products' rows."""
+    rows = ProductListing.objects.filter(category=category)
+    rows.update(section=category.section, category_name=category.name)
+    facets.changed(rows.values_list('pk', flat=True))
+
+
+def set_in_stock(product_ids):
+    """Re-read ``Product.in_stock`` for rows whose stock changed through ``update()``."""
+    for in_stock in (True, False):
+        ids = Product.objects.filter(pk__in=product_ids, in_stock=in_stock).values('pk')
+        ProductListing.objects.filter(pk__in=ids).exclude(in_stock=in_stock).update(in_stock=in_stock)
+    facets.changed(product_ids)
+
+
+def rebuild(chunk_size=500):
+    """Recompute every row, a primary-key chunk at a time; returns the number of rows written."""
+    written = 0
+    last_pk = 0
+    while True:
+        chunk = list(_products().filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not chunk:
+            break
+        _upsert([listing_row(product) for product in chunk])
+        written += len(chunk)
+        last_pk = chunk[-1].pk
+    facets.changed(facets.EVERYTHING)
+    return written
@@ -0,0 +1,221 @@
+"""
+Outbox-backed email.
+
+Requests never talk to SMTP: ``enqueue_email`` inserts an EmailOutbox row
+(inside the caller's transaction, so an order and its confirmation email
+commit or roll back together) and returns immediately. The
+``send_queued_mail`` command drains the outbox:
+
+- ``claim_batch`` marks due rows as ``sending`` for one worker with a
+  conditional UPDATE, so two workers never send the same row, and rows
+  left in ``sending`` by a crashed worker are reclaimed after a lease;
+- ``send_batch`` sends a batch over a single ``get_connection()``;
+- failures are retried with exponential backoff until ``max_attempts``,
+  after which the row is parked as ``failed``.
+
+Everything goes through Django's email backends, so the locmem and file
+backends work for tests and local development.
+"""
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def batch_size():
+    return _setting('EMAIL_OUTBOX_BATCH_SIZE', 50)
+
+
+def max_attempts():
+    return _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the ``attempts``-th failure: 30s, 60s, 120s ... capped at 1h."""
+    base = _setting('EMAIL_OUTBOX_RETRY_DELAY', 30)
+    return min(base * 2 ** (attempts - 1), _setting('EMAIL_OUTBOX_MAX_RETRY_DELAY', 3600))
+
+
+def lease_seconds():
+    return _setting('EMAIL_OUTBOX_LEASE', 300)
+
+
+# --- 1. ENQUEUEING ---
+
+def _sender():
+    return settings.EMAIL_HOST_USER or settings.DEFAULT_FROM_EMAIL
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """Queue one email; ``recipients`` is an address or a list of them."""
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    return EmailOutbox.objects.create(
+        subject=subject, body=body, to=list(recipients), from_email=from_email or _sender(),
+    )
+
+
+async def aenqueue_email(subject, body, recipients, from_email=None):
+    """enqueue_email() for async views."""
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    return await EmailOutbox.objects.acreate(
+        subject=subject, body=body, to=list(recipients), from_email=from_email or _sender(),
+    )
+
+
+def enqueue_many(messages, from_email=None):
+    """Queue several (subject, body, recipients) tuples with one INSERT."""
+    rows = [
+        EmailOutbox(
+            subject=subject, body=body,
+            to=[recipients] if isinstance(recipients, str) else list(recipients),
+            from_email=from_email or _sender(),
+        )
+        for subject, body, recipients in messages
+    ]
+    return EmailOutbox.objects.bulk_create(rows, batch_size=500)
+
+
+# --- 2. CLAIMING ---
+
+def _due(now):
+    stale = now - timedelta(seconds=lease_seconds())
+    return (
+        Q(status=EmailOutbox.STATUS_PENDING, next_attempt_at__lte=now)
+        | Q(status=EmailOutbox.STATUS_SENDING, claimed_at__lt=stale)
+    )
+
+
+def claim_batch(limit=None):
+    """Claim up to ``limit`` due rows for this worker and return them."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    ids = list(
+        EmailOutbox.objects.filter(_due(now))
+        .order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:limit or batch_size()]
+    )
+    if not ids:
+        return []
+    # Re-check the due condition in the UPDATE: a row another worker claimed
+    # between the SELECT and here no longer matches and is skipped.
+    EmailOutbox.objects.filter(_due(now), pk__in=ids).update(
+        status=EmailOutbox.STATUS_SENDING, claimed_by=token, claimed_at=now,
+    )
+    return list(EmailOutbox.objects.filter(claimed_by=token, status=EmailOutbox.STATUS_SENDING))
+
+
+# --- 3. SENDING ---
+
+def _message(row, connection):
+    return EmailMessage(row.subject, row.body, row.from_email or _sender(), row.to, connection=connection)
+
+
+def send_batch(rows):
+    """
+    Send claimed rows over one connection. Returns {'sent', 'retried', 'failed'}.
+    Messages go out one by one on the open connection so a bad address only
+    fails its own row.
+    """
+    stats = {'sent': 0, 'retried': 0, 'failed': 0}
+    if not rows:
+        return stats
+    sent, errors = [], {}
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for row in rows:
+            try:
+                connection.send_messages([_message(row, connection)])
+                sent.append(row.pk)
+            except Exception as exc:  # any backend error is a failed attempt
+                errors[row.pk] = f'{type(exc).__name__}: {exc}'
+    except Exception as exc:  # could not connect at all: every row failed
+        errors.update({row.pk: f'{type(exc).__name__}: {exc}' for row in rows if row.pk not in sent})
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    now = timezone.now()
+    if sent:
+        EmailOutbox.objects.filter(pk__in=sent).update(
+            status=EmailOutbox.STATUS_SENT, sent_at=now, attempts=F('attempts') + 1,
+            claimed_by='', claimed_at=None, last_error='',
+        )
+        stats['sent'] = len(sent)
+    for row in rows:
+        if row.pk not in errors:
+            continue
+        attempts = row.attempts + 1
+        if attempts >= max_attempts():
+            status, stats['failed'] = EmailOutbox.STATUS_FAILED, stats['failed'] + 1
+        else:
+            status, stats['retried'] = EmailOutbox.STATUS_PENDING, stats['retried'] + 1
+        EmailOutbox.objects.filter(pk=row.pk).update(
+            status=status, attempts=attempts, last_error=errors[row.pk][:2000],
+            next_attempt_at=now + timedelta(seconds=retry_delay(attempts)),
+            claimed_by='', claimed_at=None,
+        )
+    return stats
+
+
+# --- 4. WORKER ---
+
+def _drain_one(limit):
+    rows = claim_batch(limit)
+    stats = send_batch(rows)
+    stats['claimed'] = len(rows)
+    return stats
+
+
+def _drain_in_thread(limit):
+    try:
+        return _drain_one(limit)
+    finally:
+        db_connection.close()  # each pool thread opened its own connection
+
+
+def process_outbox(workers=1, limit=None):
+    """
+    Claim and send up to ``workers`` batches concurrently (a bounded pool,
+    whatever the backlog). Returns totals plus the elapsed time.
+    """
+    started = time.monotonic()
+    totals = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+    if workers <= 1:
+        results = [_drain_one(limit)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_drain_in_thread, [limit] * workers))
+    for stats in results:
+        for key in totals:
+            totals[key] += stats[key]
+    totals['seconds'] = round(time.monotonic() - started, 3)
+    return totals
+
+
+def queue_stats():
+    """Row counts per status and the age of the oldest pending message, in seconds."""
+    counts = dict(EmailOutbox.objects.values('status').annotate(n=Count('id')).values_list('status', 'n'))
+    stats = {status: counts.get(status, 0) for status, _ in EmailOutbox.STATUS_CHOICES}
+    oldest = (
+        EmailOutbox.objects.filter(status=EmailOutbox.STATUS_PENDING)
+        .aggregate(oldest=Min('created_at'))['oldest']
+    )
+    stats['oldest_pending_seconds'] = int((timezone.now() - oldest).total_seconds()) if oldest else 0
+    return stats
@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from usersApp.models import Product
+
+from .benchmark_storefront import git_commit, percentile
+
+MODES = {'wsgi': '0', 'asgi': '1'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sync (WSGI handler, thread pool) against async (ASGI handler, one event loop) "
+        "throughput for the storefront read views on the same data. Each mode runs in its own "
+        "process with DJANGO_ASYNC_STOREFRONT set accordingly. Run `seed_store` first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help="Requests per mode (default 400).")
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help="Requests in flight at once (default 32).")
+        parser.add_argument('--threads', type=int, default=4,
+                            help="WSGI worker threads, like gunicorn --threads (default 4).")
+        parser.add_argument('--output', help="JSON file to write (default .cache/benchmarks/asgi-<time>.json).")
+        parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)  # internal: run one mode
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            self.stdout.write(json.dumps(self._run_mode(options)))
+            return
+
+        results = {mode: self._spawn(mode, options) for mode in MODES}
+        report = {
+            'meta': {
+                'commit': git_commit(),
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'threads': options['threads'],
+                'products': Product.objects.count(),
+            },
+            'modes': results,
+        }
+        output = Path(options['output'] or settings.BASE_DIR / '.cache' / 'benchmarks'
+                      / f"asgi-{timezone.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+
+        self.stdout.write(f"{'mode':<5}  {'req/s':>8}  {'p50':>9}  {'p95':>9}  errors")
+        for mode, row in results.items():
+            self.stdout.write(f"{mode:<5}  {row['rps']:>8.1f}  {row['p50_ms']:>7.2f}ms  "
+                              f"{row['p95_ms']:>7.2f}ms  {row['errors']:>6}")
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+    def _spawn(self, mode, options):
+        command = [
+            sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'benchmark_asgi', '--mode', mode,
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+            '--threads', str(options['threads']),
+        ]
+        env = {**os.environ, 'DJANGO_ASYNC_STOREFRONT': MODES[mode]}
+        finished = subprocess.run(command, env=env, capture_output=True, text=True)
+        if finished.returncode:
+            raise CommandError(f"{mode} run failed:\n{finished.stderr}")
+        return json.loads(finished.stdout.strip().splitlines()[-1])
+
+    # --- child process ---
+
+    def _run_mode(self, options):
+        product = Product.objects.order_by('pk').first()
+        buyer = User.objects.filter(order__isnull=False, is_staff=False).order_by('pk').first()
+        if product is None or buyer is None:
+            raise CommandError("Needs products and a customer with orders; run `manage.py seed_store` first.")
+        # Logged in, so the anonymous page cache does not short-circuit the views
+        urls = list(islice(cycle([
+            reverse('products'), reverse('product_detail', args=[product.pk]),
+            reverse('cart'), reverse('profile'),
+        ]), options['requests']))
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            if options['mode'] == 'asgi':
+                started = time.perf_counter()
+                timings, errors = asyncio.run(self._drive_asgi(buyer, urls, options['concurrency']))
+            else:
+                started = time.perf_counter()
+                timings, errors = self._drive_wsgi(buyer, urls, options['threads'])
+            elapsed = time.perf_counter() - started
+
+        return {
+            'rps': round(len(urls) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+        }
+
+    def _drive_wsgi(self, buyer, urls, threads):
+        local = threading.local()
+
+        def fetch(url):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(buyer)
+            started = time.perf_counter()
+            status = local.client.get(url).status_code
+            return (time.perf_counter() - started) * 1000, status
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(fetch, urls))
+            list(pool.map(lambda _: connections.close_all(), range(threads)))
+        return [ms for ms, _ in results], sum(status >= 400 for _, status in results)
+
+    async def _drive_asgi(self, buyer, urls, concurrency):
+        client = AsyncClient()
+        await client.aforce_login(buyer)
+        gate = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with gate:
+                started = time.perf_counter()
+                status = (await client.get(url)).status_code
+                return (time.perf_counter() - started) * 1000, status
+
+        results = await asyncio.gather(*(fetch(url) for url in urls))
+        return [ms for ms, _ in results], sum(status >= 400 for _, status in results)
+
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+from django.utils import timezone
+
+from .benchmark_storefront import git_commit, percentile
+
+# Environment for each child process (see shop_project.database)
+PROFILES = {
+    # What settings.py used to be: rollback journal, BEGIN DEFERRED, a new
+    # connection per request
+    'default': {'DJANGO_SQLITE_TUNING': '0', 'DJANGO_DB_CONN_MAX_AGE': '0'},
+    # The current defaults: WAL, synchronous=NORMAL, busy timeout, BEGIN
+    # IMMEDIATE, persistent connections
+    'tuned': {},
+}
+ITEMS = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare SQLite write throughput under concurrent writers with SQLite's default settings "
+        "and with the tuned profile from shop_project.database. Each profile runs in its own "
+        "process on a fresh scratch database; each transaction reads a stock row, decrements it "
+        "and inserts an order row, like checkout, while reader threads keep querying."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent writer threads (default 8).")
+        parser.add_argument('--transactions', type=int, default=200,
+                            help="Transactions per writer thread (default 200).")
+        parser.add_argument('--readers', type=int, default=2,
+                            help="Threads reading while the writers run (default 2).")
+        parser.add_argument('--output', help="JSON file to write (default .cache/benchmarks/db-writes-<time>.json).")
+        parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)  # internal: run one profile
+
+    def handle(self, *args, **options):
+        if options['profile']:
+            self.stdout.write(json.dumps(self._run_profile(options)))
+            return
+
+        with tempfile.TemporaryDirectory() as directory:
+            results = {profile: self._spawn(profile, directory, options) for profile in PROFILES}
+        report = {
+            'meta': {
+                'commit': git_commit(),
+                'created': timezone.now().isoformat(),
+                'threads': options['threads'],
+                'transactions': options['threads'] * options['transactions'],
+                'readers': options['readers'],
+            },
+            'profiles': results,
+        }
+        output = Path(options['output'] or settings.BASE_DIR / '.cache' / 'benchmarks'
+                      / f"db-writes-{timezone.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+
+        self.stdout.write(f"{'profile':<8}  {'commits/s':>9}  {'p50':>9}  {'p95':>9}  {'locked':>6}  reads")
+        for profile, row in results.items():
+            self.stdout.write(f"{profile:<8}  {row['commits_per_s']:>9.1f}  {row['p50_ms'] or 0:>7.2f}ms  "
+                              f"{row['p95_ms'] or 0:>7.2f}ms  {row['locked']:>6}  {row['reads']}")
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+    def _spawn(self, profile, directory, options):
+        command = [
+            sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'benchmark_db_writes',
+            '--profile', profile, '--threads', str(options['threads']),
+            '--transactions', str(options['transactions']), '--readers', str(options['readers']),
+        ]
+        env = {
+            **os.environ, **PROFILES[profile],
+            'DJANGO_DB_ENGINE': 'sqlite',
+            'DJANGO_DB_NAME': os.path.join(directory, f'{profile}.sqlite3'),
+            'DJANGO_DB_REPLICAS': '',
+        }
+        finished = subprocess.run(command, env=env, capture_output=True, text=True)
+        if finished.returncode:
+            raise CommandError(f"{profile} run failed:\n{finished.stderr}")
+        return json.loads(finished.stdout.strip().splitlines()[-1])
+
+    # --- child process ---
+
+    def _run_profile(self, options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The write benchmark compares SQLite profiles.")
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE bench_stock (id INTEGER PRIMARY KEY, stock INTEGER NOT NULL)')
+            cursor.execute('CREATE TABLE bench_order (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, '
+                           'placed_at REAL NOT NULL)')
+            cursor.executemany('INSERT INTO bench_stock (id, stock) VALUES (%s, %s)',
+                               [(item, 10 ** 9) for item in range(ITEMS)])
+        connection.close()
+
+        timings, locked, reads = [], [0], [0]
+        lock = threading.Lock()
+        writing = threading.Event()
+
+        def write(number):
+            mine, failures = [], 0
+            for i in range(options['transactions']):
+                item = (number * 7 + i) % ITEMS
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic(), connection.cursor() as cursor:
+                        cursor.execute('SELECT stock FROM bench_stock WHERE id = %s', [item])
+                        cursor.execute('UPDATE bench_stock SET stock = stock - 1 WHERE id = %s', [item])
+                        cursor.execute('INSERT INTO bench_order (item_id, placed_at) VALUES (%s, %s)',
+                                       [item, time.time()])
+                except OperationalError:  # "database is locked"
+                    failures += 1
+                else:
+                    mine.append((time.perf_counter() - started) * 1000)
+                close_old_connections()  # what request_finished does after every request
+            connections.close_all()
+            with lock:
+                timings.extend(mine)
+                locked[0] += failures
+
+        def read():
+            count = 0
+            while writing.is_set():
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*), MAX(placed_at) FROM bench_order')
+                        cursor.fetchone()
+                    count += 1
+                except OperationalError:
+                    pass
+                close_old_connections()
+            connections.close_all()
+            with lock:
+                reads[0] += count
+
+        writing.set()
+        readers = [threading.Thread(target=read) for _ in range(options['readers'])]
+        writers = [threading.Thread(target=write, args=(n,)) for n in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        return {
+            'commits_per_s': round(len(timings) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 3) if timings else None,
+            'p95_ms': round(percentile(timings, 95), 3) if timings else None,
+            'commits': len(timings),
+            'locked': locked[0],
+            'reads': reads[0],
+            'journal_mode': journal_mode,
+            'seconds': round(elapsed, 3),
+        }
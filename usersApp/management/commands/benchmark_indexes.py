@@ -0,0 +1,84 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from usersApp import seeding
+from usersApp.hot_queries import hot_queries
+from usersApp.models import Category, Order, Product
+
+INDEXED_MODELS = [Category, Product, Order]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot queries with and without the Meta.indexes of Category, Product and "
+        "Order. Everything (optional seed data, dropped indexes) is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0,
+                            help="Seed this many extra products first (rolled back afterwards).")
+        parser.add_argument('--orders', type=int, default=0,
+                            help="Seed this many extra orders first (rolled back afterwards).")
+        parser.add_argument('--runs', type=int, default=20, help="Timed runs per query (default 20).")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        results = {}
+        try:
+            with transaction.atomic():
+                self._seed(options['products'], options['orders'])
+                self._analyze()
+                for name, ms in self._time_all(options['runs']):
+                    results[name] = {'indexed_ms': ms}
+                self._drop_indexes()
+                for name, ms in self._time_all(options['runs']):
+                    results[name]['unindexed_ms'] = ms
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        width = max(len(name) for name in results)
+        self.stdout.write(f"{'query':<{width}}  {'indexed':>10}  {'no index':>10}  {'speedup':>8}")
+        for name, row in results.items():
+            speedup = row['unindexed_ms'] / row['indexed_ms'] if row['indexed_ms'] else 0
+            self.stdout.write(
+                f"{name:<{width}}  {row['indexed_ms']:>8.3f}ms  {row['unindexed_ms']:>8.3f}ms  {speedup:>7.1f}x"
+            )
+
+    def _time_all(self, runs):
+        for name, queryset in hot_queries():
+            list(queryset.all())  # warm up
+            started = time.perf_counter()
+            for _ in range(runs):
+                list(queryset.all())  # .all() clones, so every run hits the database
+            yield name, (time.perf_counter() - started) * 1000 / runs
+
+    def _drop_indexes(self):
+        # Plain DROP INDEX (the SQLite schema editor refuses to run inside
+        # a transaction); the surrounding rollback restores them.
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+        self._analyze()
+
+    def _analyze(self):
+        # Fresh planner statistics for both runs
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def _seed(self, products, orders):
+        if products or orders:
+            seeding.seed_store(products=products, orders=orders, carts=max(orders // 10, 1),
+                               users=max(orders // 20, 1))
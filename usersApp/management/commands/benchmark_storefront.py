@@ -0,0 +1,176 @@
+import json
+import math
+import statistics
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from usersApp import carts
+from usersApp.models import Cart, Order, Product, ProductVariant
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main storefront and manager endpoints through the test client and report "
+        "p50/p95 latency, queries and peak memory per endpoint as JSON. Run `seed_store` first; "
+        "everything the benchmark writes is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30, help="Timed requests per endpoint (default 30).")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per endpoint first (default 3).")
+        parser.add_argument('--output', help="JSON file to write (default .cache/benchmarks/storefront-<time>.json).")
+        parser.add_argument('--compare', help="Earlier results file to diff against.")
+
+    def handle(self, *args, **options):
+        # A variant when there is one, so checkout goes through per-size/colour stock
+        variant = (ProductVariant.objects.filter(stock__gt=0).select_related('product', 'size', 'color')
+                   .order_by('pk').first())
+        product = variant.product if variant else Product.objects.filter(stock__gt=0).order_by('pk').first()
+        buyer = User.objects.filter(order__isnull=False, is_staff=False).order_by('pk').first()
+        if product is None or buyer is None:
+            raise CommandError("Needs products and a customer with orders; run `manage.py seed_store` first.")
+
+        endpoints = {}
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+                endpoints = self._run(product, variant, buyer, options['iterations'], options['warmup'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+                'iterations': options['iterations'],
+                'products': Product.objects.count(),
+                'orders': Order.objects.count(),
+            },
+            'endpoints': endpoints,
+        }
+        output = Path(options['output'] or settings.BASE_DIR / '.cache' / 'benchmarks'
+                      / f"storefront-{timezone.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+
+        previous = json.loads(Path(options['compare']).read_text())['endpoints'] if options['compare'] else {}
+        self._print(endpoints, previous)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+    # --- scenarios ---
+
+    def _run(self, product, variant, buyer, iterations, warmup):
+        # Plenty of stock so repeated checkouts never run short (rolled back anyway)
+        Product.objects.filter(pk=product.pk).update(stock=10 ** 6)
+        options = {}
+        if variant is not None:
+            ProductVariant.objects.filter(pk=variant.pk).update(stock=10 ** 6)
+            options = {'size': variant.size, 'color': variant.color}
+        staff = User.objects.create(username=f'bench-staff-{time.time_ns()}', is_staff=True)
+        anonymous, customer, manager = Client(), Client(), Client()
+        customer.force_login(buyer)
+        manager.force_login(staff)
+        cart, _ = Cart.objects.get_or_create(user=buyer)
+
+        def fill_cart():
+            carts.add_item(cart, product, **options)
+
+        checkout_form = {'name': 'Bench', 'mobile': '9000000000', 'address': '1 Bench St', 'city': 'Pune'}
+        scenarios = [
+            ('products (anonymous)', anonymous, 'get', reverse('products'), None, None),
+            ('products (customer)', customer, 'get', reverse('products'), None, None),
+            ('product_detail', anonymous, 'get', reverse('product_detail', args=[product.pk]), None, None),
+            ('view_cart', customer, 'get', reverse('cart'), None, fill_cart),
+            ('add_to_cart', customer, 'post', reverse('add_to_cart', args=[product.pk]),
+             {name: option.pk for name, option in options.items() if option}, None),
+            ('place_order', customer, 'post', reverse('place_order'), checkout_form, fill_cart),
+            ('profile', customer, 'get', reverse('profile'), None, None),
+            ('view_orders', manager, 'get', reverse('view_orders'), None, None),
+            ('dashboard', manager, 'get', reverse('manager_dashboard'), None, None),
+        ]
+        return {
+            name: self._measure(client, method, url, data, setup, iterations, warmup)
+            for name, client, method, url, data, setup in scenarios
+        }
+
+    def _measure(self, client, method, url, data, setup, iterations, warmup):
+        def send():
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data) if data is not None else getattr(client, method)(url)
+            return response, (time.perf_counter() - started) * 1000
+
+        for _ in range(warmup):
+            if setup:
+                setup()
+            send()
+
+        timings, queries, status = [], [], None
+        for _ in range(iterations):
+            if setup:
+                setup()  # not timed or counted
+            with CaptureQueriesContext(connection) as captured:
+                response, elapsed = send()
+            timings.append(elapsed)
+            queries.append(len(captured.captured_queries))
+            status = response.status_code
+
+        if setup:
+            setup()
+        tracemalloc.start()
+        send()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'status': status,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': round(statistics.median(queries), 1),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    # --- report ---
+
+    def _print(self, endpoints, previous):
+        width = max(len(name) for name in endpoints)
+        self.stdout.write(f"{'endpoint':<{width}}  status  {'p50':>9}  {'p95':>9}  queries  {'peak':>9}")
+        for name, row in endpoints.items():
+            line = (f"{name:<{width}}  {row['status']:>6}  {row['p50_ms']:>7.2f}ms  {row['p95_ms']:>7.2f}ms  "
+                    f"{row['queries']:>7}  {row['peak_kb']:>7.0f}KB")
+            before = previous.get(name)
+            if before and before['p50_ms']:
+                change = (row['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+                line += f"  p50 {change:+.0f}%, queries {before['queries']} -> {row['queries']}"
+            self.stdout.write(line)
@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from usersApp import images
+from usersApp.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Build responsive image variants for products and categories whose image has none yet "
+        "(or all with --force), and report the image weight of a listing page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'IMAGE_WORKERS', 2),
+                            help="Images processed in parallel (default IMAGE_WORKERS).")
+        parser.add_argument('--force', action='store_true', help="Rebuild images that already have variants.")
+        parser.add_argument('--report', action='store_true',
+                            help="Only compare the image bytes of the first 48 listing cards.")
+
+    def handle(self, *args, **options):
+        if options['report']:
+            self._report()
+            return
+        if options['force']:
+            for model in (Product, Category):
+                model.objects.exclude(image_variants={}).update(image_variants={})
+
+        jobs = [
+            (obj._meta.label, obj.pk)
+            for model in (Product, Category)
+            for obj in model.objects.exclude(image='').exclude(image=None).only('image', 'image_variants')
+            if not images.is_current(obj)
+        ]
+        started = time.perf_counter()
+        if options['workers'] <= 1:
+            records = [images.generate_variants(*job) for job in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                records = list(pool.map(lambda job: images._generate_in_thread(*job), jobs))
+        done = sum(1 for record in records if record)
+        self.stdout.write(self.style.SUCCESS(
+            f"{done} of {len(jobs)} images processed in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def _report(self, cards=48, card_width=320):
+        original = optimized = 0
+        products = Product.objects.exclude(image='').exclude(image=None).order_by('-created_at', '-id')[:cards]
+        for product in products:
+            storage = product.image.storage
+            original += storage.size(product.image.name)
+            if images.is_current(product):
+                # What a browser with AVIF/WebP support fetches for a card at 1x
+                best = next(iter(product.image_variants['sources'].values()))
+                name = next((n for w, n in best if w >= card_width), best[-1][1])
+                optimized += storage.size(name)
+            else:
+                optimized += storage.size(product.image.name)
+        if not original:
+            self.stdout.write("No product images to compare.")
+            return
+        self.stdout.write(
+            f"{len(products)} cards: originals {original / 1024:.0f}KB, variants {optimized / 1024:.0f}KB "
+            f"({original / max(optimized, 1):.1f}x smaller)"
+        )
@@ -0,0 +1,72 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from usersApp.models import Cart
+
+DB_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def delete_in_chunks(queryset, chunk_size, pause=0.0):
+    """
+    Delete the rows of ``queryset`` a primary-key batch at a time, each in
+    its own short transaction, so no single statement holds table locks for
+    long. Returns the number of rows deleted (cascades not counted).
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            _, per_model = model.objects.filter(pk__in=pks).delete()
+        deleted += per_model.get(model._meta.label, 0)
+        if len(pks) < chunk_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired database sessions and guest carts nobody has touched for a while, "
+        "in small batches. Safe to run from cron while the site is up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows per delete (default 1000).")
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Seconds to sleep between batches, to let other writers in (default 0.05).")
+        parser.add_argument('--cart-idle-days', type=float, default=None,
+                            help="Guest carts idle this long are deleted (default SESSION_COOKIE_AGE: "
+                                 "the session that pointed at them has expired by then).")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be deleted.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        idle_days = options['cart_idle_days']
+        idle = timedelta(days=idle_days) if idle_days is not None else timedelta(seconds=settings.SESSION_COOKIE_AGE)
+        targets = [('guest carts', Cart.objects.filter(user__isnull=True, updated_at__lt=now - idle))]
+        if settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+            targets.insert(0, ('expired sessions', Session.objects.filter(expire_date__lt=now)))
+        else:
+            self.stdout.write(f"{settings.SESSION_ENGINE} keeps no session rows; skipping sessions.")
+
+        for label, queryset in targets:
+            if options['dry_run']:
+                self.stdout.write(f"{label}: {queryset.count()} would be deleted")
+                continue
+            started = time.perf_counter()
+            deleted = delete_in_chunks(queryset, max(1, options['chunk_size']), options['pause'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: {deleted} deleted in {time.perf_counter() - started:.1f}s"
+            ))
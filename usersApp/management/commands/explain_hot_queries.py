@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from usersApp.hot_queries import hot_queries, plan_problems
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on every storefront hot query and flag full scans and unindexed sorts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Print the full plan for every query, not only flagged ones.")
+        parser.add_argument('--fail', action='store_true',
+                            help="Exit with an error if any query is flagged (for CI).")
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for name, queryset in hot_queries():
+            plan = queryset.explain()
+            problems = plan_problems(plan)
+            if problems:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"{name}: {', '.join(sorted(set(problems)))}"))
+            else:
+                self.stdout.write(f"{name}: ok")
+            if problems or options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if flagged and options['fail']:
+            raise CommandError(f"{flagged} hot queries need an index.")
+        style = self.style.WARNING if flagged else self.style.SUCCESS
+        self.stdout.write(style(f"{flagged} flagged."))
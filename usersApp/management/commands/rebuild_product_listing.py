@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from usersApp import listings
+
+
+class Command(BaseCommand):
+    help = "Recompute the ProductListing read model from the Product table (after fixtures, imports or raw SQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Products per upsert (default 500).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = listings.rebuild(chunk_size=max(1, options['chunk_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Product listing rebuilt: {written} rows in {time.perf_counter() - started:.1f}s"
+        ))
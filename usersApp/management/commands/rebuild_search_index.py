@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from usersApp.models import Product
+from usersApp.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index from the Product table."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Search index rebuilt with {type(backend).__name__} "
+            f"({Product.objects.count()} products)."
+        ))
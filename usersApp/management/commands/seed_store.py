@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from usersApp import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a reproducible synthetic dataset (categories, products with sizes/colors and variants, users, "
+        "carts, orders with status history), then rebuild the search index, listing read model and dashboard metrics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories-per-section', type=int, default=4)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--carts', type=int, default=20)
+        parser.add_argument('--orders', type=int, default=300)
+        parser.add_argument('--days', type=int, default=90,
+                            help="Spread product and order dates over this many days (default 90).")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed (default 42).")
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete rows from a previous seed run first.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            seeding.clear_seeded()
+            self.stdout.write("Removed previously seeded rows.")
+
+        created = seeding.seed_store(
+            categories_per_section=options['categories_per_section'],
+            products=options['products'],
+            users=options['users'],
+            carts=options['carts'],
+            orders=options['orders'],
+            days=options['days'],
+            seed=options['seed'],
+        )
+        self.stdout.write(', '.join(f"{count} {name}" for name, count in created.items()))
+
+        # Bulk inserts bypass the signals that keep these in sync
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('rebuild_product_listing', stdout=self.stdout)
+        call_command('rebuild_dashboard_metrics', stdout=self.stdout)
+        call_command('build_sales_rollups', days=options['days'] + 1, rebuild=True, stdout=self.stdout)
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded. Users are {seeding.PREFIX}user0..{options['users'] - 1} (@example.com)."
+        ))
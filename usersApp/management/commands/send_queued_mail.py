@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from usersApp import mailer
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox (once, or continuously with --loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2,
+                            help="Batches sent in parallel, one SMTP connection each (default 2).")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Messages per batch (default EMAIL_OUTBOX_BATCH_SIZE, 50).")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the outbox instead of exiting when it is drained.")
+        parser.add_argument('--interval', type=float, default=5,
+                            help="Seconds to sleep between polls when idle (default 5).")
+        parser.add_argument('--stats', action='store_true',
+                            help="Only print outbox counts and exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._print_stats()
+            return
+        workers = max(1, options['workers'])
+        try:
+            while True:
+                totals = mailer.process_outbox(workers=workers, limit=options['batch_size'])
+                if totals['claimed']:
+                    self.stdout.write(
+                        f"claimed={totals['claimed']} sent={totals['sent']} retried={totals['retried']} "
+                        f"failed={totals['failed']} in {totals['seconds']}s"
+                    )
+                    continue  # more may be due right away
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self._print_stats()
+
+    def _print_stats(self):
+        stats = mailer.queue_stats()
+        self.stdout.write(self.style.SUCCESS(
+            ' '.join(f"{key}={value}" for key, value in stats.items())
+        ))
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+FTS_TABLE = 'usersapp_product_fts'
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other databases use their own search backend
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"name, description, category, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE}(rowid, name, description, category) '
+        f'SELECT p.id, p.name, p.description, c.name '
+        f'FROM "usersApp_product" p JOIN "usersApp_category" c ON c.id = p.category_id'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usersApp', '0007_order_status_and_payment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:04
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_carts(apps, schema_editor):
+    """Fold duplicate carts and cart lines together so the constraints apply."""
+    Cart = apps.get_model('usersApp', 'Cart')
+    CartItem = apps.get_model('usersApp', 'CartItem')
+
+    for field in ('user_id', 'session_id'):
+        kept = {}
+        for cart in Cart.objects.exclude(**{field: None}).order_by('id'):
+            owner = getattr(cart, field)
+            if owner in kept:
+                CartItem.objects.filter(cart_id=cart.pk).update(cart_id=kept[owner])
+                cart.delete()
+            else:
+                kept[owner] = cart.pk
+
+    lines = {}
+    for item in CartItem.objects.order_by('id'):
+        key = (item.cart_id, item.product_id, item.size_id, item.color_id)
+        if key in lines:
+            lines[key].quantity += item.quantity
+            lines[key].save(update_fields=['quantity'])
+            item.delete()
+        else:
+            lines[key] = item
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usersApp', '0009_email_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user',), name='unique_cart_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('session_id__isnull', False)), fields=('session_id',), name='unique_cart_per_session'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(models.F('cart'), models.F('product'), django.db.models.functions.comparison.Coalesce('size', 0), django.db.models.functions.comparison.Coalesce('color', 0), name='unique_cart_line'),
+        ),
+    ]
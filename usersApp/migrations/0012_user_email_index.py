@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+# auth.User belongs to another app, so the index is created directly
+# rather than declared in a Meta the migration state would track.
+EMAIL_INDEX = models.Index(fields=['email'], name='auth_user_email_idx')
+
+
+def normalize_emails(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    User.objects.exclude(email='').update(email=Lower(Trim('email')))
+
+
+def add_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model(settings.AUTH_USER_MODEL), EMAIL_INDEX)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model(settings.AUTH_USER_MODEL), EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usersApp', '0011_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_emails, migrations.RunPython.noop),
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
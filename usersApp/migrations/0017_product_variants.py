@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:32
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usersApp', '0016_order_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('stock', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='in_stock',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('stock__gt', 0)), output_field=models.BooleanField()),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='color',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='usersApp.color'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='usersApp.product'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='size',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='usersApp.size'),
+        ),
+        migrations.AddConstraint(
+            model_name='productvariant',
+            constraint=models.UniqueConstraint(models.F('product'), django.db.models.functions.comparison.Coalesce('size', 0), django.db.models.functions.comparison.Coalesce('color', 0), name='unique_product_variant'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:35
+
+from decimal import ROUND_HALF_UP, Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_listing(apps, schema_editor):
+    # Same rows as usersApp.listings.rebuild(), with the historical models
+    Product = apps.get_model('usersApp', 'Product')
+    ProductListing = apps.get_model('usersApp', 'ProductListing')
+    rows = []
+    products = Product.objects.select_related('category').prefetch_related('sizes', 'colors').order_by('pk')
+    for product in products.iterator(chunk_size=500):
+        sizes = sorted(product.sizes.all(), key=lambda size: size.pk)
+        colors = sorted(product.colors.all(), key=lambda color: color.pk)
+        percent = 0
+        if product.discount_price and product.price and product.discount_price < product.price:
+            percent = int(((product.price - product.discount_price) * 100 / product.price)
+                          .quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+        rows.append(ProductListing(
+            product_id=product.pk,
+            category_id=product.category_id,
+            section=product.category.section,
+            category_name=product.category.name,
+            name=product.name,
+            price=product.price,
+            discount_price=product.discount_price,
+            effective_price=product.discount_price or product.price,
+            discount_percent=percent,
+            size_ids=','.join(str(size.pk) for size in sizes),
+            size_names=','.join(size.name for size in sizes),
+            color_ids=','.join(str(color.pk) for color in colors),
+            color_names=','.join(color.name for color in colors),
+            in_stock=product.stock > 0,
+            image=product.image.name or '',
+            image_variants=product.image_variants,
+            created_at=product.created_at,
+        ))
+    ProductListing.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usersApp', '0017_product_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='usersApp.product')),
+                ('section', models.CharField(max_length=20)),
+                ('category_name', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('effective_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_percent', models.PositiveSmallIntegerField(default=0)),
+                ('size_ids', models.CharField(blank=True, max_length=200)),
+                ('size_names', models.CharField(blank=True, max_length=200)),
+                ('color_ids', models.CharField(blank=True, max_length=200)),
+                ('color_names', models.CharField(blank=True, max_length=400)),
+                ('in_stock', models.BooleanField(default=True)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='products/')),
+                ('image_variants', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='usersApp.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-created_at', '-product'], name='listing_newest_idx'), models.Index(fields=['section', '-created_at', '-product'], name='listing_section_newest_idx'), models.Index(fields=['category', '-created_at', '-product'], name='listing_cat_newest_idx'), models.Index(fields=['effective_price', 'product'], name='listing_price_idx'), models.Index(fields=['section', 'effective_price', 'product'], name='listing_section_price_idx'), models.Index(fields=['category', 'effective_price', 'product'], name='listing_cat_price_idx'), models.Index(fields=['in_stock', '-created_at', '-product'], name='listing_instock_newest_idx')],
+            },
+        ),
+        migrations.RunPython(populate_listing, migrations.RunPython.noop),
+    ]
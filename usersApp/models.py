@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 # 1. Attributes for Filtering
 class Category(models.Model):
@@ -17,6 +19,14 @@ class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True, blank=True)
     image = models.ImageField(upload_to='categories/', null=True, blank=True)
+    # Resized copies of ``image``, written by usersApp.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # section pills and the section filter on the listing join
+            models.Index(fields=['section', 'name'], name='category_section_idx'),
+        ]
 
     def __str__(self):
         # Helpful representation in admin
@@ -41,19 +51,125 @@ class Product(models.Model):
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     description = models.TextField()
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     sizes = models.ManyToManyField(Size, blank=True) # Product can have multiple sizes
     colors = models.ManyToManyField(Color, blank=True)
+    # Units on hand; for products with variants, the sum of their stock (usersApp.inventory)
     stock = models.IntegerField(default=10)
+    # Precomputed by the database; copied to ProductListing, which the "in stock only" filter reads
+    in_stock = models.GeneratedField(
+        expression=models.Q(stock__gt=0), output_field=models.BooleanField(), db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Last change to anything product_detail shows; the page's Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Newest/price orderings for queries on Product itself; the storefront
+        # listing reads ProductListing, whose indexes mirror PRODUCT_ORDERINGS.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_newest_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='product_cat_newest_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='product_cat_price_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class ProductVariant(models.Model):
+    """
+    One buyable size/color combination of a product, with its own stock.
+    Products without variants are sold from ``Product.stock`` directly.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
+    size = models.ForeignKey(Size, on_delete=models.CASCADE, null=True, blank=True)
+    color = models.ForeignKey(Color, on_delete=models.CASCADE, null=True, blank=True)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Same key as a cart line; NULL size or color counts as a value
+            models.UniqueConstraint(
+                'product', Coalesce('size', 0), Coalesce('color', 0),
+                name='unique_product_variant',
+            ),
+        ]
+
+    def __str__(self):
+        options = ' / '.join(str(option) for option in (self.size, self.color) if option)
+        return f"{self.product} ({options})" if options else str(self.product)
+
+class ProductListing(models.Model):
+    """
+    Read model for the product listing: one row per product with everything
+    a card, a filter or a sort needs, so the listing is a single-table query.
+    Written only by usersApp.listings (signals and ``rebuild_product_listing``).
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    section = models.CharField(max_length=20)
+    category_name = models.CharField(max_length=100)
+    name = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # discount_price or price: what the customer pays, and what filters/sorts use
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_percent = models.PositiveSmallIntegerField(default=0)
+    # Comma-separated ids and names in display order, e.g. "3,4,5" / "S,M,L"
+    size_ids = models.CharField(max_length=200, blank=True)
+    size_names = models.CharField(max_length=200, blank=True)
+    color_ids = models.CharField(max_length=200, blank=True)
+    color_names = models.CharField(max_length=400, blank=True)
+    in_stock = models.BooleanField(default=True)
+    image = models.ImageField(upload_to='products/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        # Mirrors usersApp.views.PRODUCT_ORDERINGS
+        indexes = [
+            models.Index(fields=['-created_at', '-product'], name='listing_newest_idx'),
+            models.Index(fields=['section', '-created_at', '-product'], name='listing_section_newest_idx'),
+            models.Index(fields=['category', '-created_at', '-product'], name='listing_cat_newest_idx'),
+            models.Index(fields=['effective_price', 'product'], name='listing_price_idx'),
+            models.Index(fields=['section', 'effective_price', 'product'], name='listing_section_price_idx'),
+            models.Index(fields=['category', 'effective_price', 'product'], name='listing_cat_price_idx'),
+            models.Index(fields=['in_stock', '-created_at', '-product'], name='listing_instock_newest_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def sizes(self):
+        return self.size_names.split(',') if self.size_names else []
+
+    @property
+    def colors(self):
+        return self.color_names.split(',') if self.color_names else []
+
 # 3. Shopping Cart (Database-backed for persistence)
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     session_id = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # cleanup_sessions: guest carts nobody has touched for a while
+            models.Index(fields=['updated_at'], condition=models.Q(user__isnull=True),
+                         name='cart_guest_idle_idx'),
+        ]
+        constraints = [
+            # One cart per user and per guest session (see usersApp.cart)
+            models.UniqueConstraint(fields=['user'], condition=models.Q(user__isnull=False),
+                                    name='unique_cart_per_user'),
+            models.UniqueConstraint(fields=['session_id'], condition=models.Q(session_id__isnull=False),
+                                    name='unique_cart_per_session'),
+        ]
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -62,6 +178,15 @@ class CartItem(models.Model):
     color = models.ForeignKey(Color, on_delete=models.SET_NULL, null=True)
     quantity = models.IntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # One line per product/size/color; NULL size or color counts as a value
+            models.UniqueConstraint(
+                'cart', 'product', Coalesce('size', 0), Coalesce('color', 0),
+                name='unique_cart_line',
+            ),
+        ]
+
     @property
     def total_price(self):
         return self.quantity * (self.product.discount_price or self.product.price)
@@ -118,6 +243,19 @@ class Order(models.Model):
     ordered_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # customer order history, newest first
+            models.Index(fields=['user', '-ordered_at'], name='order_user_recent_idx'),
+            # manager order list / dashboard, overall and per status
+            models.Index(fields=['-ordered_at', '-id'], name='order_recent_idx'),
+            models.Index(fields=['status', '-ordered_at'], name='order_status_recent_idx'),
+            models.Index(fields=['payment_status', 'status'], name='order_payment_idx'),
+            models.Index(fields=['payment_status', '-ordered_at'], name='order_payment_recent_idx'),
+            # order search by phone (prefix)
+            models.Index(fields=['phone'], name='order_phone_idx'),
+        ]
+
     def get_allowed_next_statuses(self):
         return Order.ALLOWED_TRANSITIONS.get(self.status, [])
 
@@ -147,4 +285,44 @@ class OrderStatusHistory(models.Model):
     from_status = models.CharField(max_length=20)
     to_status = models.CharField(max_length=20)
     changed_at = models.DateTimeField(auto_now_add=True)
-    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
\ No newline at end of file
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+# 5. Email Outbox (sent by `manage.py send_queued_mail`)
+class EmailOutbox(models.Model):
+    """
+    One outgoing email. Views only insert rows here (see usersApp.mailer);
+    the worker command claims due rows, sends them over one SMTP connection
+    per batch and retries failures with exponential backoff.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Due time for the next attempt; pushed back after each failure
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set while a worker holds the row so a crashed worker's rows can be reclaimed
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
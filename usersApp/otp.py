@@ -0,0 +1,135 @@
+"""
+One-time login codes.
+
+Codes live in the cache, not the session: ``issue`` stores an HMAC of the
+code under the (normalized) email with a TTL, and ``verify`` compares
+against it, so an OTP round trip touches neither the sessions table nor
+the user table until the code checks out. A code is single use and dies
+after ``OTP_MAX_ATTEMPTS`` wrong guesses.
+
+Issuing and verifying are rate limited per email and per client IP with
+token buckets kept in the same cache. A bucket's state is read and
+written without a lock, so a burst of concurrent requests can overdraw
+it by a token or two; that is fine for throttling, and the attempt
+counter (an atomic ``incr``) is what actually bounds guessing.
+"""
+import hashlib
+import hmac
+import math
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CODE_LENGTH = 4  # userApp/verify_otp.html has four boxes
+
+
+class OTPError(Exception):
+    pass
+
+
+class RateLimited(OTPError):
+    def __init__(self, retry_after):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f'Too many requests. Try again in {self.retry_after} seconds.')
+
+
+class InvalidCode(OTPError):
+    def __init__(self, message='Invalid OTP'):
+        super().__init__(message)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize_email(email):
+    """Trimmed and lower-cased: the form every stored email and every lookup uses."""
+    return (email or '').strip().lower()
+
+
+def _digest(*parts):
+    message = '|'.join(parts).encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+# --- 1. RATE LIMITS ---
+
+def take_token(name, capacity, per_second, now=None):
+    """
+    Take one token from bucket ``name`` (``capacity`` tokens, refilled at
+    ``per_second``); raises RateLimited when it is empty.
+    """
+    now = time.time() if now is None else now
+    key = f'otp:bucket:{_digest(name)}'
+    tokens, updated = cache.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * per_second)
+    if tokens < 1:
+        raise RateLimited((1 - tokens) / per_second)
+    # Kept until it would have refilled anyway
+    cache.set(key, (tokens - 1, now), int((capacity - tokens + 1) / per_second) + 1)
+
+
+def _throttle(action, email, ip):
+    # Verification is already capped per code by OTP_MAX_ATTEMPTS, so it
+    # only draws on the IP bucket (one client spraying many addresses).
+    if action == 'issue':
+        capacity, per_second = _setting('OTP_EMAIL_RATE', (3, 1 / 60))
+        take_token(f'{action}:email:{email}', capacity, per_second)
+    if ip:
+        capacity, per_second = _setting('OTP_IP_RATE', (20, 1 / 6))
+        take_token(f'{action}:ip:{ip}', capacity, per_second)
+
+
+# --- 2. CODES ---
+
+def _code_key(email):
+    return f'otp:code:{_digest(email)}'
+
+
+def _attempts_key(email):
+    return f'otp:attempts:{_digest(email)}'
+
+
+def issue(email, ip=None):
+    """A fresh code for ``email`` (replacing any earlier one); the caller sends it."""
+    email = normalize_email(email)
+    _throttle('issue', email, ip)
+    code = ''.join(secrets.choice('0123456789') for _ in range(CODE_LENGTH))
+    ttl = _setting('OTP_TTL', 300)
+    cache.set(_code_key(email), _digest(email, code), ttl)
+    cache.delete(_attempts_key(email))
+    return code
+
+
+def verify(email, code, ip=None):
+    """Consume the code for ``email``; raises InvalidCode or RateLimited."""
+    email = normalize_email(email)
+    _throttle('verify', email, ip)
+    expected = cache.get(_code_key(email))
+    if expected is None:
+        raise InvalidCode('Code expired. Please request a new one.')
+
+    attempts_key = _attempts_key(email)
+    cache.add(attempts_key, 0, _setting('OTP_TTL', 300))
+    try:
+        attempts = cache.incr(attempts_key)
+    except ValueError:  # expired in between
+        raise InvalidCode('Code expired. Please request a new one.')
+    if attempts > _setting('OTP_MAX_ATTEMPTS', 5):
+        cache.delete(_code_key(email))
+        raise InvalidCode('Too many wrong codes. Please request a new one.')
+
+    if not hmac.compare_digest(expected, _digest(email, code or '')):
+        raise InvalidCode()
+    # delete() reports whether the key was there, so only one request wins
+    if not cache.delete(_code_key(email)):
+        raise InvalidCode('Code expired. Please request a new one.')
+    cache.delete(attempts_key)
+
+
+def client_ip(request):
+    # REMOTE_ADDR only: X-Forwarded-For is client-controlled unless a proxy
+    # we trust rewrites it, and then the proxy should set REMOTE_ADDR.
+    return request.META.get('REMOTE_ADDR')
@@ -0,0 +1,121 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET, each page starts strictly after the sort key of the last
+row on the previous page, so the database can seek straight to it through
+an index and page 500 costs the same as page 1. The ordering must end in a
+unique column (the primary key) so the key is a total order.
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, per_page):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, e.g. ``('-created_at', '-id')``.
+    Ordering fields may be model fields or annotations on the queryset.
+    """
+
+    def __init__(self, queryset, ordering, per_page=24):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = tuple(ordering)
+        self.fields = [f.lstrip('-') for f in self.ordering]
+        self.per_page = per_page
+
+    # --- cursor encoding ---
+
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def _load_value(self, name, raw):
+        # Cursors come from the query string: only scalars, never null
+        if raw is None or isinstance(raw, bool) or not isinstance(raw, (str, int, float)):
+            raise InvalidCursor(f'{name}: {raw!r}')
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation (search_rank); JSON already round-trips numbers exactly
+            if isinstance(raw, str):
+                raise InvalidCursor(f'{name}: {raw!r}')
+            return raw
+        try:
+            value = field.to_python(raw)
+        except (ValidationError, TypeError, ValueError) as exc:
+            raise InvalidCursor(f'{name}: {raw!r}') from exc
+        if value is None:
+            raise InvalidCursor(f'{name}: {raw!r}')
+        return value
+
+    def encode_cursor(self, obj):
+        values = [self._dump_value(getattr(obj, name)) for name in self.fields]
+        payload = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError) as exc:
+            raise InvalidCursor(cursor) from exc
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        return [self._load_value(name, raw) for name, raw in zip(self.fields, values)]
+
+    # --- paging ---
+
+    def _after(self, values):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), per-field direction
+        condition = Q()
+        for i, order in enumerate(self.ordering):
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            step = Q(**{f'{self.fields[i]}__{lookup}': values[i]})
+            for j in range(i):
+                step &= Q(**{self.fields[j]: values[j]})
+            condition |= step
+        # Implied by the OR, but only a plain bound on the leading column lets
+        # the database seek into the index instead of scanning it from the top
+        bound = 'lte' if self.ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{self.fields[0]}__{bound}': values[0]}) & condition
+
+    def page(self, cursor=None):
+        """Return the page after ``cursor``; a bad cursor raises InvalidCursor."""
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor, self.per_page)
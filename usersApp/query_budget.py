@@ -0,0 +1,60 @@
+"""
+Query-budget assertions for tests.
+
+``assert_max_queries`` fails when a block runs more queries than allowed and
+prints them; ``QueryBudgetMixin.assertQueriesDoNotScale`` runs the same call
+before and after adding rows and fails if the count grows, which is how an
+N+1 shows up.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+def _format(queries):
+    return '\n'.join(f'{i}. {q["sql"]}' for i, q in enumerate(queries, 1))
+
+
+@contextmanager
+def assert_max_queries(limit, using=DEFAULT_DB_ALIAS):
+    with CaptureQueriesContext(connections[using]) as captured:
+        yield captured
+    executed = len(captured.captured_queries)
+    if executed > limit:
+        raise AssertionError(
+            f'{executed} queries executed, budget was {limit}:\n'
+            f'{_format(captured.captured_queries)}'
+        )
+
+
+def count_queries(func, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+    with CaptureQueriesContext(connections[using]) as captured:
+        func(*args, **kwargs)
+    return len(captured.captured_queries), captured.captured_queries
+
+
+class QueryBudgetMixin:
+    """TestCase mixin with query-budget assertions."""
+
+    def assertMaxQueries(self, limit, func, *args, **kwargs):
+        with assert_max_queries(limit):
+            return func(*args, **kwargs)
+
+    def assertQueriesDoNotScale(self, func, add_rows, rounds=2):
+        """
+        Call ``func`` with one row from ``add_rows()`` in place (so prefetches
+        that skip empty results still run), then add more rows and call it
+        again, ``rounds`` times. No call may run more queries than the first.
+        """
+        add_rows()
+        baseline, _ = count_queries(func)
+        for _ in range(rounds):
+            add_rows()
+            executed, queries = count_queries(func)
+            if executed > baseline:
+                self.fail(
+                    f'Query count grew with the data: {baseline} -> {executed}\n'
+                    f'{_format(queries)}'
+                )
+        return baseline
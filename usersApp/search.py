@@ -0,0 +1,269 @@
+"""
+Product search.
+
+Full-text search over product name, description and category name, with
+ranked results and section/category/price facet counts returned from the
+same call. Works on Product querysets and on the ProductListing read model
+(``field`` maps the lookups). The backend is taken from ``settings.PRODUCT_SEARCH_BACKEND``
+(a dotted path) or picked from the database vendor:
+
+- SQLite: an FTS5 inverted index kept in sync by the signals in
+  ``usersApp.signals`` and rebuilt with ``manage.py rebuild_search_index``.
+- PostgreSQL: the built-in full-text search (``SearchVector``/``SearchRank``).
+- Anything else: plain ``icontains`` filtering, unranked.
+"""
+import re
+from functools import cached_property
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Q, Value, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+
+from .models import Category, Product
+
+FTS_TABLE = 'usersapp_product_fts'
+
+# (min, max) ranges on the effective price; max=None means "and above"
+PRICE_BUCKETS = [
+    (0, 500),
+    (500, 1000),
+    (1000, 2500),
+    (2500, 5000),
+    (5000, None),
+]
+
+
+# Product lookups that have a column of their own on ProductListing
+LISTING_FIELDS = {
+    'category__name': 'category_name',
+    'category__section': 'section',
+    'description': 'product__description',
+}
+
+
+def field(queryset, name):
+    """``name`` (a Product lookup) as seen from ``queryset``'s model, Product or ProductListing."""
+    return name if queryset.model is Product else LISTING_FIELDS.get(name, name)
+
+
+def effective_price(queryset=None):
+    """Expression for the price a customer actually pays."""
+    if queryset is not None and queryset.model is not Product:
+        return F('effective_price')  # precomputed on the listing
+    return Coalesce('discount_price', 'price')
+
+
+# --- 1. BACKENDS ---
+
+class BaseSearchBackend:
+    """Interface every search backend implements."""
+
+    def filter(self, queryset, query):
+        """Restrict ``queryset`` to products matching ``query``."""
+        raise NotImplementedError
+
+    def rank(self, queryset, query):
+        """Annotate ``search_rank`` (higher is better) on a filtered queryset."""
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_products(self, products):
+        """Add or refresh the given products in the index."""
+
+    def remove_products(self, product_ids):
+        """Drop the given product ids from the index."""
+
+    def rebuild(self):
+        """Rebuild the whole index from the product table."""
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Unindexed fallback for databases without full-text support."""
+
+    def filter(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(**{field(queryset, 'description') + '__icontains': query}) |
+            Q(**{field(queryset, 'category__name') + '__icontains': query})
+        )
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """FTS5 index with bm25 ranking; name hits weigh more than category or description."""
+
+    weights = (10.0, 1.0, 4.0)  # name, description, category
+
+    @staticmethod
+    def to_match_expression(query):
+        # Quote every token so user input can't inject FTS5 syntax, and
+        # prefix-match it so "shir" finds "shirt".
+        tokens = re.findall(r'\w+', query.lower())
+        return ' '.join('"%s"*' % token for token in tokens)
+
+    def filter(self, queryset, query):
+        match = self.to_match_expression(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        ))
+
+    def rank(self, queryset, query):
+        match = self.to_match_expression(query)
+        if not match:
+            return super().rank(queryset, query)
+        weights = ', '.join(str(w) for w in self.weights)
+        # rowid is the product id: Product.id, or ProductListing.product_id
+        meta = queryset.model._meta
+        pk_column = f'{connection.ops.quote_name(meta.db_table)}.{connection.ops.quote_name(meta.pk.column)}'
+        return queryset.annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {pk_column}',
+            [match],
+            output_field=FloatField(),
+        ))
+
+    def index_products(self, products):
+        rows = [(p.pk, p.name, p.description, p.category.name) for p in products]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE}(rowid, name, description, category) '
+                f'VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids]
+            )
+
+    def rebuild(self):
+        product_table = connection.ops.quote_name(Product._meta.db_table)
+        category_table = connection.ops.quote_name(Category._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, name, description, category) '
+                f'SELECT p.id, p.name, p.description, c.name '
+                f'FROM {product_table} p JOIN {category_table} c ON c.id = p.category_id'
+            )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL full-text search. Queries are computed from the columns, so
+    pair it with a GIN index on the same ``SearchVector`` expression.
+    """
+
+    config = 'english'
+
+    def _vector(self, queryset):
+        from django.contrib.postgres.search import SearchVector
+        return (
+            SearchVector('name', weight='A', config=self.config) +
+            SearchVector(field(queryset, 'category__name'), weight='B', config=self.config) +
+            SearchVector(field(queryset, 'description'), weight='C', config=self.config)
+        )
+
+    def _query(self, query):
+        from django.contrib.postgres.search import SearchQuery
+        return SearchQuery(query, search_type='websearch', config=self.config)
+
+    def filter(self, queryset, query):
+        return queryset.annotate(search_document=self._vector(queryset)).filter(
+            search_document=self._query(query)
+        )
+
+    def rank(self, queryset, query):
+        from django.contrib.postgres.search import SearchRank
+        return queryset.annotate(search_rank=SearchRank(self._vector(queryset), self._query(query)))
+
+
+def get_search_backend():
+    path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
+
+
+# --- 2. FACETS ---
+
+def facet_counts(queryset):
+    """
+    Section, category and price-bucket counts for ``queryset`` in a single
+    grouped query (one row per category, summed up here).
+    """
+    bucket_counts = {}
+    for i, (low, high) in enumerate(PRICE_BUCKETS):
+        condition = Q(facet_price__gte=low)
+        if high is not None:
+            condition &= Q(facet_price__lt=high)
+        bucket_counts[f'price_{i}'] = Count('pk', filter=condition)
+
+    name, section = field(queryset, 'category__name'), field(queryset, 'category__section')
+    rows = (
+        queryset.order_by()
+        .annotate(facet_price=effective_price(queryset))
+        .values('category_id', name, section)
+        .annotate(total=Count('pk'), **bucket_counts)
+    )
+
+    section_labels = dict(Category.SECTION_CHOICES)
+    sections = {}
+    categories = []
+    prices = [0] * len(PRICE_BUCKETS)
+    for row in rows:
+        sections[row[section]] = sections.get(row[section], 0) + row['total']
+        categories.append({
+            'id': row['category_id'],
+            'name': row[name],
+            'section': row[section],
+            'count': row['total'],
+        })
+        for i in range(len(PRICE_BUCKETS)):
+            prices[i] += row[f'price_{i}']
+
+    return {
+        'sections': [
+            {'value': value, 'label': section_labels.get(value, value), 'count': count}
+            for value, count in sections.items()
+        ],
+        'categories': sorted(categories, key=lambda c: -c['count']),
+        'price': [
+            {'min': low, 'max': high, 'count': count}
+            for (low, high), count in zip(PRICE_BUCKETS, prices)
+        ],
+    }
+
+
+# --- 3. ENTRY POINT ---
+
+class SearchResults:
+    """Ranked products plus facet counts for one search."""
+
+    def __init__(self, backend, queryset, query):
+        self.matched = backend.filter(queryset, query)
+        self.products = backend.rank(self.matched, query)
+
+    @cached_property
+    def facets(self):
+        return facet_counts(self.matched)
+
+
+def search_products(query, queryset=None):
+    """Search ``queryset`` (all products by default) for ``query``."""
+    if queryset is None:
+        queryset = Product.objects.all()
+    return SearchResults(get_search_backend(), queryset, query)
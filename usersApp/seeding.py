@@ -0,0 +1,187 @@
+"""
+Synthetic store data for benchmarks and local development.
+
+``seed_store`` builds a reproducible dataset (same ``seed`` and scale, same
+rows) with bulk inserts: categories per section, products with sizes and
+colors (a share of them stocked per size/color variant), customers, carts,
+and orders with lines and a status history that follows
+Order.ALLOWED_TRANSITIONS. Seeded rows carry a ``seed-`` prefix so
+``clear_seeded`` can remove them again without touching real data.
+
+Bulk inserts skip model signals, so callers rebuild derived data (search
+index, listing read model, dashboard metrics, sales rollups) afterwards;
+the ``seed_store`` command does that.
+"""
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Cart, CartItem, Category, Color, Order, OrderItem, OrderStatusHistory, Product, ProductVariant, Size,
+)
+
+PREFIX = 'seed-'
+PASSWORD = 'stylehaven-seed'
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+COLORS = [
+    ('Black', '#000000'), ('White', '#FFFFFF'), ('Navy', '#1F2A44'), ('Olive', '#4A5D23'),
+    ('Red', '#B22222'), ('Beige', '#D8C3A5'), ('Grey', '#808080'), ('Pink', '#E8A0BF'),
+]
+CATEGORY_NAMES = ['T-Shirts', 'Shirts', 'Jeans', 'Jackets', 'Dresses', 'Knitwear', 'Shorts',
+                  'Skirts', 'Hoodies', 'Trousers', 'Bags', 'Belts', 'Caps', 'Scarves']
+ADJECTIVES = ['Classic', 'Relaxed', 'Slim', 'Organic', 'Linen', 'Vintage', 'Everyday', 'Tailored',
+              'Cropped', 'Oversized', 'Washed', 'Ribbed']
+
+
+def clear_seeded():
+    """Delete everything a previous ``seed_store`` created."""
+    with transaction.atomic():
+        Order.objects.filter(user__username__startswith=PREFIX).delete()
+        Cart.objects.filter(session_id__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
+        Category.objects.filter(slug__startswith=PREFIX).delete()  # cascades to products
+
+
+def _walk_statuses(rng):
+    """A plausible status path from Pending, e.g. Pending -> Confirmed -> Shipped."""
+    path = [Order.STATUS_PENDING]
+    while True:
+        options = Order.ALLOWED_TRANSITIONS[path[-1]]
+        if not options or rng.random() < 0.3:
+            return path
+        path.append(rng.choice(options))
+
+
+@transaction.atomic
+def seed_store(categories_per_section=4, products=200, users=50, carts=20, orders=300,
+               days=90, seed=42, variant_share=0.5):
+    """Insert a dataset at the given scale; returns {model name: rows created}."""
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    sizes = [Size.objects.get_or_create(name=name)[0] for name in SIZES]
+    colors = [Color.objects.get_or_create(name=name, defaults={'code': code})[0] for name, code in COLORS]
+
+    categories = Category.objects.bulk_create([
+        Category(section=section, name=name, slug=f'{PREFIX}{section}-{i}-{name.lower()}')
+        for section, _ in Category.SECTION_CHOICES
+        for i, name in enumerate(rng.sample(CATEGORY_NAMES, min(categories_per_section, len(CATEGORY_NAMES))))
+    ])
+
+    catalogue = []
+    for i in range(products):
+        category = rng.choice(categories)
+        price = Decimal(rng.randrange(299, 5999, 50))
+        catalogue.append(Product(
+            name=f'{rng.choice(ADJECTIVES)} {category.name.rstrip("s")} {i}',
+            category=category,
+            price=price,
+            discount_price=(price * Decimal('0.8')).quantize(Decimal('1')) if rng.random() < 0.25 else None,
+            description=f'{category.get_section_display()} {category.name.lower()} from the seeded catalogue.',
+            stock=rng.randint(0, 60),
+        ))
+    catalogue = Product.objects.bulk_create(catalogue, batch_size=500)
+    # created_at is auto_now_add, so backdate in a second pass
+    for product in catalogue:
+        product.created_at = now - timedelta(minutes=rng.randint(0, days * 24 * 60))
+    Product.objects.bulk_update(catalogue, ['created_at'], batch_size=500)
+    offered = {
+        product.pk: (rng.sample(sizes, rng.randint(2, len(sizes))), rng.sample(colors, rng.randint(1, 4)))
+        for product in catalogue
+    }
+    Product.sizes.through.objects.bulk_create([
+        Product.sizes.through(product_id=pk, size_id=size.pk)
+        for pk, (product_sizes, _) in offered.items() for size in product_sizes
+    ], batch_size=1000)
+    Product.colors.through.objects.bulk_create([
+        Product.colors.through(product_id=pk, color_id=color.pk)
+        for pk, (_, product_colors) in offered.items() for color in product_colors
+    ], batch_size=1000)
+
+    # Some products are stocked per size/color; their stock is the variants' sum
+    variants = ProductVariant.objects.bulk_create([
+        ProductVariant(product=product, size=size, color=color, stock=rng.randint(0, 15),
+                       sku=f'{PREFIX}{product.pk}-{size.name}-{color.name}'.lower())
+        for product in catalogue if rng.random() < variant_share
+        for size in offered[product.pk][0] for color in offered[product.pk][1]
+    ], batch_size=1000)
+    totals = defaultdict(int)
+    for variant in variants:
+        totals[variant.product_id] += variant.stock
+    stocked = [product for product in catalogue if product.pk in totals]
+    for product in stocked:
+        product.stock = totals[product.pk]
+    Product.objects.bulk_update(stocked, ['stock'], batch_size=500)
+
+    password = make_password(PASSWORD)  # hashed once, shared by every seeded user
+    customers = User.objects.bulk_create([
+        User(username=f'{PREFIX}user{i}', email=f'{PREFIX}user{i}@example.com', password=password,
+             date_joined=now - timedelta(days=rng.randint(0, days)))
+        for i in range(users)
+    ])
+
+    user_carts = min(carts - carts // 2, len(customers))  # the rest are guest carts
+    cart_rows = Cart.objects.bulk_create([
+        Cart(user=customer) for customer in rng.sample(customers, user_carts)
+    ] + [Cart(session_id=f'{PREFIX}session{i}') for i in range(carts - user_carts)])
+    cart_lines = {}
+    for cart in cart_rows:
+        for product in rng.sample(catalogue, min(len(catalogue), rng.randint(1, 4))):
+            product_sizes, product_colors = offered[product.pk]
+            cart_lines[(cart.pk, product.pk)] = CartItem(
+                cart=cart, product=product, quantity=rng.randint(1, 3),
+                size=rng.choice(product_sizes), color=rng.choice(product_colors),
+            )
+    CartItem.objects.bulk_create(cart_lines.values(), batch_size=1000)
+
+    order_rows, order_lines, paths = [], [], []
+    for _ in range(orders):
+        lines = [
+            (product, rng.randint(1, 3))
+            for product in rng.sample(catalogue, min(len(catalogue), rng.randint(1, 4)))
+        ]
+        total = sum((product.discount_price or product.price) * quantity for product, quantity in lines)
+        path = _walk_statuses(rng)
+        status = path[-1]
+        paid = status in (Order.STATUS_SHIPPED, Order.STATUS_DELIVERED) or (
+            status == Order.STATUS_CONFIRMED and rng.random() < 0.7)
+        order_rows.append(Order(
+            user=rng.choice(customers), full_name='Seeded Customer', address='12 Market Road',
+            city=rng.choice(['Mumbai', 'Delhi', 'Bengaluru', 'Chennai', 'Kolkata', 'Hyderabad']),
+            phone='9000000000', subtotal=total, discount=0, total_amount=total, status=status,
+            payment_status=Order.PAYMENT_PAID if paid else (
+                Order.PAYMENT_REFUNDED if status == Order.STATUS_CANCELLED and rng.random() < 0.5
+                else Order.PAYMENT_PENDING),
+        ))
+        order_lines.append(lines)
+        paths.append(path)
+    order_rows = Order.objects.bulk_create(order_rows, batch_size=500)
+
+    for order in order_rows:
+        order.ordered_at = now - timedelta(minutes=rng.randint(0, days * 24 * 60))
+    Order.objects.bulk_update(order_rows, ['ordered_at'], batch_size=500)
+
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=quantity,
+                  price=product.discount_price or product.price,
+                  size=rng.choice(SIZES), color=rng.choice(COLORS)[0])
+        for order, lines in zip(order_rows, order_lines) for product, quantity in lines
+    ], batch_size=1000)
+    history = OrderStatusHistory.objects.bulk_create([
+        OrderStatusHistory(order=order, from_status=before, to_status=after)
+        for order, path in zip(order_rows, paths) for before, after in zip(path, path[1:])
+    ], batch_size=1000)
+
+    return {
+        'categories': len(categories), 'products': len(catalogue), 'variants': len(variants),
+        'users': len(customers),
+        'carts': len(cart_rows), 'cart items': len(cart_lines), 'orders': len(order_rows),
+        'order items': sum(len(lines) for lines in order_lines), 'status changes': len(history),
+    }
@@ -0,0 +1,169 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching, carts, facets, images, inventory, listings, otp
+from .models import Category, Color, Product, ProductVariant, Size
+from .search import get_search_backend
+
+
+# --- SEARCH INDEX ---
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if raw:  # fixtures are indexed by rebuild_search_index
+        return
+    get_search_backend().index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created=False, raw=False, **kwargs):
+    # The category name is part of every product document in it
+    if raw or created:
+        return
+    products = instance.product_set.select_related('category').iterator(chunk_size=500)
+    get_search_backend().index_products(products)
+
+
+# --- CATALOGUE CACHE ---
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, raw=False, **kwargs):
+    # A product moved to another category changes both categories' listings
+    if instance.pk and not raw:
+        instance._previous_category_id = (
+            Product.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    caching.invalidate_products([instance.pk])
+    caching.bump_category_versions([instance.category_id, getattr(instance, '_previous_category_id', None)])
+    caching.bump_catalogue_version()
+
+
+def _products_changed(product_ids):
+    # Product pages list sizes and colors, and the listing filters and counts
+    # by them: drop the products from the cache, move their Last-Modified
+    # (usersApp.http_caching) and their categories' listing validators
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    caching.invalidate_products(product_ids)
+    products = Product.objects.filter(pk__in=product_ids)
+    products.update(updated_at=timezone.now())
+    listings.refresh(product_ids)
+    caching.bump_category_versions(products.values_list('category_id', flat=True))
+    caching.bump_catalogue_version()
+
+
+@receiver(m2m_changed, sender=Product.sizes.through)
+@receiver(m2m_changed, sender=Product.colors.through)
+def invalidate_product_variants_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            _products_changed([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # size.product_set.add(...): instance is the Size/Color
+        _products_changed(pk_set)
+    elif action == 'pre_clear':
+        # pk_set is None on clear, so collect the products before they go
+        instance._cleared_product_ids = list(instance.product_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        _products_changed(getattr(instance, '_cleared_product_ids', ()))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    caching.invalidate_categories()
+    caching.bump_category_versions([instance.pk])
+    # Cards show the category name
+    if instance.pk is not None:
+        caching.invalidate_products(
+            Product.objects.filter(category_id=instance.pk).values_list('pk', flat=True)
+        )
+    caching.bump_catalogue_version()
+
+
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Size)
+@receiver(post_delete, sender=Color)
+def invalidate_attribute_cache(sender, instance, **kwargs):
+    # Only the products carrying it list or filter by it
+    field = 'sizes' if sender is Size else 'colors'
+    _products_changed(Product.objects.filter(**{field: instance.pk}).values_list('pk', flat=True))
+
+
+def _deletes_products(origin):
+    # Variants deleted along with their product: its listing row goes too
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Product, Category)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def sync_variant_stock(sender, instance, raw=False, origin=None, **kwargs):
+    # Product.stock (and with it in_stock) is the sum of its variants
+    if raw or _deletes_products(origin):
+        return
+    inventory.sync_product_stock([instance.product_id])
+    _products_changed([instance.product_id])
+
+
+# --- LISTING READ MODEL ---
+
+@receiver(post_save, sender=Product)
+def refresh_listing(sender, instance, raw=False, **kwargs):
+    if not raw:  # fixtures: rebuild_product_listing
+        listings.refresh([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def drop_listing_facets(sender, instance, **kwargs):
+    # The row goes with the product (CASCADE); the facet bitsets still hold it
+    facets.changed([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_listing(sender, instance, created=False, raw=False, **kwargs):
+    if not (raw or created):
+        listings.refresh_category(instance)
+
+
+# --- IMAGE VARIANTS ---
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def queue_image_variants(sender, instance, raw=False, **kwargs):
+    # New or replaced image (admin, ProductForm, shell): resize after commit
+    if raw or not instance.image or images.is_current(instance):
+        return
+    images.schedule(instance)
+
+
+# --- CART ---
+
+@receiver(user_logged_in)
+def merge_guest_cart(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        carts.merge_into_user_cart(request, user)
+
+
+# --- ACCOUNTS ---
+
+@receiver(pre_save, sender=User)
+def normalize_user_email(sender, instance, **kwargs):
+    # OTP login looks users up by exact, normalized email (indexed)
+    instance.email = otp.normalize_email(instance.email)
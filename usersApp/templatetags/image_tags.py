@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from usersApp import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(obj, sizes='100vw', width=320, alt='', css_class='', loading='lazy'):
+    """
+    ``<picture>`` for ``obj.image``: one ``<source>`` per modern format and
+    a JPEG ``<img>`` with its own ``srcset``. ``width`` picks the ``src``
+    for browsers without srcset support; ``sizes`` should describe the
+    rendered width so the browser downloads the smallest variant that fits.
+    Before the variants exist it renders the original file.
+
+        {% responsive_image product sizes="(min-width: 1024px) 25vw, 50vw" alt=product.name %}
+    """
+    if not obj.image:
+        return ''
+    if not images.is_current(obj):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            obj.image.url, alt, css_class, loading,
+        )
+    src, src_width = images.fallback(obj, int(width))
+    variants = obj.image_variants
+    height = round(variants['height'] * src_width / variants['width'])
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((images.FORMATS[fmt][1], images.srcset(obj, fmt), sizes)
+         for fmt in variants['sources'] if fmt != 'jpeg'),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" '
+        'loading="{}" decoding="async"></picture>',
+        sources, src, images.srcset(obj, 'jpeg'), sizes, src_width, height, alt, css_class, loading,
+    )
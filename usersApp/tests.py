@@ -1,3 +1,1277 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import io
+import re
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import async_views, caching, carts, checkout, facets, images, inventory, mailer, otp, seeding, views
+from .urls import storefront_urlpatterns
+from .models import (
+    Cart, CartItem, Category, Color, EmailOutbox, Order, OrderItem, OrderStatusHistory, Product,
+    ProductListing, ProductVariant, Size,
+)
+from .hot_queries import hot_queries, plan_problems
+from .pagination import InvalidCursor, KeysetPaginator
+from .query_budget import QueryBudgetMixin
+from .search import search_products
+
+
+def make_product(category, name, price='999.00', **kwargs):
+    kwargs.setdefault('description', f'{name} description')
+    return Product.objects.create(category=category, name=name, price=Decimal(price), **kwargs)
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirts = Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        cls.dresses = Category.objects.create(section='women', name='Dresses', slug='women-dresses')
+        cls.oxford = make_product(cls.shirts, 'Oxford Shirt', '1200.00', description='Cotton button-down')
+        cls.linen = make_product(cls.shirts, 'Linen Kurta', '800.00', description='Breathable, pairs with a shirt')
+        cls.maxi = make_product(cls.dresses, 'Shirt Dress', '2600.00', discount_price=Decimal('450.00'))
+
+    def test_matches_are_ranked_by_name_first(self):
+        results = search_products('shirt')
+        names = list(results.products.order_by('-search_rank').values_list('name', flat=True))
+        self.assertEqual(set(names), {'Oxford Shirt', 'Linen Kurta', 'Shirt Dress'})
+        self.assertEqual(names[-1], 'Linen Kurta')
+
+    def test_prefix_and_category_matches(self):
+        self.assertEqual(search_products('dress').products.count(), 1)
+        self.assertEqual(search_products('oxf').products.get(), self.oxford)
+
+    def test_facet_counts(self):
+        facets = search_products('shirt').facets
+        self.assertEqual({s['value']: s['count'] for s in facets['sections']}, {'men': 2, 'women': 1})
+        self.assertEqual({c['id']: c['count'] for c in facets['categories']},
+                         {self.shirts.id: 2, self.dresses.id: 1})
+        # The discounted dress falls in the under-500 bucket
+        self.assertEqual([b['count'] for b in facets['price']], [1, 1, 1, 0, 0])
+
+    def test_index_follows_product_and_category_changes(self):
+        self.oxford.name = 'Polo Tee'
+        self.oxford.save()
+        self.assertFalse(search_products('oxford').products.exists())
+        self.assertTrue(search_products('polo').products.exists())
+
+        self.dresses.name = 'Gowns'
+        self.dresses.save()
+        self.assertEqual(search_products('gowns').products.get(), self.maxi)
+
+        self.maxi.delete()
+        self.assertFalse(search_products('gowns').products.exists())
+
+    def test_search_input_is_not_fts_syntax(self):
+        self.assertEqual(search_products('shirt OR "').products.count(), 0)
+        self.assertEqual(search_products('***').products.count(), 0)
+
+    def test_products_view_uses_search(self):
+        response = self.client.get(reverse('products'), {'q': 'shirt', 'section': 'men'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['current_sort'], 'relevance')
+        self.assertEqual(list(response.context['products'])[0].pk, self.oxford.pk)
+        self.assertEqual(response.context['section_counts'], {'men': 2, 'women': 1})
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(section='men', name='Tees', slug='men-tees')
+        # Repeated prices force the id tiebreaker to do its job
+        for i in range(25):
+            make_product(cls.category, f'Tee {i}', price=str(100 + (i % 4) * 50))
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, ordering, per_page=4):
+        paginator = KeysetPaginator(Product.objects.all(), ordering, per_page=per_page)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(p.id for p in page)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_walks_every_row_once_in_order(self):
+        for ordering in [('-created_at', '-id'), ('price', 'id'), ('-price', '-id')]:
+            with self.subTest(ordering=ordering):
+                expected = list(Product.objects.order_by(*ordering).values_list('id', flat=True))
+                self.assertEqual(self.walk(ordering), expected)
+
+    def test_later_pages_cost_the_same_query(self):
+        paginator = KeysetPaginator(Product.objects.all(), ('price', 'id'), per_page=4)
+        first = paginator.page()
+        with self.assertNumQueries(1):
+            paginator.page(first.next_cursor)
+
+    def test_bad_cursor(self):
+        paginator = KeysetPaginator(Product.objects.all(), ('price', 'id'))
+        for cursor in ['garbage', 'WzFd', 'WyJ4IiwieSJd']:
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+        response = self.client.get(reverse('products'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_first_page'])
+
+    def test_malformed_cursor_values(self):
+        def cursor(values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+        paginator = KeysetPaginator(Product.objects.all(), ('-created_at', '-id'))
+        for values in ([[1], 1], [{'a': 1}, 1], [None, None], [1, 1], [True, 1],
+                       ['2026-01-01T00:00:00', 'x'], ['2026-01-01T00:00:00', None]):
+            with self.subTest(values=values), self.assertRaises(InvalidCursor):
+                paginator.page(cursor(values))
+        self.assertEqual(paginator.page(cursor(['2999-01-01T00:00:00+00:00', 10 ** 6])).object_list[0].pk,
+                         Product.objects.latest('created_at', 'id').pk)
+
+        for params in ({'cursor': cursor([[1], 1])}, {'q': 'tee', 'sort': 'relevance', 'cursor': cursor(['x', 1])}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('products'), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['is_first_page'])
+
+    def test_later_pages_seek_into_the_index(self):
+        listing = ProductListing.objects.order_by('-created_at', '-pk')
+        paginator = KeysetPaginator(listing, ('-created_at', '-pk'), per_page=4)
+        values = paginator.decode_cursor(paginator.page().next_cursor)
+        plan = paginator.queryset.filter(paginator._after(values))[:5].explain()
+        # One range seek, in index order: no scan, no OR of index lookups, no sort
+        self.assertIn('created_at<', plan.replace(' ', ''))
+        for step in ('SCAN', 'MULTI-INDEX OR', 'TEMP B-TREE'):
+            self.assertNotIn(step, plan)
+
+    def test_listing_and_load_more(self):
+        response = self.client.get(reverse('products'), {'sort': 'low_high'})
+        self.assertEqual(response.context['total_count'], 25)
+        page = response.context['page']
+        self.assertEqual(len(page), 24)
+
+        more = self.client.get(reverse('products_more'), {'sort': 'low_high', 'cursor': page.next_cursor})
+        data = more.json()
+        self.assertFalse(data['has_next'])
+        self.assertEqual(data['html'].count('product-card '), 1)
+
+
+class StorefrontQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Storefront pages must not run more queries as rows are added."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('asha', 'asha@example.com', 'pw')
+        cls.category = Category.objects.create(section='women', name='Kurtas', slug='women-kurtas')
+        cls.sizes = [Size.objects.create(name=n) for n in ('S', 'M', 'L')]
+        cls.colors = [Color.objects.create(name=n, code=c) for n, c in (('Red', '#f00'), ('Blue', '#00f'))]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.counter = 0
+
+    def add_product(self):
+        self.counter += 1
+        product = make_product(self.category, f'Kurta {self.counter}')
+        product.sizes.set(self.sizes)
+        product.colors.set(self.colors)
+        return product
+
+    def add_cart_item(self):
+        CartItem.objects.create(cart=self.cart, product=self.add_product(),
+                                size=self.sizes[0], color=self.colors[0])
+
+    def add_order(self):
+        order = Order.objects.create(user=self.user, full_name='Asha', address='1 MG Road',
+                                     city='Pune', phone='9999999999', total_amount=0)
+        for _ in range(2):
+            OrderItem.objects.create(order=order, product=self.add_product(), quantity=1,
+                                     price=Decimal('10'), size='M', color='Red')
+
+    def get(self, name, *args):
+        cache.clear()
+        response = self.client.get(reverse(name, args=args))
+        self.assertEqual(response.status_code, 200)
+
+    def test_products(self):
+        self.assertQueriesDoNotScale(lambda: self.get('products'), self.add_product)
+
+    def test_product_search(self):
+        def search():
+            cache.clear()
+            self.client.get(reverse('products'), {'q': 'kurta'})
+        self.assertQueriesDoNotScale(search, self.add_product)
+
+    def test_product_detail(self):
+        product = self.add_product()
+
+        def add_options():
+            # Another size, colour and variant on the page, and a related product
+            self.counter += 1
+            size = Size.objects.create(name=f'X{self.counter}')
+            color = Color.objects.create(name=f'Shade {self.counter}', code='#999')
+            product.sizes.add(size)
+            product.colors.add(color)
+            ProductVariant.objects.create(product=product, size=size, color=color, stock=3)
+            self.add_product()
+
+        self.assertQueriesDoNotScale(lambda: self.get('product_detail', product.pk), add_options)
+        self.assertMaxQueries(8, self.get, 'product_detail', product.pk)
+
+    def test_cart(self):
+        self.assertQueriesDoNotScale(lambda: self.get('cart'), self.add_cart_item)
+
+    def test_checkout_page(self):
+        self.assertQueriesDoNotScale(lambda: self.get('place_order'), self.add_cart_item)
+
+    def test_profile(self):
+        self.assertQueriesDoNotScale(lambda: self.get('profile'), self.add_order)
+
+
+class CatalogueCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(section='kids', name='Shorts', slug='kids-shorts')
+        cls.size = Size.objects.create(name='XS')
+        cls.product = make_product(cls.category, 'Cargo Shorts')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_listing_is_served_from_cache(self):
+        url = reverse('products')
+        self.client.get(url, {'section': 'kids', 'q': ''})
+        # Same normalized query: no catalogue queries at all
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'q': '', 'section': 'kids'})
+        self.assertContains(response, 'Cargo Shorts')
+
+    def test_product_change_invalidates_listing_and_card(self):
+        url = reverse('products')
+        self.client.get(url)
+        self.product.name = 'Denim Shorts'
+        self.product.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Denim Shorts')
+        self.assertNotContains(response, 'Cargo Shorts')
+
+    def test_category_change_invalidates_section_list_and_cards(self):
+        self.assertEqual([c.name for c in caching.section_categories('kids')], ['Shorts'])
+        self.category.name = 'Bermudas'
+        self.category.save()
+        self.assertEqual([c.name for c in caching.section_categories('kids')], ['Bermudas'])
+        self.assertContains(self.client.get(reverse('products')), 'Bermudas')
+
+    def test_size_changes_invalidate_product_detail(self):
+        url = reverse('product_detail', args=[self.product.pk])
+        self.assertNotContains(self.client.get(url), '>XS<', html=False)
+        self.product.sizes.add(self.size)
+        self.assertContains(self.client.get(url), 'XS')
+        self.size.name = 'XXS'
+        self.size.save()
+        self.assertContains(self.client.get(url), 'XXS')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.size.product_set.clear()
+        self.assertNotContains(self.client.get(url), 'XXS')
+
+    def test_cache_hits_replay_status_and_headers(self):
+        calls = []
+
+        @caching.cache_anonymous_response
+        def view(request):
+            calls.append(request)
+            return HttpResponse('<p>page</p>', headers={'Content-Language': 'en-in', 'X-Robots-Tag': 'noindex'})
+
+        def get():
+            request = RequestFactory().get('/products/', {'section': 'kids'})
+            request.user = AnonymousUser()
+            return view(request)
+
+        rendered, cached = get(), get()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cached.status_code, cached.content), (200, b'<p>page</p>'))
+        self.assertEqual(dict(cached.items()), dict(rendered.items()))
+
+    def test_logged_in_pages_are_not_cached(self):
+        user = User.objects.create_user('ravi', 'ravi@example.com', 'pw')
+        self.client.force_login(user)
+        self.client.get(reverse('products'))
+        # user, products (session, count and categories come from the cache)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('products'))
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}
+            with override_settings(CACHES=backend):
+                self.client.get(reverse('products'))
+                self.product.delete()
+                self.assertNotContains(self.client.get(reverse('products')), 'Cargo Shorts')
+
+
+class ProductListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirts = Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        cls.sale = make_product(cls.shirts, 'Linen Shirt', '2000.00', discount_price=Decimal('1500.00'))
+        cls.plain = make_product(cls.shirts, 'Oxford Shirt', '1800.00')
+        cls.size_m = Size.objects.create(name='M')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_follow_products(self):
+        row = ProductListing.objects.get(pk=self.sale.pk)
+        self.assertEqual((row.section, row.category_name, row.effective_price, row.discount_percent),
+                         ('men', 'Shirts', Decimal('1500.00'), 25))
+        self.sale.sizes.add(self.size_m)
+        self.shirts.name = 'Formal Shirts'
+        self.shirts.save()
+        row.refresh_from_db()
+        self.assertEqual((row.sizes, row.size_ids, row.category_name), (['M'], str(self.size_m.pk), 'Formal Shirts'))
+        self.sale.delete()
+        self.assertFalse(ProductListing.objects.filter(pk=row.pk).exists())
+
+    def test_price_filter_and_sort_use_the_effective_price(self):
+        url = reverse('products')
+        response = self.client.get(url, {'max_price': '1600', 'sort': 'low_high'})
+        self.assertEqual([p.pk for p in response.context['products']], [self.sale.pk])
+        response = self.client.get(url, {'sort': 'high_low'})
+        self.assertEqual([p.pk for p in response.context['products']], [self.plain.pk, self.sale.pk])
+        self.assertContains(response, '25% OFF')
+
+        # One query for the page, on one table
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(url, {'section': 'men', 'max_price': '5000', 'sort': 'low_high'})
+        listing_sql = [q['sql'] for q in captured.captured_queries if 'usersApp_productlisting' in q['sql']]
+        self.assertTrue(listing_sql)
+        self.assertFalse([sql for sql in listing_sql if 'JOIN' in sql])
+
+    def test_rebuild_command(self):
+        ProductListing.objects.all().delete()
+        Product.objects.filter(pk=self.plain.pk).update(name='Oxford Shirt II')
+        out = io.StringIO()
+        call_command('rebuild_product_listing', chunk_size=1, stdout=out)
+        self.assertIn('2 rows', out.getvalue())
+        self.assertEqual(ProductListing.objects.get(pk=self.plain.pk).name, 'Oxford Shirt II')
+
+
+class ListingFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        shirts = Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        dresses = Category.objects.create(section='women', name='Dresses', slug='women-dresses')
+        cls.s, cls.m, cls.l = (Size.objects.create(name=n) for n in ('S', 'M', 'L'))
+        cls.red, cls.blue = (Color.objects.create(name=n, code=c) for n, c in (('Red', '#f00'), ('Blue', '#00f')))
+        cls.oxford = make_product(shirts, 'Oxford Shirt', '1000.00')
+        cls.oxford.sizes.set([cls.s, cls.m])
+        cls.oxford.colors.set([cls.red])
+        cls.linen = make_product(shirts, 'Linen Shirt', '2000.00', discount_price=Decimal('1500.00'))
+        cls.linen.sizes.set([cls.m, cls.l])
+        cls.linen.colors.set([cls.blue])
+        cls.maxi = make_product(dresses, 'Maxi Dress', '3000.00')
+        cls.maxi.sizes.set([cls.s])
+        cls.maxi.colors.set([cls.red, cls.blue])
+
+    def setUp(self):
+        cache.clear()  # new change-log counter: the index reloads
+
+    def listing(self, **params):
+        response = self.client.get(reverse('products'), params)
+        return {p.pk for p in response.context['products']}, response.context['facets']
+
+    def test_filters_combine(self):
+        self.assertEqual(self.listing(size=self.m.pk, color=self.red.pk)[0], {self.oxford.pk})
+        self.assertEqual(self.listing(size=[self.s.pk, self.l.pk])[0], {self.oxford.pk, self.linen.pk, self.maxi.pk})
+        self.assertEqual(self.listing(size=self.l.pk, color=self.red.pk)[0], set())
+        self.assertEqual(self.listing(min_price='1200', max_price='2500')[0], {self.linen.pk})
+        self.assertEqual(self.listing(on_sale='1', section='men')[0], {self.linen.pk})
+        self.assertEqual(self.listing(size='x', min_price='nan')[0], {self.oxford.pk, self.linen.pk, self.maxi.pk})
+
+    def test_counts_ignore_their_own_group(self):
+        _, counts = self.listing(size=self.m.pk)
+        self.assertEqual({o['name']: o['count'] for o in counts['sizes']}, {'S': 2, 'M': 2, 'L': 1})
+        self.assertEqual([o['name'] for o in counts['sizes'] if o['selected']], ['M'])
+        self.assertEqual({o['name']: o['count'] for o in counts['colors']}, {'Red': 1, 'Blue': 1})
+        self.assertEqual(counts['on_sale'], 1)
+        self.assertEqual([b['count'] for b in counts['price']], [0, 0, 2, 0, 0])
+
+        _, counts = self.listing(q='shirt', color=self.blue.pk)
+        self.assertEqual({o['name']: o['count'] for o in counts['sizes']}, {'S': 0, 'M': 1, 'L': 1})
+
+    def test_out_of_range_ids_are_ignored(self):
+        everything = {self.oxford.pk, self.linen.pk, self.maxi.pk}
+        huge = '9' * 23
+        self.assertEqual(self.listing(category=huge)[0], everything)
+        self.assertEqual(self.listing(size=[huge, self.l.pk], color=str(facets.MAX_ID + 1))[0], {self.linen.pk})
+
+    def test_large_matches_fall_back_to_subqueries(self):
+        params = {'size': [self.s.pk, self.l.pk], 'color': self.red.pk}
+        expected = self.listing(**params)[0]
+        cache.clear()  # not the cached page
+        with mock.patch.object(facets, 'MAX_PARAMS', 1), CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.listing(**params)[0], expected)
+        sql = ' '.join(q['sql'] for q in captured.captured_queries)
+        self.assertIn('product_sizes', sql)
+        self.assertIn('product_colors', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_no_m2m_joins(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.listing(size=[self.s.pk, self.m.pk], color=self.red.pk, section='men')
+        sql = ' '.join(q['sql'] for q in captured.captured_queries)
+        self.assertNotIn('product_sizes', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_index_catches_up_incrementally(self):
+        state = facets.index.sync()
+        self.assertEqual(facets.to_ids(state.get('size', self.l.pk)), [self.linen.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.maxi.sizes.add(self.l)
+            self.oxford.delete()
+        with self.assertNumQueries(1):  # the changed rows only
+            state = facets.index.sync()
+        self.assertEqual(facets.to_ids(state.get('size', self.l.pk)), [self.linen.pk, self.maxi.pk])
+        self.assertEqual(facets.to_ids(state.get('size', self.s.pk)), [self.maxi.pk])
+        self.assertEqual(facets.to_ids(state.all), [self.linen.pk, self.maxi.pk])
+
+    def test_catch_up_reads_changes_in_chunks(self):
+        facets.index.sync()
+        with self.captureOnCommitCallbacks(execute=True):
+            for product in (self.oxford, self.linen, self.maxi):
+                product.sizes.add(self.l)
+        with mock.patch.object(facets, 'MAX_PARAMS', 2), self.assertNumQueries(2):
+            state = facets.index.sync()
+        self.assertEqual(facets.to_ids(state.get('size', self.l.pk)), sorted([self.oxford.pk, self.linen.pk, self.maxi.pk]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_product_listing', stdout=io.StringIO())
+        with self.assertNumQueries(1):  # a rebuild reloads everything
+            facets.index.sync()
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('kiran', 'kiran@example.com', 'pw')
+        category = Category.objects.create(section='men', name='Polos', slug='men-polos')
+        cls.polo = make_product(category, 'Pique Polo', '800.00', discount_price=Decimal('600.00'), stock=3)
+        cls.tee = make_product(category, 'Basic Tee', '300.00', stock=1)
+        cls.size_m = Size.objects.create(name='M')
+        cls.size_l = Size.objects.create(name='L')
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+
+    def add(self, product, quantity, size=None):
+        CartItem.objects.create(cart=self.cart, product=product, quantity=quantity, size=size)
+
+    def place(self):
+        return checkout.place_order(self.user, self.cart, full_name='Kiran', phone='1',
+                                    address='2 Park St', city='Kolkata')
+
+    def test_places_order_and_reserves_stock(self):
+        self.add(self.polo, 1, self.size_m)
+        self.add(self.polo, 2, self.size_l)
+        self.add(self.tee, 1)
+        order, _ = self.place()
+
+        self.assertEqual(order.total_amount, Decimal('2100.00'))
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(sorted(order.items.values_list('size', flat=True)), ['', 'L', 'M'])
+        self.polo.refresh_from_db()
+        self.tee.refresh_from_db()
+        self.assertEqual((self.polo.stock, self.tee.stock), (0, 0))
+        self.assertFalse(self.cart.items.exists())
+        queued = EmailOutbox.objects.get()
+        self.assertEqual((queued.subject, queued.to), (f'Order Confirmed: #{order.id}', ['kiran@example.com']))
+
+    def test_out_of_stock_rolls_everything_back(self):
+        self.add(self.polo, 1)
+        self.add(self.tee, 2)
+        with self.assertRaises(checkout.OutOfStock) as raised:
+            self.place()
+        self.assertEqual(raised.exception.products, [self.tee])
+        self.polo.refresh_from_db()
+        self.assertEqual(self.polo.stock, 3)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_order_lines_are_one_insert(self):
+        for size in (self.size_m, self.size_l):
+            self.add(self.polo, 1, size)
+        with CaptureQueriesContext(connection) as captured:
+            self.place()
+        statements = [q['sql'] for q in captured.captured_queries]
+        self.assertEqual(sum(sql.startswith('INSERT INTO "usersApp_orderitem"') for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('UPDATE "usersApp_product"') for sql in statements), 1)
+
+    def test_view_reports_shortage(self):
+        self.add(self.tee, 5)
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('place_order'), {'name': 'Kiran', 'mobile': '1',
+                                                              'address': 'x', 'city': 'y'})
+        self.assertContains(response, 'Not enough stock for: Basic Tee')
+
+
+class InventoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('kiran', 'kiran@example.com', 'pw')
+        category = Category.objects.create(section='men', name='Polos', slug='men-polos')
+        cls.polo = make_product(category, 'Pique Polo', '800.00')
+        cls.cap = make_product(category, 'Cap', '200.00', stock=4)
+        cls.size_m = Size.objects.create(name='M')
+        cls.size_l = Size.objects.create(name='L')
+        cls.blue = Color.objects.create(name='Blue', code='#00f')
+        cls.medium_blue = ProductVariant.objects.create(product=cls.polo, size=cls.size_m, color=cls.blue, stock=2)
+        ProductVariant.objects.create(product=cls.polo, size=cls.size_l, color=cls.blue, stock=0)
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+
+    def add(self, product, quantity, size=None, color=None):
+        return CartItem.objects.create(cart=self.cart, product=product, quantity=quantity, size=size, color=color)
+
+    def place(self):
+        return checkout.place_order(self.user, self.cart, full_name='Kiran', phone='1',
+                                    address='2 Park St', city='Kolkata')
+
+    def test_product_stock_follows_its_variants(self):
+        self.polo.refresh_from_db()
+        self.assertEqual((self.polo.stock, self.polo.in_stock), (2, True))
+        self.medium_blue.stock = 0
+        self.medium_blue.save()
+        self.polo.refresh_from_db()
+        self.assertEqual((self.polo.stock, self.polo.in_stock), (0, False))
+
+    def test_availability_for_a_whole_cart_in_one_query(self):
+        self.add(self.polo, 3, self.size_m, self.blue)
+        self.add(self.polo, 1, self.size_l, self.blue)
+        self.add(self.polo, 1, self.size_m)  # not offered
+        self.add(self.cap, 1)
+        items = checkout.cart_lines(self.cart)
+        with self.assertNumQueries(1):
+            available = inventory.availability(items)
+        self.assertEqual([available[inventory.line_key(item)] for item in items], [2, 0, 0, 4])
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('cart')), 'Only 2 left in this size/colour')
+
+    def test_checkout_decrements_the_variant(self):
+        self.add(self.polo, 2, self.size_m, self.blue)
+        self.add(self.cap, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place()
+        self.medium_blue.refresh_from_db()
+        self.assertEqual(self.medium_blue.stock, 0)
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('stock', 'in_stock')), [(0, False), (3, True)])
+
+        response = self.client.get(reverse('products'), {'in_stock': '1'})
+        self.assertEqual([p.name for p in response.context['products']], ['Cap'])
+
+    def test_variant_checkout_leaves_the_product_row_alone(self):
+        self.add(self.polo, 1, self.size_m, self.blue)
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            self.place()
+        product_table = Product._meta.db_table
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith(f'UPDATE "{product_table}"')])
+        self.assertEqual(Product.objects.get(pk=self.polo.pk).stock, 2)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Product.objects.get(pk=self.polo.pk).stock, 1)
+
+    def test_sold_out_variant_rolls_back(self):
+        self.add(self.polo, 1, self.size_m, self.blue)
+        self.add(self.polo, 1, self.size_l, self.blue)
+        with self.assertRaises(checkout.OutOfStock) as raised:
+            self.place()
+        self.assertEqual(raised.exception.products, [self.polo])
+        self.medium_blue.refresh_from_db()
+        self.assertEqual(self.medium_blue.stock, 2)
+        self.assertFalse(Order.objects.exists())
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Parallel checkouts for the last units must never oversell."""
+
+    STOCK = 5
+    BUYERS = 12
+
+    def setUp(self):
+        category = Category.objects.create(section='women', name='Tops', slug='women-tops')
+        self.product = make_product(category, 'Crop Top', '499.00', stock=self.STOCK)
+        self.carts = []
+        for i in range(self.BUYERS):
+            user = User.objects.create(username=f'buyer{i}', email=f'buyer{i}@example.com')
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+            self.carts.append(cart)
+
+    def checkout(self, cart, results, start):
+        start.wait()
+        try:
+            for _ in range(200):
+                try:
+                    checkout.place_order(cart.user, cart, full_name='x', phone='1', address='x', city='x')
+                    results.append('ok')
+                    return
+                except checkout.OutOfStock:
+                    results.append('short')
+                    return
+                except OperationalError:
+                    time.sleep(0.005)  # SQLite allows one writer at a time; retry
+            results.append('gave up')
+        finally:
+            connection.close()
+
+    def test_no_overselling(self):
+        results, start = [], threading.Barrier(self.BUYERS)
+        threads = [threading.Thread(target=self.checkout, args=(cart, results, start)) for cart in self.carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count('ok'), self.STOCK, results)
+        self.assertEqual(results.count('short'), self.BUYERS - self.STOCK)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(OrderItem.objects.count(), self.STOCK)
+
+
+class BouncingBackend(LocmemBackend):
+    """locmem backend that rejects any address at bounce.test."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(address.endswith('@bounce.test') for address in message.to):
+                raise ConnectionRefusedError('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class EmailOutboxTests(TestCase):
+    def test_views_queue_instead_of_sending(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'asha', 'email': 'asha@example.com',
+            'password1': 'Unusual-pass-42', 'password2': 'Unusual-pass-42',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.STATUS_PENDING)
+
+    def test_batch_shares_one_connection(self):
+        mailer.enqueue_many([(f'Hello {i}', 'body', f'user{i}@example.com') for i in range(5)])
+        with mock.patch.object(mailer, 'get_connection', wraps=mailer.get_connection) as opened:
+            totals = mailer.process_outbox(workers=1)
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual((totals['claimed'], totals['sent']), (5, 5))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.STATUS_SENT).count(), 5)
+        self.assertEqual(mailer.process_outbox(workers=1)['claimed'], 0)
+
+    @override_settings(EMAIL_BACKEND='usersApp.tests.BouncingBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_park(self):
+        mailer.enqueue_email('Hi', 'body', 'ok@example.com')
+        bounced = mailer.enqueue_email('Hi', 'body', 'nobody@bounce.test')
+        totals = mailer.process_outbox(workers=1)
+        self.assertEqual((totals['sent'], totals['retried']), (1, 1))
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), (EmailOutbox.STATUS_PENDING, 1))
+        self.assertIn('mailbox unavailable', bounced.last_error)
+        self.assertGreater(bounced.next_attempt_at, timezone.now())
+        self.assertEqual(mailer.process_outbox(workers=1)['claimed'], 0)  # not due yet
+
+        EmailOutbox.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(mailer.process_outbox(workers=1)['failed'], 1)
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), (EmailOutbox.STATUS_FAILED, 2))
+
+    def test_claimed_rows_are_skipped_until_the_lease_expires(self):
+        queued = mailer.enqueue_email('Hi', 'body', 'a@example.com')
+        self.assertEqual(len(mailer.claim_batch()), 1)
+        self.assertEqual(mailer.claim_batch(), [])
+        EmailOutbox.objects.filter(pk=queued.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual([row.pk for row in mailer.claim_batch()], [queued.pk])
+
+    def test_command_with_file_backend(self):
+        mailer.enqueue_email('Your order', 'body', 'a@example.com')
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend', EMAIL_FILE_PATH=directory,
+        ):
+            call_command('send_queued_mail', workers=1, stdout=io.StringIO())
+            self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(mailer.queue_stats()['sent'], 1)
+
+
+class CartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('meera', 'meera@example.com', 'pw')
+        category = Category.objects.create(section='women', name='Dresses', slug='women-dresses')
+        cls.dress = make_product(category, 'Wrap Dress', '1500.00', discount_price=Decimal('1200.00'))
+        cls.scarf = make_product(category, 'Silk Scarf', '400.00')
+        cls.size_s = Size.objects.create(name='S')
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, product, **data):
+        return self.client.post(reverse('add_to_cart', args=[product.pk]), data)
+
+    def test_totals_come_from_one_cached_aggregate(self):
+        cart = Cart.objects.create(user=self.user)
+        carts.add_item(cart, self.dress, quantity=2)
+        carts.add_item(cart, self.scarf)
+        with self.assertNumQueries(1):
+            summary = carts.summary(cart.pk)
+        self.assertEqual(summary, {'count': 3, 'total': Decimal('2800.00')})
+        with self.assertNumQueries(0):
+            carts.summary(cart.pk)
+        carts.add_item(cart, self.scarf)
+        self.assertEqual(carts.summary(cart.pk)['total'], Decimal('3200.00'))
+
+    def test_repeat_adds_share_one_line(self):
+        cart = Cart.objects.create(user=self.user)
+        carts.add_item(cart, self.dress)
+        carts.add_item(cart, self.dress)
+        carts.add_item(cart, self.dress, size=self.size_s)
+        self.assertEqual(sorted(cart.items.values_list('quantity', flat=True)), [1, 2])
+        with self.assertRaises(IntegrityError):
+            CartItem.objects.create(cart=cart, product=self.dress)  # NULL size/color still unique
+
+    def test_guest_cart_merges_at_login(self):
+        self.add(self.dress, size=self.size_s.pk)
+        self.add(self.scarf)
+        user_cart = Cart.objects.create(user=self.user)
+        carts.add_item(user_cart, self.scarf, quantity=2)
+
+        self.client.force_login(self.user)
+        self.assertEqual(Cart.objects.count(), 1)
+        lines = dict(user_cart.items.values_list('product__name', 'quantity'))
+        self.assertEqual(lines, {'Wrap Dress': 1, 'Silk Scarf': 3})
+        self.assertEqual(self.client.get(reverse('cart_summary')).json(), {'count': 4, 'total': '2400.00'})
+
+    def test_summary_finds_a_saved_cart_in_a_new_session(self):
+        carts.add_item(Cart.objects.create(user=self.user), self.scarf, quantity=2)
+        self.client.force_login(self.user)  # no guest cart to merge
+        self.assertEqual(self.client.get(reverse('cart_summary')).json(), {'count': 2, 'total': '800.00'})
+        with self.assertNumQueries(0):  # the cart id is in the session now; totals are cached
+            self.client.get(reverse('cart_summary'))
+
+    def test_updates_are_scoped_to_the_visitors_cart(self):
+        other = Cart.objects.create(user=User.objects.create(username='other'))
+        carts.add_item(other, self.dress)
+        item = other.items.get()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('update_cart', args=[item.pk, 'remove']))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(CartItem.objects.filter(pk=item.pk).exists())
+
+    def test_carts_and_sessions_are_created_lazily(self):
+        for name in ('products', 'cart', 'cart_summary'):
+            self.client.get(reverse(name))
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+        self.add(self.scarf)
+        cart = Cart.objects.get()
+        self.assertTrue(cart.session_id.startswith('guest-'))
+        self.assertEqual(self.client.get(reverse('cart_summary')).json()['count'], 1)
+
+    def test_cleanup_deletes_in_chunks(self):
+        stale = timezone.now() - timedelta(days=30)
+        for i in range(5):
+            carts.add_item(Cart.objects.create(session_id=f'old-{i}'), self.scarf)
+        fresh = Cart.objects.create(session_id='fresh')
+        kept = Cart.objects.create(user=self.user)
+        Cart.objects.exclude(pk=fresh.pk).update(updated_at=stale)
+        for i in range(3):
+            Session.objects.create(session_key=f'expired{i}', session_data='', expire_date=stale)
+        Session.objects.create(session_key='live', session_data='', expire_date=timezone.now() + timedelta(days=1))
+
+        out = io.StringIO()
+        call_command('cleanup_sessions', chunk_size=2, pause=0, stdout=out)
+        self.assertIn('guest carts: 5 deleted', out.getvalue())
+        self.assertIn('expired sessions: 3 deleted', out.getvalue())
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), {fresh.pk, kept.pk})
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+
+class HotQueryIndexTests(TestCase):
+    # Section lives on Category, so a section listing sorted by date still
+    # needs a sort step after the join.
+    KNOWN_SORTS = {'products: section, newest'}
+
+    def test_plan_parser(self):
+        self.assertEqual(plan_problems('2 0 0 SCAN usersApp_order', 'sqlite'), ['full scan of usersApp_order'])
+        self.assertEqual(plan_problems('5 0 0 SCAN usersApp_order USING INDEX order_recent_idx', 'sqlite'), [])
+        self.assertEqual(plan_problems('Seq Scan on "usersApp_order"  (cost=0.00..1.01)', 'postgresql'),
+                         ['full scan of "usersApp_order"'])
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plans checked against SQLite')
+        category = Category.objects.create(section='men', name='Shirts', slug='men-shirts')
+        make_product(category, 'Oxford Shirt')
+        for name, queryset in hot_queries():
+            if name in self.KNOWN_SORTS:
+                continue
+            with self.subTest(name):
+                self.assertEqual(plan_problems(queryset.explain()), [])
+
+
+class SeedAndBenchmarkTests(TestCase):
+    SCALE = dict(categories_per_section=2, products=30, users=6, carts=4, orders=25)
+
+    def test_seed_is_reproducible_and_consistent(self):
+        first = seeding.seed_store(**self.SCALE)
+        snapshot = list(Product.objects.order_by('pk').values_list('name', 'price', 'stock'))
+        seeding.clear_seeded()
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+        self.assertEqual(seeding.seed_store(**self.SCALE), first)
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('name', 'price', 'stock')), snapshot)
+        self.assertEqual(Category.objects.count(), 8)
+        for change in OrderStatusHistory.objects.all():
+            self.assertIn(change.to_status, Order.ALLOWED_TRANSITIONS[change.from_status])
+        for order in Order.objects.prefetch_related('items'):
+            self.assertEqual(order.total_amount, sum(item.line_total for item in order.items.all()))
+        self.assertTrue(first['variants'])
+        for product in Product.objects.filter(variants__isnull=False).distinct().prefetch_related('variants'):
+            self.assertEqual(product.stock, sum(variant.stock for variant in product.variants.all()))
+
+    def test_benchmark_writes_json_and_rolls_back(self):
+        seeding.seed_store(**self.SCALE)
+        orders = Order.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('benchmark_storefront', iterations=2, warmup=0, output=output, stdout=io.StringIO())
+            with open(output) as handle:
+                results = json.load(handle)
+        self.assertEqual(Order.objects.count(), orders)
+        endpoints = results['endpoints']
+        self.assertEqual(set(endpoints), {
+            'products (anonymous)', 'products (customer)', 'product_detail', 'view_cart', 'add_to_cart',
+            'place_order', 'profile', 'view_orders', 'dashboard',
+        })
+        self.assertTrue(all(row['status'] in (200, 302) for row in endpoints.values()), endpoints)
+        self.assertLessEqual(endpoints['view_cart']['queries'], 10)
+
+    def test_db_write_benchmark_compares_profiles(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('benchmark_db_writes', threads=2, transactions=5, readers=1, output=output,
+                         stdout=io.StringIO())
+            with open(output) as handle:
+                profiles = json.load(handle)['profiles']
+        self.assertEqual({name: row['journal_mode'] for name, row in profiles.items()},
+                         {'default': 'delete', 'tuned': 'wal'})
+        self.assertEqual((profiles['tuned']['commits'], profiles['tuned']['locked']), (10, 0))
+
+
+def emailed_code(outbox_row):
+    return re.search(r'login code is: (\d+)', outbox_row.body).group(1)
+
+
+def otp_form(email, code):
+    return {'email': email, **{f'otp{i + 1}': digit for i, digit in enumerate(code)}}
+
+
+class OTPLoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('meera', '  Meera@Example.com ', 'pw')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_email_is_normalized_and_indexed(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'meera@example.com')
+        plan = User.objects.filter(email='meera@example.com').explain()
+        self.assertIn('auth_user_email_idx', plan)
+
+    def test_login_round_trip_writes_no_session_until_login(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('login'), {'login_type': 'user', 'email': 'MEERA@example.com'})
+        self.assertContains(response, 'meera@example.com')
+        self.assertFalse(any('django_session' in q['sql'] for q in queries.captured_queries))
+        code = emailed_code(EmailOutbox.objects.get(to=['meera@example.com']))
+
+        response = self.client.post(reverse('verify_otp'), otp_form('meera@example.com', code))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertEqual(self.client.session['_auth_user_id'], str(self.user.pk))
+        # Single use
+        with self.assertRaises(otp.InvalidCode):
+            otp.verify('meera@example.com', code)
+
+    @override_settings(OTP_MAX_ATTEMPTS=2)
+    def test_wrong_codes_burn_the_code(self):
+        code = otp.issue('meera@example.com')
+        wrong = '0000' if code != '0000' else '1111'
+        for _ in range(2):
+            with self.assertRaises(otp.InvalidCode):
+                otp.verify('meera@example.com', wrong)
+        with self.assertRaisesMessage(otp.InvalidCode, 'Too many wrong codes'):
+            otp.verify('meera@example.com', code)
+        with self.assertRaisesMessage(otp.InvalidCode, 'expired'):
+            otp.verify('meera@example.com', code)
+
+    @override_settings(OTP_EMAIL_RATE=(2, 1 / 60), OTP_IP_RATE=(3, 1 / 60))
+    def test_token_buckets(self):
+        otp.issue('meera@example.com', '10.0.0.1')
+        otp.issue('Meera@example.com', '10.0.0.1')
+        with self.assertRaises(otp.RateLimited) as raised:
+            otp.issue('meera@example.com', '10.0.0.2')
+        self.assertEqual(raised.exception.retry_after, 60)
+        otp.issue('someone@example.com', '10.0.0.1')
+        with self.assertRaises(otp.RateLimited):
+            otp.issue('other@example.com', '10.0.0.1')
+
+        response = self.client.post(reverse('login'), {'login_type': 'user', 'email': 'x@example.com'},
+                                    REMOTE_ADDR='10.0.0.1')
+        self.assertContains(response, 'Too many requests')
+
+    def test_bucket_refills(self):
+        otp.take_token('t', 1, 0.5, now=100)
+        with self.assertRaises(otp.RateLimited):
+            otp.take_token('t', 1, 0.5, now=101)
+        otp.take_token('t', 1, 0.5, now=102)
+
+
+def photo_upload(name='look.jpg', size=(1200, 1600)):
+    """A noisy JPEG, so its weight is close to a real photo's."""
+    image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=92)
+    return SimpleUploadedFile(name, out.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(section='women', name='Tops', slug='women-tops')
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def test_upload_builds_variants_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = make_product(self.category, 'Linen Top', image=photo_upload())
+        product.refresh_from_db()
+        self.assertTrue(images.is_current(product))
+        variants = product.image_variants['sources']
+        self.assertEqual(list(variants), images.formats())
+        self.assertEqual([width for width, _ in variants['jpeg']], [160, 320, 640, 1024])
+        storage = product.image.storage
+        self.assertTrue(all(storage.exists(name) for entries in variants.values() for _, name in entries))
+
+        # Deterministic names: rebuilding writes nothing new
+        with mock.patch.object(FileSystemStorage, 'save') as save:
+            self.assertEqual(images.build_variants(product.image)['sources'], variants)
+        save.assert_not_called()
+
+        # A 320px card downloads an order of magnitude less than the original
+        card = next(name for width, name in variants[images.formats()[0]] if width == 320)
+        self.assertLess(storage.size(card) * 10, storage.size(product.image.name))
+
+    def test_listing_renders_srcset_once_variants_exist(self):
+        product = make_product(self.category, 'Silk Top', image=photo_upload(size=(400, 500)))
+        response = self.client.get(reverse('products'))
+        self.assertContains(response, f'src="{product.image.url}"')
+        self.assertContains(response, 'loading="lazy"')
+
+        call_command('build_image_variants', workers=1, stdout=io.StringIO())
+        response = self.client.get(reverse('products'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        # Never upscaled: 400px wide source, largest variant 400w
+        self.assertContains(response, '/400.jpg 400w')
+        self.assertNotContains(response, f'src="{product.image.url}"')
+
+
+class AssetDeliveryTests(SimpleTestCase):
+    def setUp(self):
+        media, static_src, static_root = (tempfile.TemporaryDirectory() for _ in range(3))
+        for directory in (media, static_src, static_root):
+            self.addCleanup(directory.cleanup)
+        self.media = Path(media.name)
+        (self.media / 'products').mkdir()
+        (self.media / 'products' / 'look.jpg').write_bytes(bytes(range(256)) * 4)
+        (self.media / 'variants' / 'products' / 'look-0123456789ab').mkdir(parents=True)
+        (self.media / 'variants' / 'products' / 'look-0123456789ab' / '320.webp').write_bytes(b'webp')
+        Path(static_src.name, 'app.css').write_text('body { color: #4a5d23; }\n' * 200)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media.name, STATIC_ROOT=static_root.name, STATICFILES_DIRS=[static_src.name],
+            STORAGES={**settings.STORAGES, 'staticfiles': {
+                'BACKEND': 'shop_project.assets.CompressedManifestStaticFilesStorage'}},
+        ))
+
+    def test_media_conditional_requests(self):
+        response = self.client.get('/media/products/look.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(256)) * 4)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        etag, modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get('/media/products/look.jpg', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/media/products/look.jpg', HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+        self.assertEqual(self.client.get('/media/products/look.jpg', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+        variant = self.client.head('/media/variants/products/look-0123456789ab/320.webp')
+        self.assertEqual(variant['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+
+    async def test_media_under_asgi(self):
+        response = await self.async_client.get('/media/products/look.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual((await self.async_client.get('/media/products/missing.jpg')).status_code, 404)
+
+    def test_media_ranges(self):
+        response = self.client.get('/media/products/look.jpg', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        response = self.client.get('/media/products/look.jpg', HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(252, 256)))
+        response = self.client.get('/media/products/look.jpg', HTTP_RANGE='bytes=4096-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */1024'))
+        # If-Range with an old validator: whole file
+        response = self.client.get('/media/products/look.jpg', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_collected_static_is_hashed_compressed_and_immutable(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        hashed = staticfiles_storage.stored_name('app.css')
+        self.assertRegex(hashed, r'^app\.[0-9a-f]{12}\.css$')
+        self.assertTrue(Path(settings.STATIC_ROOT, hashed + '.gz').is_file())
+
+        response = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        body = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertIn('#4a5d23', body)
+        revalidated = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip',
+                                      HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        plain = self.client.get('/static/app.css')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(plain['Cache-Control'], 'public, max-age=60')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tops = Category.objects.create(section='women', name='Tops', slug='women-tops')
+        cls.jeans = Category.objects.create(section='women', name='Jeans', slug='women-jeans')
+        cls.top = make_product(cls.tops, 'Linen Top')
+        cls.jean = make_product(cls.jeans, 'Wide Jeans')
+        cls.size = Size.objects.create(name='M')
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_anonymous_listing_is_public_and_revalidates_without_rendering(self):
+        url = reverse('products')
+        first = self.client.get(url, {'category': self.tops.pk})
+        self.assertEqual(first['Cache-Control'], 'public, max-age=60')
+        self.assertIn('Cookie', first['Vary'])
+        with self.assertNumQueries(0), self.assertTemplateNotUsed('userApp/products.html'):
+            again = self.revalidate(url, first, category=self.tops.pk)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+
+        # A change in another category leaves this listing's validator alone
+        self.jean.price = Decimal('1999.00')
+        self.jean.save()
+        self.assertEqual(self.revalidate(url, first, category=self.tops.pk).status_code, 304)
+        self.top.name = 'Linen Shirt'
+        self.top.save()
+        self.assertContains(self.revalidate(url, first, category=self.tops.pk), 'Linen Shirt')
+
+    def test_logged_in_pages_are_private(self):
+        url = reverse('products')
+        anonymous = self.client.get(url)
+        self.client.force_login(User.objects.create_user('asha'))
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_product_page_validators(self):
+        url = reverse('product_detail', args=[self.top.pk])
+        self.client.get(url)  # sets the CSRF cookie the page's ETag depends on
+        first = self.client.get(url)
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        modified = first['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        # Sizes are on the page: adding one moves updated_at
+        Product.objects.filter(pk=self.top.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        cache.clear()
+        stale = self.client.get(url)
+        self.top.sizes.add(self.size)
+        response = self.revalidate(url, stale)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], stale['Last-Modified'])
+
+        self.assertEqual(self.client.get(reverse('product_detail', args=[999])).status_code, 404)
+
+    def test_size_changes_move_filtered_listing_validators(self):
+        url = reverse('products')
+        params = {'category': self.tops.pk, 'size': self.size.pk}
+        first = self.client.get(url, params)
+        self.assertNotContains(first, 'Linen Top')
+        self.assertEqual(self.revalidate(url, first, **params).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):  # the facet change log
+            self.top.sizes.add(self.size)
+        response = self.revalidate(url, first, **params)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertContains(self.client.get(url, params), 'Linen Top')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.size.product_set.clear()
+        self.assertNotContains(self.client.get(url, params), 'Linen Top')
+
+
+async def nap(request):
+    await asyncio.sleep(0.3)
+    return HttpResponse('rested')
+
+
+class NapURLConf:
+    urlpatterns = [path('nap/', nap)]
+
+
+@override_settings(ROOT_URLCONF=NapURLConf)
+class AsgiConcurrencyTests(SimpleTestCase):
+    async def test_configured_middleware_lets_async_requests_overlap(self):
+        # A sync-only middleware would run these one after another (1.2s)
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(self.async_client.get('/nap/') for _ in range(4)))
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertLess(time.perf_counter() - started, 0.9)
+
+
+class AsyncStorefrontURLConf:
+    urlpatterns = [
+        path('manager/', include('adminApp.urls')),
+        path('', include(storefront_urlpatterns(async_views))),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncStorefrontURLConf)
+class AsyncStorefrontTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('ravi', 'ravi@example.com', 'pw')
+        category = Category.objects.create(section='men', name='Kurtas', slug='men-kurtas')
+        cls.kurta = make_product(category, 'Cotton Kurta', '1299.00')
+        order = Order.objects.create(user=cls.user, full_name='Ravi', address='x', city='y', phone='1',
+                                     total_amount=Decimal('1299.00'))
+        OrderItem.objects.create(order=order, product=cls.kurta, quantity=1, price=Decimal('1299.00'))
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_catalogue_views(self):
+        response = await self.async_client.get(reverse('products'))
+        self.assertContains(response, 'Cotton Kurta')
+        response = await self.async_client.get(reverse('product_detail', args=[self.kurta.pk]))
+        self.assertContains(response, 'Cotton Kurta')
+        response = await self.async_client.get(reverse('product_detail', args=[self.kurta.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_listing_answers_like_wsgi(self):
+        url = reverse('products')
+        headers = ('Content-Type', 'Cache-Control', 'Vary')  # the ETag carries the catalogue version
+
+        def served(get):
+            cache.clear()
+            miss = get(url)
+            # A hit must not render: every decorator runs, the view does not
+            with mock.patch.object(views, '_product_listing', side_effect=AssertionError('rendered')):
+                hit = get(url)
+                revalidated = get(url, headers={'If-None-Match': miss['ETag']})
+            return hit.status_code, hit.content, [hit.get(h) for h in headers], revalidated.status_code
+
+        asgi = served(async_to_sync(self.async_client.get))
+        with override_settings(ROOT_URLCONF='shop_project.urls'):
+            self.assertIs(resolve(url).func, views.products)
+            wsgi = served(self.client.get)
+        self.assertEqual(asgi, wsgi)
+        self.assertEqual((asgi[0], asgi[3]), (200, 304))
+        self.assertIn('Cotton Kurta', asgi[1].decode())
+
+    async def test_guest_cart_and_profile(self):
+        await self.async_client.post(reverse('add_to_cart', args=[self.kurta.pk]))
+        response = await self.async_client.get(reverse('cart'))
+        self.assertContains(response, '1299.00')
+
+        response = await self.async_client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('profile'))
+        self.assertContains(response, 'Cotton Kurta')
+
+    async def test_otp_login(self):
+        response = await self.async_client.post(reverse('login'), {'login_type': 'user', 'email': 'ravi@example.com'})
+        self.assertEqual(response.status_code, 200)
+        email = await EmailOutbox.objects.filter(to=['ravi@example.com']).alast()
+        code = emailed_code(email)
+
+        response = await self.async_client.post(reverse('verify_otp'), otp_form('ravi@example.com', code))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        session = await self.async_client.asession()
+        self.assertEqual(await session.aget('_auth_user_id'), str(self.user.pk))
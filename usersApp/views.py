@@ -1,37 +1,27 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.db.models import Prefetch
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import UserCreationForm
-from django.core.mail import send_mail
-from django.conf import settings
-from django.db.models import Q
 from django.contrib.auth.models import User
-import random
-import threading 
-from .models import Product, Category, Cart, CartItem, Order, OrderItem, Size, Color
-
-# --- 1. EMAIL SYSTEM (Background Sending) ---
-class EmailThread(threading.Thread):
-    def __init__(self, subject, message, recipient_list):
-        self.subject = subject
-        self.message = message
-        self.recipient_list = recipient_list
-        threading.Thread.__init__(self)
-
-    def run(self):
-        send_mail(
-            self.subject,
-            self.message,
-            settings.EMAIL_HOST_USER,
-            self.recipient_list,
-            fail_silently=False,
-        )
-
+from decimal import Decimal
+from . import caching, carts, checkout, facets, http_caching, inventory, mailer, otp
+from .caching import cache_anonymous_response
+from .http_caching import conditional_page
+from .models import Product, ProductListing, Category, Order, OrderItem, Size, Color
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import search_products
+
+# --- 1. EMAIL SYSTEM (Outbox, sent by `manage.py send_queued_mail`) ---
 def send_custom_email(subject, message, to_email):
-    EmailThread(subject, message, [to_email]).start()
+    mailer.enqueue_email(subject, message, [to_email])
 
 # --- 2. BASIC PAGES ---
+@cache_anonymous_response
 def home(request): return render(request, 'home.html')
+@cache_anonymous_response
 def collections(request): return render(request, 'collections.html')
 def contact(request): return render(request, 'contact.html')
 def about(request): return render(request, 'about.html')
@@ -56,39 +46,39 @@ def unified_login(request):
 
         # --- USER LOGIN (OTP) ---
         elif login_type == 'user':
-            email = request.POST.get('email')
+            email = otp.normalize_email(request.POST.get('email'))
             try:
-                # Check if user exists
-                user = User.objects.get(email=email)
-            except User.DoesNotExist:
+                # Throttled before the user lookup, so floods never reach the database
+                code = otp.issue(email, otp.client_ip(request))
+            except otp.RateLimited as exc:
+                return render(request, 'userApp/login.html', {'error': str(exc)})
+            user = User.objects.filter(email=email).only('username').first()
+            if user is None:
                 return render(request, 'userApp/login.html', {'error': 'User not found. Please Register.'})
-            
-            # Generate 4-Digit OTP
-            otp = str(random.randint(1000, 9999))
-            request.session['otp'] = otp
-            request.session['otp_email'] = email
-            
-            
+
             # Send OTP Email
             subject = "Your StyleHaven Login OTP"
-            message = f"Hello {user.username},\n\nYour login code is: {otp}\n\nDo not share this with anyone.\n\n- StyleHaven Team"
+            message = f"Hello {user.username},\n\nYour login code is: {code}\n\nDo not share this with anyone.\n\n- StyleHaven Team"
             send_custom_email(subject, message, email)
-            
+
             return render(request, 'userApp/verify_otp.html', {'email': email})
 
     return render(request, 'userApp/login.html')
 
 def verify_otp(request):
-    """Checks if the entered OTP matches the session OTP"""
+    """Checks the entered OTP against the cached one for the email on the form"""
     if request.method == 'POST':
-        entered_otp = request.POST.get('otp1') + request.POST.get('otp2') + request.POST.get('otp3') + request.POST.get('otp4')
-        if entered_otp == request.session.get('otp'):
-            user = User.objects.get(email=request.session.get('otp_email'))
-            login(request, user)
-            del request.session['otp']  # Clear OTP after use
-            return redirect('home')
-        else:
-            return render(request, 'userApp/verify_otp.html', {'error': 'Invalid OTP', 'email': request.session.get('otp_email')})
+        email = otp.normalize_email(request.POST.get('email'))
+        entered_otp = ''.join(request.POST.get(f'otp{i}', '') for i in range(1, otp.CODE_LENGTH + 1))
+        try:
+            otp.verify(email, entered_otp, otp.client_ip(request))
+        except otp.OTPError as exc:
+            return render(request, 'userApp/verify_otp.html', {'error': str(exc), 'email': email})
+        user = User.objects.filter(email=email).order_by('pk').first()
+        if user is None:
+            return render(request, 'userApp/login.html', {'error': 'User not found. Please Register.'})
+        login(request, user)
+        return redirect('home')
     return render(request, 'userApp/verify_otp.html')
 
 def register_view(request):
@@ -99,7 +89,7 @@ def register_view(request):
             user = form.save()
             
             # Save Email manually
-            user.email = request.POST.get('email')
+            user.email = otp.normalize_email(request.POST.get('email'))
             user.save()
 
             # Send Welcome Email
@@ -119,166 +109,209 @@ def signout_view(request):
 
 # --- 4. SHOPPING & ORDERS ---
 
-def products(request):
-    """
-    List products with dynamic filters:
-    - section: men / women / kids / accessories
-    - category: specific category inside section (T-shirts, Shirts, etc., by id)
-    - q: search text
-    - max_price: upper price limit
-    """
-    products = Product.objects.all()
-
-    section = request.GET.get('section')   # men / women / kids / accessories
-    category_id = request.GET.get('category')
-    search_query = request.GET.get('q')
-    max_price = request.GET.get('max_price')
+PRODUCTS_PER_PAGE = 24
 
-    # Filter by section
-    if section:
-        products = products.filter(category__section=section)
-        available_categories = Category.objects.filter(section=section)
-    else:
-        available_categories = Category.objects.all()
+# Sort option -> keyset ordering on ProductListing (always ends in the
+# product id so the sort key is unique)
+PRODUCT_ORDERINGS = {
+    'newest': ('-created_at', '-pk'),
+    'low_high': ('effective_price', 'pk'),
+    'high_low': ('-effective_price', '-pk'),
+    'relevance': ('-search_rank', '-pk'),
+}
 
-    # Filter by specific category within the section
-    if category_id:
-        products = products.filter(category_id=category_id)
+def _query_without(request, *names):
+    get_copy = request.GET.copy()
+    for name in names:
+        get_copy.pop(name, None)
+    return get_copy.urlencode()
 
-    # Text search
+def _product_listing(request, full_page=True):
+    """
+    Filter, sort and paginate the catalogue. Shared by products() and the
+    JSON load-more endpoint; ``full_page=False`` skips the sidebar and count.
+    Reads only the ProductListing read model (see usersApp.listings), and
+    the facet bitsets for sizes, colors and option counts (usersApp.facets).
+    """
+    products = ProductListing.objects.all()
+    filters = facets.ListingFilters(request.GET)
+    facet_state = facets.index.sync()
+    search_query = request.GET.get('q', '').strip()
+
+    # Text search first, so search facet counts cover every match and not
+    # just the currently selected section/category
+    search_facets = None
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
-
-    # Max price filter
-    if max_price:
-        try:
-            products = products.filter(price__lte=float(max_price))
-        except ValueError:
-            pass
-
-    # Sort
-    sort = request.GET.get('sort', 'newest')
-    if sort == 'low_high':
-        products = products.order_by('price')
-    elif sort == 'high_low':
-        products = products.order_by('-price')
-    else:
-        products = products.order_by('-created_at')
-
-    # Query string without sort (for building sort dropdown URLs)
-    get_copy = request.GET.copy()
-    if 'sort' in get_copy:
-        get_copy.pop('sort')
-    query_no_sort = get_copy.urlencode()
+        results = search_products(search_query, products)
+        products = results.products
+        search_facets = results.facets if full_page else None
+
+    # Section, category, price range (on what the customer pays), on sale and
+    # in stock are indexed columns; sizes and colors come from the bitsets
+    products = filters.apply(products, facet_state)
+    available_categories = caching.section_categories(filters.section)
+
+    # Sort + keyset pagination (relevance only makes sense with a search)
+    sort = request.GET.get('sort', 'relevance' if search_query else 'newest')
+    if sort not in PRODUCT_ORDERINGS or (sort == 'relevance' and not search_query):
+        sort = 'newest'
+    paginator = KeysetPaginator(products, PRODUCT_ORDERINGS[sort], per_page=PRODUCTS_PER_PAGE)
+    cursor = request.GET.get('cursor')
+    try:
+        page = paginator.page(cursor)
+    except InvalidCursor:
+        cursor = None
+        page = paginator.page()
 
     context = {
-        'products': products,
-        'categories': available_categories,
-        'current_section': section,
-        'current_category_id': int(category_id) if category_id else None,
-        'current_max_price': max_price,
+        'products': page.object_list,
+        'page': page,
         'current_sort': sort,
-        'query_no_sort': query_no_sort,
+        'is_first_page': not cursor,
+        'query_no_cursor': _query_without(request, 'cursor'),
+        'card_cache_timeout': caching.catalogue_timeout(),
     }
+    if not full_page:
+        return context
+
+    # Attach search facet counts to the section and category pills
+    section_counts = None
+    if search_facets is not None:
+        category_counts = {c['id']: c['count'] for c in search_facets['categories']}
+        for cat in available_categories:
+            cat.result_count = category_counts.get(cat.id, 0)
+        section_counts = {s['value']: s['count'] for s in search_facets['sections']}
+
+    # Size / color / price / sale counts, from the bitsets
+    matched = None
+    if search_query:
+        matched = facets.to_bits(results.matched.values_list('pk', flat=True))
 
-    return render(request, 'userApp/products.html', context)
-
+    context.update({
+        'total_count': caching.cached_count(request, products),
+        'categories': available_categories,
+        'current_section': filters.section,
+        'current_category_id': filters.category_id,
+        'current_min_price': filters.min_price,
+        'current_max_price': filters.max_price,
+        'on_sale_only': filters.on_sale,
+        'in_stock_only': filters.in_stock,
+        # Query string without sort/cursor (for building sort dropdown URLs)
+        'query_no_sort': _query_without(request, 'sort', 'cursor'),
+        'facets': filters.counts(facet_state, matched),
+        'section_counts': section_counts,
+    })
+    return context
+
+@conditional_page(http_caching.listing_validators, shared=True)
+@cache_anonymous_response
+def products(request):
+    """
+    List products with dynamic filters:
+    - section: men / women / kids / accessories
+    - category: specific category inside section (T-shirts, Shirts, etc., by id)
+    - q: search text (ranked full-text search, see usersApp.search)
+    - size / color: any of the given ids (repeatable), combined with AND
+    - min_price / max_price: range on the price the customer pays
+    - on_sale / in_stock: "1" to keep only discounted / available products
+    - sort / cursor: ordering and keyset position (see usersApp.pagination)
+    """
+    return render_products(request)
+
+def render_products(request):
+    """The listing page itself, without the caching decorators (async_views.products adds its own)."""
+    return render(request, 'userApp/products.html', _product_listing(request))
+
+@conditional_page(http_caching.listing_validators, shared=True)
+@cache_anonymous_response
+def products_more(request):
+    """JSON "load more": the next page of product cards for the same filters."""
+    context = _product_listing(request, full_page=False)
+    page = context['page']
+    html = render_to_string('userApp/product_cards.html', context, request=request)
+    return JsonResponse({'html': html, 'next_cursor': page.next_cursor, 'has_next': page.has_next})
+
+@conditional_page(http_caching.product_validators)
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = caching.product_detail(pk)
+    if product is None:
+        raise Http404('No product matches the given query.')
     return render(request, 'userApp/product_detail.html', {'product': product})
 
-def _get_cart(request):
-    if request.user.is_authenticated:
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-    else:
-        if not request.session.session_key: request.session.create()
-        cart, _ = Cart.objects.get_or_create(session_id=request.session.session_key)
-    return cart
+def _get_cart(request, create=False):
+    return carts.get_cart(request, create=create)
 
-@login_required(login_url='login')
 def add_to_cart(request, pk):
     product = get_object_or_404(Product, pk=pk)
-    cart = _get_cart(request)
+    cart = _get_cart(request, create=True)
     size = None
     color = None
     if request.method == 'POST':
         size_id = request.POST.get('size')
         color_id = request.POST.get('color')
-        if size_id: size = Size.objects.get(id=size_id)
-        if color_id: color = Color.objects.get(id=color_id)
-    item, created = CartItem.objects.get_or_create(cart=cart, product=product, size=size, color=color)
-    if not created:
-        item.quantity += 1
-        item.save()
+        if size_id: size = get_object_or_404(Size, id=size_id)
+        if color_id: color = get_object_or_404(Color, id=color_id)
+    carts.add_item(cart, product, size=size, color=color)
     return redirect('cart')
 
 def view_cart(request):
     cart = _get_cart(request)
-    items = cart.items.all()
-    total = sum(item.total_price for item in items)
+    if cart is None:
+        return render(request, 'userApp/cart.html', {'items': [], 'total': Decimal('0.00')})
+    items = carts.cart_items(cart)
+    inventory.availability(items)
+    total = carts.summary(cart.pk)['total']
     return render(request, 'userApp/cart.html', {'items': items, 'total': total})
 
+def cart_summary(request):
+    """Item count and total for the header badge, cached per cart."""
+    cart_id = request.session.get(carts.SESSION_KEY)
+    if not cart_id and request.user.is_authenticated:
+        # A saved cart from an earlier session; remembered for the next call
+        cart = carts.get_cart(request)
+        cart_id = cart and cart.pk
+    if not cart_id:
+        return JsonResponse({'count': 0, 'total': '0.00'})
+    summary = carts.summary(cart_id)
+    return JsonResponse({'count': summary['count'], 'total': str(summary['total'])})
+
 def update_cart(request, item_id, action):
-    item = get_object_or_404(CartItem, id=item_id)
-    if action == 'increase':
-        item.quantity += 1
-        item.save()
-    elif action == 'decrease':
-        item.quantity -= 1
-        if item.quantity <= 0: item.delete()
-        else: item.save()
-    elif action == 'remove': item.delete()
+    cart = _get_cart(request)
+    if cart is None or not carts.change_quantity(cart, item_id, action):
+        raise Http404('No such item in your cart.')
     return redirect('cart')
 
 @login_required(login_url='login')
 def place_order(request):
-    """Places an order and sends a Confirmation Email"""
+    """Places an order; checkout queues the Confirmation Email"""
     cart = _get_cart(request)
-    items = cart.items.all()
-    if not items.exists(): return redirect('products')
-    total = sum(item.total_price for item in items)
-    
+    items = checkout.cart_lines(cart) if cart else []
+    if not items: return redirect('products')
+    total, _ = checkout.price_lines(items)
+
     if request.method == 'POST':
-        order = Order.objects.create(
-            user=request.user,
-            full_name=request.POST.get('name'),
-            phone=request.POST.get('mobile'),
-            address=request.POST.get('address'),
-            city=request.POST.get('city'),
-            subtotal=total,
-            discount=0,
-            total_amount=total,
-        )
-        
-        # Build Order Email Content
-        email_body = f"Hi {request.user.username},\n\nYour order #{order.id} has been confirmed!\n\nHere is what you ordered:\n"
-        
-        for item in items:
-            unit_price = item.product.discount_price or item.product.price
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=unit_price,
-                size=getattr(item.size, 'name', '') or '',
-                color=getattr(item.color, 'name', '') or '',
+        try:
+            checkout.place_order(
+                request.user,
+                cart,
+                full_name=request.POST.get('name'),
+                phone=request.POST.get('mobile'),
+                address=request.POST.get('address'),
+                city=request.POST.get('city'),
             )
-            email_body += f"- {item.product.name} (Qty: {item.quantity}) - Rs. {item.total_price}\n"
-        
-        email_body += f"\nTotal Amount: Rs. {total}\n\nWe will notify you when it ships!\n\nThanks,\nStyleHaven Team"
-        
-        # Send Order Email
-        send_custom_email(f"Order Confirmed: #{order.id}", email_body, request.user.email)
-
-        cart.items.all().delete()
+        except checkout.OutOfStock as exc:
+            return render(request, 'userApp/place_order.html', {'total': total, 'error': str(exc)})
+        except checkout.EmptyCart:
+            return redirect('products')
         return redirect('profile')
 
     return render(request, 'userApp/place_order.html', {'total': total})
 
 @login_required(login_url='login')
 def profile(request):
-    orders = Order.objects.filter(user=request.user).order_by('-ordered_at')
+    orders = (
+        Order.objects.filter(user=request.user)
+        .order_by('-ordered_at')
+        .prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('product')))
+    )
     return render(request, 'userApp/profile.html', {'orders': orders})